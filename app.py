@@ -2,11 +2,25 @@
 from zoneinfo import ZoneInfo
 from datetime import datetime
 import os
-import json
 import random
 import time
+import threading
+from bisect import bisect
+from itertools import accumulate
+from functools import lru_cache
 from flask import Flask, request, jsonify, Response
 
+import casttimer
+import economy
+import fastjson
+import history
+import leaderboard
+import metrics
+import reqlog
+import rng
+import storage
+from router import Router
+
 app = Flask(__name__)
 
 
@@ -20,10 +34,9 @@ SLOPE_SMALL = 0.6   # 더 평평 → 꼬리(최대길이) 확률이 너무 작
 SLOPE_MED   = 0.9   # 더 급경사 → 최단 길이 쪽 집중
 SLOPE_LARGE = 0.97  # 매우 급경사 → 작은 대형이 주로 나옴
 
-def _weighted_length(min_len: int, max_len: int, slope: float) -> int:
+def _length_table(min_len: int, max_len: int, slope: float):
+    """길이별 누적 가중치 표 (cum_weights, total)."""
     span = max_len - min_len
-    if span <= 0:
-        return min_len
     weights = []
     for i in range(min_len, max_len + 1):
         t = (i - min_len) / span  # 0..1
@@ -31,13 +44,26 @@ def _weighted_length(min_len: int, max_len: int, slope: float) -> int:
         if w <= 0:
             w = 1e-6
         weights.append(w)
-    from random import choices
-    return choices(range(min_len, max_len + 1), weights=weights, k=1)[0]
+    cum = list(accumulate(weights))
+    return cum, cum[-1] + 0.0
+
+# (min_len, max_len, slope) -> (cum_weights, total). FISH_POOL 정의 뒤에 미리 채운다.
+_LENGTH_TABLES = {}
 
-def pick_size_with_miss():
+def _weighted_length(min_len: int, max_len: int, slope: float, rnd=random) -> int:
+    # random.choices(weights=...) 와 같은 난수 소비/결과: bisect(cum, random() * total)
+    if max_len - min_len <= 0:
+        return min_len
+    key = (min_len, max_len, slope)
+    table = _LENGTH_TABLES.get(key)
+    if table is None:
+        table = _LENGTH_TABLES[key] = _length_table(min_len, max_len, slope)
+    cum, total = table
+    return min_len + bisect(cum, rnd.random() * total, 0, len(cum) - 1)
+
+def pick_size_with_miss(rnd=random):
     """요구한 분포: 소형 35%, 중형 0.5%, 대형 0.01%, 나머지 꽝."""
-    import random
-    r = random.random()
+    r = rnd.random()
     if r < P_SMALL:
         return "소형"
     elif r < P_SMALL + P_MEDIUM:
@@ -47,9 +73,6 @@ def pick_size_with_miss():
     else:
         return None
 
-# ---------------- 사용자 데이터 ----------------
-users = {}
-
 # ---------------- 물고기 및 상점 데이터 ----------------
 FISH_POOL = {
     "바다": {
@@ -64,7 +87,130 @@ FISH_POOL = {
     }
 }
 
+SIZE_SLOPE = {"소형": SLOPE_SMALL, "중형": SLOPE_MED, "대형": SLOPE_LARGE}
+
+# 어종별 길이 표는 기동 시 한 번만 만든다 (낚을 때마다 가중치 리스트 생성 X)
+for _sizes in FISH_POOL.values():
+    for _size, _fishes in _sizes.items():
+        for _name, _min_len, _max_len in _fishes:
+            if _max_len > _min_len:
+                _LENGTH_TABLES[(_min_len, _max_len, SIZE_SLOPE[_size])] = _length_table(_min_len, _max_len, SIZE_SLOPE[_size])
+
+# ---------------- 물고기 표현 ----------------
+# 가방/어망/기록의 물고기는 메모리에서 Fish(슬롯 5개, 정수만)로 들고 있고,
+# 저장소 JSON 에는 기존과 똑같은 {"name","length","size","place","time"} 형태로 쓴다.
+SEOUL = ZoneInfo("Asia/Seoul")
+SPECIES = tuple(name for sizes in FISH_POOL.values() for fishes in sizes.values() for name, _, _ in fishes)
+SPECIES_ID = {name: i for i, name in enumerate(SPECIES)}
+SIZES = ("소형", "중형", "대형")
+SIZE_ID = {s: i for i, s in enumerate(SIZES)}
+PLACES = ("바다", "민물")
+PLACE_ID = {p: i for i, p in enumerate(PLACES)}
+FISH_KEYS = ("name", "length", "size", "place", "time")
+
+@lru_cache(maxsize=4096)
+def _minute_text(minute: int) -> str:
+    return datetime.fromtimestamp(minute * 60, SEOUL).strftime("%Y-%m-%d %H:%M")
+
+@lru_cache(maxsize=4096)
+def _text_minute(text: str) -> int:
+    return int(datetime.strptime(text, "%Y-%m-%d %H:%M").replace(tzinfo=SEOUL).timestamp()) // 60
+
+class Fish:
+    """잡은 물고기 한 마리. fish["name"] 처럼 기존 dict 와 같은 방식으로 읽을 수 있다."""
+    __slots__ = ("species", "length", "size_id", "place_id", "minute")
+
+    def __init__(self, species: int, length: int, size_id: int, place_id: int, minute: int):
+        self.species = species
+        self.length = length
+        self.size_id = size_id
+        self.place_id = place_id
+        self.minute = minute  # epoch 분 (표시 단위가 분이라 손실 없음)
+
+    @classmethod
+    def caught(cls, name: str, length: int, size: str, place: str):
+        return cls(SPECIES_ID[name], length, SIZE_ID[size], PLACE_ID[place], int(time.time()) // 60)
+
+    @property
+    def name(self):
+        return SPECIES[self.species]
+
+    @property
+    def size(self):
+        return SIZES[self.size_id]
+
+    @property
+    def place(self):
+        return PLACES[self.place_id]
+
+    @property
+    def time(self):
+        return _minute_text(self.minute)
+
+    def __getitem__(self, key):
+        if key not in FISH_KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in FISH_KEYS else default
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "length": self.length, "size": self.size,
+                "place": self.place, "time": self.time}
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        """기존 JSON 형태에서 변환. 그대로 되돌릴 수 없는 값이면 None."""
+        try:
+            fish = cls(SPECIES_ID[d["name"]], d["length"], SIZE_ID[d["size"]],
+                       PLACE_ID[d["place"]], _text_minute(d["time"]))
+        except (KeyError, TypeError, ValueError):
+            return None
+        return fish if type(d["length"]) is int and fish.time == d["time"] else None
+
+def _json_default(obj):
+    if isinstance(obj, Fish):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _json_object_hook(d: dict):
+    if len(d) == 5 and tuple(d) == FISH_KEYS:
+        return Fish.from_dict(d) or d
+    return d
+
+# ---------------- 사용자 데이터 ----------------
+# 백엔드는 FISHING_STORE(sqlite|memory) 로 선택, 기본은 SQLite(WAL)
+# FISHING_JOURNAL_DIR 이 있으면 변경을 저널에 그룹 커밋하고, 시작할 때 저널로 복구한다 (journal.py)
+store = storage.open_store(json_default=_json_default, object_hook=_json_object_hook)
+# 한 마리씩의 원본 조과 기록은 FISHING_HISTORY_DIR 이 있을 때만 컬럼 로그에 남긴다
+catch_log = history.open_log()
+# /skill 요청 원본 (ts, uid, 발화, 응답) — FISHING_REQUEST_LOG_DIR 이 있을 때만, 리플레이용(bench/replay.py)
+request_log = reqlog.open_log()
+# 현재 트랜잭션의 부수효과(조과 로그, 랭킹 갱신, 다른 유저 변경) — 커밋된 뒤에만 반영
+_tx = threading.local()
+# 서버 전체 랭킹. 이 워커의 커밋은 바로, 다른 워커의 변경은 FISHING_RANK_REFRESH 초마다 재구성으로 반영
+leaderboards = leaderboard.Leaderboards(float(os.environ.get("FISHING_RANK_REFRESH", "60")))
+# 골드 발행/소각, 구매, 조과 이벤트 → 분 단위 집계 (/admin/economy)
+econ = economy.Economy(int(os.environ.get("FISHING_ECON_BUFFER", "65536")))
+
+def emit(kind: str, key: str, amount: int, source: str = ""):
+    """경제 이벤트. 트랜잭션 안이면 커밋된 뒤에 집계로 보낸다."""
+    if not amount:
+        return
+    events = getattr(_tx, "events", None)
+    if events is None:
+        econ.emit(kind, key, amount, source)
+    else:
+        events.append((int(time.time()), kind, key, amount, source))
+
 SHOP_PRICE = {
+    "지렁이": 10, "지렁이(거래불가)": 10,
+    "떡밥": 10, "떡밥(거래불가)": 10,
+    "집어제": 2000,
+    "케미라이트3등급": 200, "케미라이트2등급": 350, "케미라이트1등급": 1000,
+    "철제 낚싯대": 5000, "강화 낚싯대": 20000, "프로 낚싯대": 100000, "레전드 낚싯대": 500000,
+}
 
 SHOP_NUM_MAP = {
     "1": "지렁이",
@@ -79,35 +225,55 @@ SHOP_NUM_MAP = {
     "13": "레전드 낚싯대",
 }
 
-    "지렁이": 10, "지렁이(거래불가)": 10,
-    "떡밥": 10, "떡밥(거래불가)": 10,
-    "집어제": 2000,
-    "케미라이트3등급": 200, "케미라이트2등급": 350, "케미라이트1등급": 1000,
-    "철제 낚싯대": 5000, "강화 낚싯대": 20000, "프로 낚싯대": 100000, "레전드 낚싯대": 500000,
-}
-
 # ---------------- 핵심 헬퍼 함수 ----------------
 
+def new_user() -> dict:
+    """신규 유저 기본 데이터."""
+    return {
+        "nickname": None, "gold": 0, "limit_gold": 0,
+        "exp": 0, "level": 1, "bag": [], "max_slot": 5,
+        # 미끼는 골드(거래불가)/일반골드 재고를 분리하여 관리
+        "inventory": {
+            "지렁이_normal": 0, "지렁이_limit": 0,
+            "떡밥_normal": 0, "떡밥_limit": 0
+        },
+        "items": {"집어제": 0, "케미라이트1등급": 0, "케미라이트2등급": 0, "케미라이트3등급": 0},
+        "stats": new_stats(), "place": None, "last_checkin": None,
+        # 캐스팅 상태: {"start": epoch, "wait": sec, "bait": "지렁이|떡밥", "place": "바다|민물"}
+        "casting": None,
+        "bulk_sell_pending": False,
+        "pending_sell_index": None,
+        "net": []
+    }
+
+def new_stats() -> dict:
+    """조과 집계: 합계, 크기별 마릿수, 최대/최소, 종류별 최대 기록."""
+    return {"count": 0, "total_length": 0, "by_size": {"소형": 0, "중형": 0, "대형": 0},
+            "max": None, "min": None, "best": {}}
+
+def add_catch(stats: dict, fish: dict):
+    """한 마리 잡을 때마다 O(1) 로 집계를 갱신합니다."""
+    stats["count"] += 1
+    stats["total_length"] += fish["length"]
+    stats["by_size"][fish["size"]] = stats["by_size"].get(fish["size"], 0) + 1
+    if stats["max"] is None or fish["length"] > stats["max"]["length"]:
+        stats["max"] = fish
+    if stats["min"] is None or fish["length"] < stats["min"]["length"]:
+        stats["min"] = fish
+    best = stats["best"].get(fish["name"])
+    if best is None or fish["length"] > best["length"]:
+        stats["best"][fish["name"]] = fish
+
 def get_user(user_id):
-    """사용자 ID로 유저 데이터를 가져오거나 새로 생성합니다."""
-    if user_id not in users:
-        users[user_id] = {
-            "nickname": None, "gold": 0, "limit_gold": 0,
-            "exp": 0, "level": 1, "bag": [], "max_slot": 5,
-            # 미끼는 골드(거래불가)/일반골드 재고를 분리하여 관리
-            "inventory": {
-                "지렁이_normal": 0, "지렁이_limit": 0,
-                "떡밥_normal": 0, "떡밥_limit": 0
-            },
-            "items": {"집어제": 0, "케미라이트1등급": 0, "케미라이트2등급": 0, "케미라이트3등급": 0},
-            "record": [], "place": None, "last_checkin": None,
-            # 캐스팅 상태: {"start": epoch, "wait": sec, "bait": "지렁이|떡밥", "place": "바다|민물"}
-            "casting": None,
-            "bulk_sell_pending": False,
-            "pending_sell_index": None,
-            "net": []
-        }
-    return users[user_id]
+    """사용자 ID로 유저 데이터를 가져오거나 새로 생성합니다.
+    handle_command 트랜잭션 안에서는 저장 대상 dict 를 그대로 돌려줍니다."""
+    user = store.get(user_id, new_user)
+    if "record" in user:
+        # 예전 형식: 전체 조과 리스트 → 집계로 접어서 버린다
+        stats = user.setdefault("stats", new_stats())
+        for fish in user.pop("record"):
+            add_catch(stats, fish)
+    return user
 
 def get_title(level: int) -> str:
     """레벨에 맞는 칭호를 반환합니다."""
@@ -215,7 +381,9 @@ def home_text(user: dict) -> str:
 
     inventory_status = owned_items_summary(user)
     casting_line = ""
-    if user.get("casting"):
+    if user.get("casting") and "result" in user["casting"]:
+        casting_line = "\n🎯 캐스팅 결과가 나왔습니다 → /챔질"
+    elif user.get("casting"):
         elapsed = int(time.time() - user["casting"]["start"])
         remain = max(0, user["casting"]["wait"] - elapsed)
         casting_line = f"\n🎯 진행 중: 캐스팅 {user['casting']['wait']}초 (남은 {remain}초) → /챔질"
@@ -248,8 +416,10 @@ def help_text() -> str:
         "/닉네임 [이름] → 최초 1회 닉네임 설정 (보너스 2000골드(거래불가))\n"
         "/상태 → 현재 칭호/레벨/골드/장비/가방 보기\n"
         "/칭호 → 레벨별 칭호 구간 안내\n"
-        "/기록 → 잡은 물고기 기록 확인\n\n"
+        "/기록 → 잡은 물고기 기록 확인\n"
+        "/랭킹 [레벨|골드|어종] → 서버 전체 랭킹\n\n"
         "🎣 낚시 진행\n"
+        "/연속낚시 [2~10]회 [1~60]초 → 여러 번 연속 캐스팅, /챔질 한 번으로 결과 요약\n"
         "/어망 → 어망 속 물고기 목록 보기\n\n"
         "🏪 상점/거래\n"
         "/상점 → 상점 열기\n"
@@ -260,48 +430,79 @@ def help_text() -> str:
         "🎁 기타\n"
         "/출석 → 등급별 골드(거래불가) 보상 수령\n"
         "/초기화 [닉네임] → 해당 닉네임 데이터 삭제 (관리용)\n"
+        "/유저검색 [앞부분] → 닉네임 접두어 검색 (관리용)\n"
         "/홈 또는 / → 홈 화면 보기\n"
     )
 
 def shop_text() -> str:
-    """상점 UI 텍스트를 반환합니다."""
+    """상점 UI 텍스트를 반환합니다. 가격은 SHOP_PRICE 에서 읽습니다."""
+    p = SHOP_PRICE
     return (
         "🏪 상점\n\n"
         "[소모품]\n"
-        "- 지렁이 (1개) | 💰10  ← 골드(거래불가) 사용 가능 (바다낚시 전용)\n"
-        "- 떡밥   (1개) | 💰10  ← 골드(거래불가) 사용 가능 (민물낚시 전용)\n"
-        "- 집어제 (1개) | 💰2,000  ※ 사용 시 3회 지속\n"
-        "- 케미라이트3등급 (1개) | 💰200  ※ 1회성, 밤(20:00~05:00) 낚시 실패 방지\n"
-        "- 케미라이트2등급 (1개) | 💰350  ※ 1회성, 밤(20:00~05:00) 낚시 실패 방지\n"
-        "- 케미라이트1등급 (1개) | 💰1,000  ※ 1회성, 밤(20:00~05:00) 낚시 실패 방지\n\n"
+        f"- 지렁이 (1개) | 💰{p['지렁이']:,}  ← 골드(거래불가) 사용 가능 (바다낚시 전용)\n"
+        f"- 떡밥   (1개) | 💰{p['떡밥']:,}  ← 골드(거래불가) 사용 가능 (민물낚시 전용)\n"
+        f"- 집어제 (1개) | 💰{p['집어제']:,}  ※ 사용 시 3회 지속\n"
+        f"- 케미라이트3등급 (1개) | 💰{p['케미라이트3등급']:,}  ※ 1회성, 밤(20:00~05:00) 낚시 실패 방지\n"
+        f"- 케미라이트2등급 (1개) | 💰{p['케미라이트2등급']:,}  ※ 1회성, 밤(20:00~05:00) 낚시 실패 방지\n"
+        f"- 케미라이트1등급 (1개) | 💰{p['케미라이트1등급']:,}  ※ 1회성, 밤(20:00~05:00) 낚시 실패 방지\n\n"
         "[장비] (낚싯대는 물고기 사이즈별 확률 보정이 적용됩니다)\n"
-        "- 철제 낚싯대 | 💰5,000\n"
-        "- 강화 낚싯대 | 💰20,000\n"
-        "- 프로 낚싯대 | 💰100,000\n"
-        "- 레전드 낚싯대 | 💰500,000\n\n"
+        f"- 철제 낚싯대 | 💰{p['철제 낚싯대']:,}\n"
+        f"- 강화 낚싯대 | 💰{p['강화 낚싯대']:,}\n"
+        f"- 프로 낚싯대 | 💰{p['프로 낚싯대']:,}\n"
+        f"- 레전드 낚싯대 | 💰{p['레전드 낚싯대']:,}\n\n"
         "구매: /구매 [이름] [갯수]\n"
         "예) /구매 지렁이 10\n\n"
         "판매: /판매 [이름] [수량]  (구매가의 50%)\n"
         "일괄판매: /일괄판매   (모든 물고기 일괄판매)\n"
     )
 
+def titles_text() -> str:
+    return (
+        "📜 칭호 구간 안내\n\n"
+        "Lv. 1 ~ 40  → 🐟 낚린이\n"
+        "Lv. 41 ~ 69 → 🎣 낚시인\n"
+        "Lv. 70 ~ 99 → 🐠 프로낚시꾼\n"
+        "Lv. 100 이상 → 🐳 강태공"
+    )
+
+# ---------------- 정적 응답 ----------------
+class Rendered(str):
+    """카카오 응답 JSON 이 body 에 미리 직렬화돼 있는 응답 문자열.
+    handle_command 까지는 보통 str 처럼 흘러가고, /skill 에서 body 를 그대로 보낸다."""
+
+    def __new__(cls, text: str):
+        self = super().__new__(cls, text)
+        self.body = fastjson.kakao_body(text)
+        return self
+
+def kakao_body(text: str) -> bytes:
+    body = getattr(text, "body", None)
+    return body if body is not None else fastjson.kakao_body(text)
+
+# 이름 -> (원본 테이블 사본, Rendered). 테이블이 바뀐 경우에만 다시 만든다
+_STATIC = {}
+
+def static_reply(name: str, build, table=None) -> Rendered:
+    hit = _STATIC.get(name)
+    if hit is None or hit[0] != table:
+        hit = _STATIC[name] = (dict(table) if table is not None else None, Rendered(build()))
+    return hit[1]
+
 def record_text(user: dict) -> str:
-    """잡은 물고기 기록을 텍스트로 만듭니다."""
-    if not user["record"]:
+    """잡은 물고기 기록을 텍스트로 만듭니다. 집계만 읽으므로 O(어종 수)."""
+    stats = user["stats"]
+    if not stats["count"]:
         return "🎣 아직 잡은 물고기가 없습니다."
-    fishes = user["record"]
-    max_f = max(fishes, key=lambda x: x["length"])
-    min_f = min(fishes, key=lambda x: x["length"])
+    max_f, min_f = stats["max"], stats["min"]
+    by_size = stats["by_size"]
     msg = ["📒 기록"]
+    msg.append(f"총 {stats['count']}마리 (소형 {by_size['소형']} / 중형 {by_size['중형']} / 대형 {by_size['대형']}) | 평균 {stats['total_length'] / stats['count']:.1f}cm")
     msg.append(f"최대: {max_f['name']} {max_f['length']}cm ({max_f['size']}어종) | 장소:{max_f.get('place','-')} | {max_f.get('time','')}")
     msg.append(f"최소: {min_f['name']} {min_f['length']}cm ({min_f['size']}어종) | 장소:{min_f.get('place','-')} | {min_f.get('time','')}")
     msg.append("")
-    species_map = {}
-    for f in fishes:
-        if f["name"] not in species_map or f["length"] > species_map[f["name"]]["length"]:
-            species_map[f["name"]] = f
     msg.append("종류별 최대 기록:")
-    for name, f in sorted(species_map.items()):
+    for name, f in sorted(stats["best"].items()):
         msg.append(f"- {name} {f['length']}cm ({f['size']}어종) | 장소:{f.get('place', '-')} | {f.get('time', '')}")
     return "\n".join(msg)
 
@@ -354,48 +555,49 @@ def get_exp_by_length(size: str, length: int, place: str) -> int:
     return int(exp)
 
 
-def resolve_fishing_result(user: dict, place: str, bait_type: str) -> str:
+def roll_catch(rnd, place: str):
+    """챔질 한 번의 판정. (어종, 크기, 길이) 또는 꽝이면 None."""
+    size = pick_size_with_miss(rnd)
+    if size is None:
+        return None
+    # 해당 크기에서 어종 선택 → 크기별 길이 가중치 적용
+    fish_name, min_len, max_len = rnd.choice(FISH_POOL[place][size])
+    return fish_name, size, _weighted_length(min_len, max_len, SIZE_SLOPE[size], rnd)
+
+def land_catch(user: dict, fish_name: str, size: str, length: int, place: str) -> int:
+    """잡은 물고기를 가방/기록에 넣고 얻은 경험치를 반환합니다."""
+    # 경험치(cm) + 지역 보정, 골드는 지급하지 않음
+    exp = get_exp_by_length(size, length, place)
+    user["exp"] += exp
+    fish_obj = Fish.caught(fish_name, length, size, place)
+    user["bag"].append(fish_obj)
+    add_catch(user["stats"], fish_obj)
+    emit("catch", fish_name, 1)
+    if catch_log is not None:
+        _tx.catches.append(fish_obj)
+    return exp
+
+def resolve_fishing_result(user_id: str, user: dict, place: str, bait_type: str) -> str:
     """챔질 결과 계산: 크기 분포(소35/중0.5/대0.01%), 나머지 꽝 + 크기내 길이 가중 + 경험치(cm, 지역보정)"""
     if not place:
         return "⚠️ 먼저 장소를 설정해주세요. (/장소 바다 or /장소 민물)"
     if len(user["bag"]) >= user["max_slot"]:
         return f"⚠️ 가방이 가득 찼습니다. ({len(user['bag'])}/{user['max_slot']}칸)\\n\\n{bag_text(user)}"
 
-    size = pick_size_with_miss()
-    if size is None:
+    # 유저별 난수 스트림 — 카운터를 유저 데이터에 저장해 재시도/리플레이에도 같은 결과
+    rnd = rng.stream(user_id, user.get("rng", 0))
+    roll = roll_catch(rnd, place)
+    user["rng"] = rnd.counter
+    if roll is None:
         return "💨 허탕쳤습니다... 아무것도 잡히지 않았습니다!"
-
-    # 해당 크기에서 어종 선택
-    fish_info = random.choice(FISH_POOL[place][size])
-    fish_name, min_len, max_len = fish_info
-
-    # 크기별 길이 가중치 적용
-    if size == "소형":
-        length = _weighted_length(min_len, max_len, SLOPE_SMALL)
-    elif size == "중형":
-        length = _weighted_length(min_len, max_len, SLOPE_MED)
-    else:
-        length = _weighted_length(min_len, max_len, SLOPE_LARGE)
-
-    # 경험치(cm) + 지역 보정, 골드는 지급하지 않음
-    exp = get_exp_by_length(size, length, place)
-    user["exp"] += exp
+    fish_name, size, length = roll
+    exp = land_catch(user, fish_name, size, length, place)
 
     # 미끼 잔량(일반/제한) 표시값
     k_n, k_l = bait_keys(bait_type)
     normal_left = user["inventory"].get(k_n, 0)
     limit_left = user["inventory"].get(k_l, 0)
 
-    fish_obj = {
-        "name": fish_name,
-        "length": length,
-        "size": size,
-        "place": place,
-        "time": datetime.now(ZoneInfo("Asia/Seoul")).strftime("%Y-%m-%d %H:%M"),
-    }
-    user["bag"].append(fish_obj)
-    user["record"].append(fish_obj)
-
     msg = [
         "뭔가.... 걸린..것 ...같다!",
         "",
@@ -407,6 +609,50 @@ def resolve_fishing_result(user: dict, place: str, bait_type: str) -> str:
         bag_text(user),
     ]
     return "\\n".join(msg)
+
+def resolve_multi_cast(user_id: str, user: dict, cast: dict) -> str:
+    """연속낚시 결과: count 번을 한 트랜잭션에서 판정하고 요약 한 통으로 돌려줍니다.
+    가방이 차면 남은 횟수는 던지지 않은 것으로 보고 미끼를 돌려줍니다."""
+    place, bait_type, count = cast["place"], cast["bait"], cast["count"]
+    rnd = rng.stream(user_id, user.get("rng", 0))
+    caught, misses, exp_total, thrown = [], 0, 0, 0
+    for _ in range(count):
+        if len(user["bag"]) >= user["max_slot"]:
+            break
+        thrown += 1
+        roll = roll_catch(rnd, place)
+        if roll is None:
+            misses += 1
+            continue
+        exp_total += land_catch(user, *roll, place)
+        caught.append(roll)
+    user["rng"] = rnd.counter
+
+    # 던지지 않은 만큼 미끼 반환 (소비 순서의 역순: 일반 → 거래불가)
+    refund = count - thrown
+    k_n, k_l = bait_keys(bait_type)
+    used = cast.get("used", {})
+    back_n = min(refund, used.get("normal", 0))
+    user["inventory"][k_n] = user["inventory"].get(k_n, 0) + back_n
+    user["inventory"][k_l] = user["inventory"].get(k_l, 0) + refund - back_n
+
+    msg = [f"🎣 연속낚시 {count}회 결과", f"성공 {len(caught)}마리 | 허탕 {misses}회"]
+    for fish_name, size, length in caught:
+        msg.append(f"- {fish_name} {length}cm ({size}어종)")
+    if refund:
+        msg.append(f"⚠️ 가방이 가득 차 {refund}회는 던지지 않았습니다. ({bait_type} {refund}개 반환)")
+    msg.append(f"획득: ✨+{exp_total} Exp | 장소: {place}")
+    msg.append(f"| {bait_type}(골드(거래불가) {user['inventory'].get(k_l, 0)}개 남음)")
+    msg.append(f"| {bait_type}(일반골드 {user['inventory'].get(k_n, 0)}개 남음)")
+    msg.append("")
+    msg.append(bag_text(user))
+    return "\n".join(msg)
+
+def resolve_cast(user_id: str, user: dict, cast: dict) -> str:
+    if cast.get("count", 1) > 1:
+        return resolve_multi_cast(user_id, user, cast)
+    return resolve_fishing_result(user_id, user, cast["place"], cast["bait"])
+
 def handle_buy(user: dict, name: str, amount_txt: str) -> str:
     """구매 로직: 지렁이/떡밥은 일반골드 전용, (거래불가) 버전은 제한골드 전용."""
     if name not in SHOP_PRICE:
@@ -423,28 +669,36 @@ def handle_buy(user: dict, name: str, amount_txt: str) -> str:
         if user["gold"] < total_price:
             return f"⚠️ 골드가 부족합니다. (부족: {total_price - user['gold']})"
         user["gold"] -= total_price
+        emit("sink", "gold", total_price, "buy")
         added = add_bait_with_limit(user, "지렁이_normal", amount)
+        emit("buy", "지렁이", added)
         if added < amount:
             return f"⚠️ 지렁이는 최대 50개까지 보유 가능합니다. {amount - added}개는 구매되지 않았습니다."
     elif name == "지렁이(거래불가)":
         if user["limit_gold"] < total_price:
             return f"⚠️ 골드(거래불가)가 부족합니다. (부족: {total_price - user['limit_gold']})"
         user["limit_gold"] -= total_price
+        emit("sink", "limit_gold", total_price, "buy")
         added = add_bait_with_limit(user, "지렁이_limit", amount)
+        emit("buy", "지렁이(거래불가)", added)
         if added < amount:
             return f"⚠️ 지렁이(거래불가)는 최대 50개까지 보유 가능합니다. {amount - added}개는 구매되지 않았습니다."
     elif name == "떡밥":
         if user["gold"] < total_price:
             return f"⚠️ 골드가 부족합니다. (부족: {total_price - user['gold']})"
         user["gold"] -= total_price
+        emit("sink", "gold", total_price, "buy")
         added = add_bait_with_limit(user, "떡밥_normal", amount)
+        emit("buy", "떡밥", added)
         if added < amount:
             return f"⚠️ 떡밥은 최대 50개까지 보유 가능합니다. {amount - added}개는 구매되지 않았습니다."
     elif name == "떡밥(거래불가)":
         if user["limit_gold"] < total_price:
             return f"⚠️ 골드(거래불가)가 부족합니다. (부족: {total_price - user['limit_gold']})"
         user["limit_gold"] -= total_price
+        emit("sink", "limit_gold", total_price, "buy")
         added = add_bait_with_limit(user, "떡밥_limit", amount)
+        emit("buy", "떡밥(거래불가)", added)
         if added < amount:
             return f"⚠️ 떡밥(거래불가)는 최대 50개까지 보유 가능합니다. {amount - added}개는 구매되지 않았습니다."
     else:
@@ -453,6 +707,8 @@ def handle_buy(user: dict, name: str, amount_txt: str) -> str:
             return f"⚠️ 골드가 부족합니다. (부족: {total_price - user['gold']})"
         user["gold"] -= total_price
         user["items"][name] = user["items"].get(name, 0) + amount
+        emit("sink", "gold", total_price, "buy")
+        emit("buy", name, amount)
 
     return (
         f"✅ 구매 완료\n"
@@ -491,6 +747,7 @@ def handle_sell(user: dict, name: str, amount_txt: str) -> str:
 
     earn = SHOP_PRICE[name] * amount // 2
     user["gold"] += earn
+    emit("mint", "gold", earn, "sell")
     return f"✅ 판매 완료: {name} x{amount} → 💰{earn}\n현재 Gold: 💰{user['gold']}"
 
 def check_in(user: dict) -> str:
@@ -513,6 +770,7 @@ def check_in(user: dict) -> str:
     if reward > 0:
         user["limit_gold"] += reward
         user["last_checkin"] = today_str
+        emit("mint", "limit_gold", reward, "checkin")
         return f"✅ 출석 완료! ({title}) 골드(거래불가) {reward}이 지급되었습니다.\n(현재 골드(거래불가): {user['limit_gold']})"
     return "⚠️ 출석 보상을 지급할 수 없습니다."
 
@@ -524,12 +782,16 @@ def set_place(user: dict, place_txt: str) -> str:
     user["place"] = place
     return f"🌊 낚시 장소가 [{place}]로 설정되었습니다."
 
-def set_nickname(user: dict, nick: str) -> str:
-    """닉네임 설정 로직을 처리합니다."""
+def set_nickname(user: dict, nick: str, user_id: str) -> str:
+    """닉네임 설정 로직을 처리합니다. 닉네임은 서버 전체에서 유일해야 합니다."""
     if user["nickname"]:
         return "⚠️ 닉네임은 이미 설정되어 있어 변경할 수 없습니다."
-    user["nickname"] = nick.strip()
+    nick = nick.strip()
+    if not store.claim_nickname(nick, user_id):
+        return f"⚠️ '{nick}' 은(는) 이미 사용 중인 닉네임입니다. 다른 이름을 입력해주세요."
+    user["nickname"] = nick
     user["limit_gold"] += 2000
+    emit("mint", "limit_gold", 2000, "nickname")
     return (
         f"✅ 닉네임 설정 완료: {user['nickname']}\n"
         f"보너스 2000골드(거래불가)가 지급되었습니다!\n\n"
@@ -540,14 +802,16 @@ def handle_master(user: dict, parts: list) -> str:
     if len(parts) < 4:
         return "사용법: /마스터 [닉네임] [항목] [값]"
 
-    target_nick, field, value = parts[1], parts[2], parts[3]
-    target_user = None
-    for uid, udata in users.items():
-        if udata.get("nickname") == target_nick:
-            target_user = udata
-            break
-    if not target_user:
+    target_nick = parts[1]
+    target_id = store.find_by_nickname(target_nick)
+    if not target_id:
         return f"⚠️ 닉네임 '{target_nick}' 을(를) 찾을 수 없습니다."
+    # 대상 유저는 이 트랜잭션이 커밋되고 잠금을 놓은 뒤 따로 바꾼다 (서로를 동시에 바꿔도 교착 없음)
+    _tx.after.append(lambda: _run_command(target_id, lambda target: _apply_master(target, parts)))
+    return ""
+
+def _apply_master(target_user: dict, parts: list) -> str:
+    target_nick, field, value = parts[1], parts[2], parts[3]
 
     def parse_delta(val: str):
         if val.startswith(("+", "-")):
@@ -564,9 +828,12 @@ def handle_master(user: dict, parts: list) -> str:
 
     if field == "골드":
         num, is_delta = parse_delta(value)
+        before = target_user["gold"]
         target_user["gold"] += num
         if target_user["gold"] < 0:
             target_user["gold"] = 0
+        delta = target_user["gold"] - before
+        emit("mint" if delta > 0 else "sink", "gold", abs(delta), "master")
         return f"✅ {target_nick}님의 골드가 {num:+} 되었습니다. (현재: {target_user['gold']})"
 
     if field == "경험치":
@@ -581,6 +848,7 @@ def handle_master(user: dict, parts: list) -> str:
             item = value[1:]
             target_user.setdefault("items", {})
             target_user["items"][item] = target_user["items"].get(item, 0) + 1
+            emit("grant", item, 1, "master")
             return f"✅ {target_nick}님께 '{item}' 장비를 지급했습니다."
         elif value.startswith("-"):
             item = value[1:]
@@ -594,6 +862,7 @@ def handle_master(user: dict, parts: list) -> str:
             item = value[1:]
             target_user.setdefault("items", {})
             target_user["items"][item] = target_user["items"].get(item, 0) + 1
+            emit("grant", item, 1, "master")
             return f"✅ {target_nick}님께 '{item}' 아이템을 지급했습니다."
         elif value.startswith("-"):
             item = value[1:]
@@ -605,217 +874,422 @@ def handle_master(user: dict, parts: list) -> str:
     return "⚠️ 지원하지 않는 항목입니다."
 
 # ---------------- 메인 명령어 핸들러 ----------------
+# 명령어 → 핸들러 표(router). 핸들러는 (user_id, user, *args) 를 받는다.
+
+router = Router(
+    empty=lambda user_id, user: home_text(user),
+    unknown=lambda user_id, user: "알 수 없는 명령어입니다. '/도움말'을 확인하세요.",
+)
+
+metrics.counter("fishing_commands_total", "처리한 명령어 수")
+metrics.histogram("fishing_command_seconds", "handle_command 처리 시간")
+metrics.counter("fishing_command_errors_total", "handle_command 예외 (type=예외 클래스)")
+_COMMAND_LABELS = {}
+_OTHER_LABEL = (("command", "other"),)
+
+def _command_label(utter: str):
+    """라벨은 등록된 명령어 이름만 쓴다 (확인 응답·오타 등은 other)."""
+    head = utter.split(None, 1)[0] if utter and utter.strip() else "/"
+    label = _COMMAND_LABELS.get(head)
+    if label is None:
+        if router.route(head) is None:
+            return _OTHER_LABEL
+        label = _COMMAND_LABELS[head] = (("command", head),)
+    return label
 
 def handle_command(user_id: str, utter: str) -> str:
-    """입력된 명령어를 분석하고 적절한 함수를 호출합니다."""
+    """입력된 명령어를 분석하고 적절한 함수를 호출합니다.
+    유저 단위 트랜잭션으로 실행되며, 변경된 경우에만 저장소에 기록됩니다."""
+    label = _command_label(utter)
+    t = time.perf_counter()
+    try:
+        return _run_command(user_id, lambda user: router.dispatch(utter, user_id, user))
+    except Exception as e:
+        metrics.inc("fishing_command_errors_total", label + (("type", type(e).__name__),))
+        raise
+    finally:
+        metrics.inc("fishing_commands_total", label)
+        metrics.observe("fishing_command_seconds", time.perf_counter() - t, label)
+
+def skill_command(user_id: str, utter: str) -> str:
+    """/skill 한 건. 캡처가 켜져 있으면 받은 시각과 보낸 응답을 함께 남긴다 (리플레이 검증용)."""
+    if request_log is None:
+        return handle_command(user_id, utter)
+    ts, reply = time.time(), None
+    try:
+        reply = handle_command(user_id, utter)
+        return reply
+    finally:
+        request_log.append(user_id, utter, reply, ts)
+
+def _run_command(user_id: str, body) -> str:
+    """body(user) 를 유저 트랜잭션으로 실행하고, 커밋된 뒤에 부수효과를 반영합니다."""
+    reply = store.transact(user_id, lambda: _begin(user_id, body), new_user)
+    # 충돌로 재시도된 시도의 부수효과는 버려졌으므로, 커밋된 마지막 시도분만 반영
+    if catch_log is not None:
+        for fish in _tx.catches:
+            catch_log.append(user_id, fish)
+    for uid, user in _tx.touched.items():
+        leaderboards.observe(uid, user)
+    if _tx.events:
+        econ.emit_many(_tx.events)
+    if cast_timer is not None:
+        for uid, due, token in _tx.casts:
+            cast_timer.schedule(uid, due, token)
+    # 다른 유저를 건드리는 작업은 잠금을 놓은 뒤에 (각자 자기 트랜잭션으로)
+    for fn in _tx.after:
+        extra = fn()
+        if extra:
+            reply = f"{reply}\n{extra}" if reply else extra
+    return reply
+
+def _begin(user_id: str, body) -> str:
     user = get_user(user_id)
-
-    # 개별 판매 확인 단계 처리
-    if user.get("pending_sell_index") is not None:
-        if utter.strip() == "예":
-            idx = user["pending_sell_index"]
-            if idx >= len(user["bag"]):
-                user["pending_sell_index"] = None
-                return "⚠️ 해당 슬롯에 물고기가 없습니다."
-            fish = user["bag"].pop(idx)
-            price = calc_sell_price(fish)
-            user["gold"] += price
-            user["pending_sell_index"] = None
-            return f"✅ 판매 완료: {fish['name']} {fish['length']}cm → 💰{price}\n현재 Gold: 💰{user['gold']}"
-        elif utter.strip() == "아니오":
+    _tx.catches = []
+    _tx.touched = {user_id: user}
+    _tx.after = []
+    _tx.events = []
+    _tx.casts = []
+    return body(user)
+
+# ---------------- 캐스팅 타이머 ----------------
+# 만료된 캐스팅은 타이머 스레드가 바로 결과를 계산해 캐스팅 항목에 넣어 두고, /챔질 은 꺼내기만 한다.
+# FISHING_CAST_AUTO=1 이면 결과가 나온 캐스팅은 /챔질 없이도 끝난 것으로 보고 바로 다시 던질 수 있다
+# (아직 보여주지 않은 결과는 새 캐스팅 응답 앞에 붙인다). FISHING_CAST_TIMER=0 이면 예전처럼 /챔질 때 계산.
+CAST_AUTO = os.environ.get("FISHING_CAST_AUTO") == "1"
+
+def _resolve_due_cast(user_id: str, token):
+    cast = (store.get(user_id, dict) or {}).get("casting")
+    if not cast or cast["start"] != token or "result" in cast:
+        return None   # 이미 챔질했거나 다시 던졌거나 초기화됨
+
+    def body(user):
+        cast = user.get("casting")
+        if not cast or cast["start"] != token or "result" in cast:
+            return None
+        cast["result"] = resolve_cast(user_id, user, cast)
+        return cast["result"]
+    return _run_command(user_id, body)
+
+cast_timer = casttimer.CastTimer(_resolve_due_cast) if os.environ.get("FISHING_CAST_TIMER", "1") != "0" else None
+
+# 개별 판매 확인 단계 처리
+@router.middleware
+def _pending_sell(user_id, user, text):
+    if user.get("pending_sell_index") is None:
+        return None
+    if text == "예":
+        idx = user["pending_sell_index"]
+        if idx >= len(user["bag"]):
             user["pending_sell_index"] = None
-            return "❌ 판매가 취소되었습니다."
-
-    # 일괄판매 확인 단계 처리
-    if user.get("bulk_sell_pending"):
-        if utter.strip() == "네":
-            sold_count = len(user["bag"]) + len(user["net"])
-            total_gold = sum(calc_sell_price(fish) for fish in user["bag"])
-            total_gold += sum(calc_sell_price(fish) for fish in user["net"])
-            user["gold"] += total_gold
-            user["bag"].clear()
-            user["net"].clear()
-            user["bulk_sell_pending"] = False
-            return f"✅ 모든 물고기 {sold_count}마리를 판매했습니다.\n획득 Gold: 💰{total_gold}\n현재 Gold: 💰{user['gold']}"
-        elif utter.strip() == "아니오":
-            user["bulk_sell_pending"] = False
-            return "❌ 일괄판매가 취소되었습니다."
-
-    parts = utter.strip().split()
-    if not parts:
-        return home_text(user)
-    command = parts[0]
-
-    if command in ("/", "/홈"):
-        return home_text(user)
-    if command == "/마스터":
-        return handle_master(user, parts)
-    if command == "/도움말":
-        return help_text()
-
-    if user["nickname"] is None and command != "/닉네임":
+            return "⚠️ 해당 슬롯에 물고기가 없습니다."
+        fish = user["bag"].pop(idx)
+        price = calc_sell_price(fish)
+        user["gold"] += price
+        user["pending_sell_index"] = None
+        emit("mint", "gold", price, "fish_sell")
+        return f"✅ 판매 완료: {fish['name']} {fish['length']}cm → 💰{price}\n현재 Gold: 💰{user['gold']}"
+    elif text == "아니오":
+        user["pending_sell_index"] = None
+        return "❌ 판매가 취소되었습니다."
+    return None
+
+# 일괄판매 확인 단계 처리
+@router.middleware
+def _pending_bulk_sell(user_id, user, text):
+    if not user.get("bulk_sell_pending"):
+        return None
+    if text == "네":
+        sold_count = len(user["bag"]) + len(user["net"])
+        total_gold = sum(calc_sell_price(fish) for fish in user["bag"])
+        total_gold += sum(calc_sell_price(fish) for fish in user["net"])
+        user["gold"] += total_gold
+        emit("mint", "gold", total_gold, "bulk_sell")
+        user["bag"].clear()
+        user["net"].clear()
+        user["bulk_sell_pending"] = False
+        return f"✅ 모든 물고기 {sold_count}마리를 판매했습니다.\n획득 Gold: 💰{total_gold}\n현재 Gold: 💰{user['gold']}"
+    elif text == "아니오":
+        user["bulk_sell_pending"] = False
+        return "❌ 일괄판매가 취소되었습니다."
+    return None
+
+# 구매 대기 상태 확인
+@router.middleware
+def _pending_buy(user_id, user, text):
+    pb = user.get("pending_buy")
+    if not pb:
+        return None
+    if pb["step"] == "choose_type":
+        if text in ("1", "1번"):
+            pb["choice"] = pb["item"] + "(일반)"
+            pb["step"] = "choose_amount"
+            return "몇 개를 구매하시겠습니까? (숫자만 입력)"
+        elif text in ("2", "2번"):
+            pb["choice"] = pb["item"] + "(거래불가)"
+            pb["step"] = "choose_amount"
+            return "몇 개를 구매하시겠습니까? (숫자만 입력)"
+        else:
+            return "⚠️ 1 또는 2번으로 선택해주세요."
+    elif pb["step"] == "choose_amount":
+        amount = parse_amount(text)
+        if amount <= 0:
+            return "⚠️ 구매할 개수를 숫자로 입력해주세요."
+        choice_name = pb["choice"].replace("(일반)", "").replace("(거래불가)", "(거래불가)")
+        user["pending_buy"] = None
+        return handle_buy(user, choice_name, str(amount))
+    return None
+
+# 닉네임이 없으면 public 명령어만 허용
+@router.guard
+def _require_nickname(route, user_id, user):
+    if user["nickname"] is None and not (route and route.meta.get("public")):
         return "⚠️ 먼저 /닉네임 [이름] 명령어로 닉네임을 설정해주세요."
+    return None
 
-    if command == "/닉네임":
-        return set_nickname(user, " ".join(parts[1:])) if len(parts) > 1 else "사용법: /닉네임 [원하는 이름]"
-    if command == "/장소":
-        return set_place(user, parts[1]) if len(parts) > 1 else "사용법: /장소 [바다|민물]"
-    if command == "/상점":
-        return shop_text()
-    
-    if command == "/구매":
-    # 구매 대기 상태 확인
-    if user.get("pending_buy"):
-        pb = user["pending_buy"]
-        if pb["step"] == "choose_type":
-            if utter.strip() in ("1", "1번"):
-                pb["choice"] = pb["item"] + "(일반)"
-                pb["step"] = "choose_amount"
-                return "몇 개를 구매하시겠습니까? (숫자만 입력)"
-            elif utter.strip() in ("2", "2번"):
-                pb["choice"] = pb["item"] + "(거래불가)"
-                pb["step"] = "choose_amount"
-                return "몇 개를 구매하시겠습니까? (숫자만 입력)"
-            else:
-                return "⚠️ 1 또는 2번으로 선택해주세요."
-        elif pb["step"] == "choose_amount":
-            amount = parse_amount(utter)
-            if amount <= 0:
-                return "⚠️ 구매할 개수를 숫자로 입력해주세요."
-            choice_name = pb["choice"].replace("(일반)", "").replace("(거래불가)", "(거래불가)")
-            user["pending_buy"] = None
-            return handle_buy(user, choice_name, str(amount))
-
-    if len(parts) < 2:
-        return "사용법: /구매 [이름] [갯수]"
+@router.command("/", "/홈", public=True)
+def _cmd_home(user_id, user, *args):
+    return home_text(user)
+
+@router.command("/마스터", public=True)
+def _cmd_master(user_id, user, *args):
+    return handle_master(user, ["/마스터", *args])
+
+@router.command("/도움말", public=True)
+def _cmd_help(user_id, user, *args):
+    return static_reply("help", help_text)
 
-    item = parts[1]
+@router.command("/닉네임", min_args=1, rest=True, usage="사용법: /닉네임 [원하는 이름]", public=True)
+def _cmd_nickname(user_id, user, nick):
+    return set_nickname(user, nick, user_id)
+
+@router.command("/장소", min_args=1, usage="사용법: /장소 [바다|민물]")
+def _cmd_place(user_id, user, place, *args):
+    return set_place(user, place)
+
+@router.command("/상점")
+def _cmd_shop(user_id, user, *args):
+    return static_reply("shop", shop_text, SHOP_PRICE)
+
+@router.command("/구매", min_args=1, usage="사용법: /구매 [이름] [갯수]")
+def _cmd_buy(user_id, user, item, *args):
     # 번호 입력 처리
     if item in SHOP_NUM_MAP:
         mapped_item = SHOP_NUM_MAP[item]
         if mapped_item in ("지렁이", "떡밥"):
             user["pending_buy"] = {"item": mapped_item, "step": "choose_type"}
             return (
-    f"무엇을 구매하시겠습니까?
-"
-    f"1) {mapped_item}(일반)
-"
-    f"2) {mapped_item}(거래불가)
-"
-    f"(1 또는 2번을 입력하세요)"
-)
+                f"무엇을 구매하시겠습니까?\n"
+                f"1) {mapped_item}(일반)\n"
+                f"2) {mapped_item}(거래불가)\n"
+                f"(1 또는 2번을 입력하세요)"
+            )
         else:
             user["pending_buy"] = {"item": mapped_item, "choice": mapped_item, "step": "choose_amount"}
             return (
-    f"선택하신 아이템은 '{mapped_item}' 입니다.
-"
-    f"몇 개를 구매하시겠습니까? (숫자만 입력)"
-)
+                f"선택하신 아이템은 '{mapped_item}' 입니다.\n"
+                f"몇 개를 구매하시겠습니까? (숫자만 입력)"
+            )
 
-    if len(parts) < 3:
+    if not args:
         return "사용법: /구매 [이름] [갯수]"
-    return handle_buy(user, parts[1], parts[2])
-
-# (중복된 /구매 블록 제거됨)
-    if command == "/일괄판매":
-        if not user["bag"] and not user["net"]:
-            return "⚠️ 판매할 물고기가 없습니다."
-        user["bulk_sell_pending"] = True
-        lines = ["📦 가방에 있는 물고기 목록"]
-        for i, fish in enumerate(user["bag"], start=1):
-            lines.append(f"{i}. {fish['name']} {fish['length']}cm ({fish['size']}어종, {fish['place']})")
-        if any(item.get("name") == "어망" for item in user["bag"]):
-            lines.append("⚠️ 주의! 어망에 있는 물고기도 일괄 판매됩니다.")
-        lines.append("\n모든 물고기를 일괄판매 하시겠습니까? (네/아니오)")
-        return "\n".join(lines)
-    if command == "/판매":
-        if len(parts) >= 3 and parts[1] == "가방":
-            try:
-                idx = int(parts[2]) - 1
-                if idx < 0 or idx >= len(user["bag"]):
-                    return "⚠️ 해당 슬롯에 물고기가 없습니다."
-                fish = user["bag"][idx]
-                user["pending_sell_index"] = idx
-                return f"📦 선택한 물고기: {fish['name']} {fish['length']}cm ({fish['size']}어종, {fish['place']})\n정말로 판매하시겠습니까? (예/아니오)"
-            except ValueError:
-                return "⚠️ 숫자를 입력해주세요. 예) /판매 가방 2"
-        if len(parts) < 3:
-            return "사용법: /판매 [이름] [수량]"
-        return handle_sell(user, parts[1], parts[2])
-    if command == "/출석":
-        return check_in(user)
-    if command == "/가방":
-        return bag_text(user)
-    if command == "/기록":
-        return record_text(user)
-    if command == "/상태":
-        return (
-            f"[{get_title(user['level'])}] {user['nickname']}\n"
-            f"Lv.{user['level']}  Exp: {user['exp']}/100\n"
-            f"Gold: 💰{user['gold']} | 골드(거래불가): 💰{user['limit_gold']}\n"
-            f"착용 낚싯대: 철제 낚싯대\n\n{bag_text(user)}"
-        )
-    if command == "/어망":
-        if not user["net"]:
-            return "🪣 어망이 비어있습니다."
-        lines = [f"🪣 어망 ({len(user['net'])}/20)"]
-        for i, fish in enumerate(user["net"], start=1):
-            lines.append(f"{i}. {fish['name']} {fish['length']}cm ({fish['size']}어종, {fish['place']})")
-        return "\n".join(lines)
-    if command == "/칭호":
-        return (
-            "📜 칭호 구간 안내\n\n"
-            "Lv. 1 ~ 40  → 🐟 낚린이\n"
-            "Lv. 41 ~ 69 → 🎣 낚시인\n"
-            "Lv. 70 ~ 99 → 🐠 프로낚시꾼\n"
-            "Lv. 100 이상 → 🐳 강태공"
-        )
-    if command == "/낚시":
-        if len(parts) < 2:
-            return "사용법: /낚시 [1~60]초"
-        sec = parse_amount(parts[1])
-        if not 1 <= sec <= 60:
-            return "⚠️ 1~60초 사이로 입력해주세요."
-        if not user.get("place"):
-            return "⚠️ 먼저 장소를 설정해주세요. (/장소 바다 or /장소 민물)"
-        if len(user["bag"]) >= user["max_slot"]:
-            return f"⚠️ 가방이 가득 찼습니다. ({len(user['bag'])}/{user['max_slot']}칸)\n\n{bag_text(user)}"
-        if user.get("casting"):
-            elapsed = int(time.time() - user["casting"]["start"])
-            remain = max(0, user["casting"]["wait"] - elapsed)
-            return f"⚠️ 이미 캐스팅 중입니다! 남은 {remain}초 후 /챔질 하세요."
-        bait_type = "지렁이" if user["place"] == "바다" else "떡밥"
-        if bait_total(user, bait_type) <= 0:
-            return f"⚠️ {bait_type}가 부족합니다. 상점에서 구매해주세요."
-        consume_bait(user, bait_type, prefer="limit_first")
-        user["casting"] = {"start": time.time(), "wait": sec, "bait": bait_type, "place": user["place"]}
-        return f"🎣 캐스팅...! {sec}초 후에 /챔질 하세요."
-    if command == "/챔질":
-        cast = user.get("casting")
-        if not cast:
-            return "⚠️ 먼저 /낚시로 캐스팅부터 해주세요."
-        elapsed = time.time() - cast["start"]
-        wait = cast["wait"]
-        if elapsed < wait:
-            remain = int(wait - elapsed)
-            return f"⏳ 아직 챔질할 수 없습니다. 남은 시간: {remain}초"
+    return handle_buy(user, item, args[0])
+
+@router.command("/일괄판매")
+def _cmd_bulk_sell(user_id, user, *args):
+    if not user["bag"] and not user["net"]:
+        return "⚠️ 판매할 물고기가 없습니다."
+    user["bulk_sell_pending"] = True
+    lines = ["📦 가방에 있는 물고기 목록"]
+    for i, fish in enumerate(user["bag"], start=1):
+        lines.append(f"{i}. {fish['name']} {fish['length']}cm ({fish['size']}어종, {fish['place']})")
+    if any(item.get("name") == "어망" for item in user["bag"]):
+        lines.append("⚠️ 주의! 어망에 있는 물고기도 일괄 판매됩니다.")
+    lines.append("\n모든 물고기를 일괄판매 하시겠습니까? (네/아니오)")
+    return "\n".join(lines)
+
+@router.command("/판매", min_args=2, usage="사용법: /판매 [이름] [수량]")
+def _cmd_sell(user_id, user, name, amount, *args):
+    if name == "가방":
+        try:
+            idx = int(amount) - 1
+            if idx < 0 or idx >= len(user["bag"]):
+                return "⚠️ 해당 슬롯에 물고기가 없습니다."
+            fish = user["bag"][idx]
+            user["pending_sell_index"] = idx
+            return f"📦 선택한 물고기: {fish['name']} {fish['length']}cm ({fish['size']}어종, {fish['place']})\n정말로 판매하시겠습니까? (예/아니오)"
+        except ValueError:
+            return "⚠️ 숫자를 입력해주세요. 예) /판매 가방 2"
+    return handle_sell(user, name, amount)
+
+@router.command("/출석")
+def _cmd_check_in(user_id, user, *args):
+    return check_in(user)
+
+@router.command("/가방")
+def _cmd_bag(user_id, user, *args):
+    return bag_text(user)
+
+@router.command("/기록")
+def _cmd_record(user_id, user, *args):
+    return record_text(user)
+
+@router.command("/상태")
+def _cmd_status(user_id, user, *args):
+    return (
+        f"[{get_title(user['level'])}] {user['nickname']}\n"
+        f"Lv.{user['level']}  Exp: {user['exp']}/100\n"
+        f"Gold: 💰{user['gold']} | 골드(거래불가): 💰{user['limit_gold']}\n"
+        f"착용 낚싯대: 철제 낚싯대\n\n{bag_text(user)}"
+    )
+
+@router.command("/어망")
+def _cmd_net(user_id, user, *args):
+    if not user["net"]:
+        return "🪣 어망이 비어있습니다."
+    lines = [f"🪣 어망 ({len(user['net'])}/20)"]
+    for i, fish in enumerate(user["net"], start=1):
+        lines.append(f"{i}. {fish['name']} {fish['length']}cm ({fish['size']}어종, {fish['place']})")
+    return "\n".join(lines)
+
+@router.command("/칭호")
+def _cmd_titles(user_id, user, *args):
+    return static_reply("titles", titles_text)
+
+def _cast_blocked(user: dict, sec: int):
+    """캐스팅을 시작할 수 없는 이유(메시지) 또는 None."""
+    if not 1 <= sec <= 60:
+        return "⚠️ 1~60초 사이로 입력해주세요."
+    if not user.get("place"):
+        return "⚠️ 먼저 장소를 설정해주세요. (/장소 바다 or /장소 민물)"
+    if len(user["bag"]) >= user["max_slot"]:
+        return f"⚠️ 가방이 가득 찼습니다. ({len(user['bag'])}/{user['max_slot']}칸)\n\n{bag_text(user)}"
+    cast = user.get("casting")
+    if cast and not (CAST_AUTO and "result" in cast):
+        elapsed = int(time.time() - cast["start"])
+        remain = max(0, cast["wait"] - elapsed)
+        return f"⚠️ 이미 캐스팅 중입니다! 남은 {remain}초 후 /챔질 하세요."
+    return None
+
+def _start_cast(user_id: str, user: dict, wait: int, bait_type: str, **extra) -> str:
+    """새 캐스팅을 건다. 덮어쓰는 캐스팅에 아직 보여주지 않은 결과(CAST_AUTO)가 있으면
+    그 결과를 응답 앞에 붙일 텍스트로 돌려준다."""
+    prev = user.get("casting")
+    unseen = f"{prev['result']}\n\n" if prev and "result" in prev else ""
+    start = time.time()
+    user["casting"] = {"start": start, "wait": wait, "bait": bait_type, "place": user["place"], **extra}
+    _tx.casts.append((user_id, start + wait, start))
+    return unseen
+
+@router.command("/낚시", min_args=1, usage="사용법: /낚시 [1~60]초")
+def _cmd_cast(user_id, user, sec_text, *args):
+    sec = parse_amount(sec_text)
+    blocked = _cast_blocked(user, sec)
+    if blocked:
+        return blocked
+    bait_type = "지렁이" if user["place"] == "바다" else "떡밥"
+    if bait_total(user, bait_type) <= 0:
+        return f"⚠️ {bait_type}가 부족합니다. 상점에서 구매해주세요."
+    consume_bait(user, bait_type, prefer="limit_first")
+    unseen = _start_cast(user_id, user, sec, bait_type)
+    return f"{unseen}🎣 캐스팅...! {sec}초 후에 /챔질 하세요."
+
+# 연속낚시: 캐스팅 N번을 한 번에 던지고 (대기 N×초) /챔질 한 번으로 결과를 요약해서 받는다
+MULTI_CAST_MAX = 10
+
+@router.command("/연속낚시", min_args=2, usage=f"사용법: /연속낚시 [2~{MULTI_CAST_MAX}]회 [1~60]초")
+def _cmd_multi_cast(user_id, user, count_text, sec_text, *args):
+    count = parse_amount(count_text)
+    if not 2 <= count <= MULTI_CAST_MAX:
+        return f"⚠️ 연속낚시는 2~{MULTI_CAST_MAX}회까지 가능합니다."
+    sec = parse_amount(sec_text)
+    blocked = _cast_blocked(user, sec)
+    if blocked:
+        return blocked
+    bait_type = "지렁이" if user["place"] == "바다" else "떡밥"
+    have = bait_total(user, bait_type)
+    if have < count:
+        return f"⚠️ {bait_type}가 부족합니다. (필요 {count}개, 보유 {have}개)"
+    used = {"limit": 0, "normal": 0}
+    for _ in range(count):
+        used[consume_bait(user, bait_type, prefer="limit_first")] += 1
+    unseen = _start_cast(user_id, user, sec * count, bait_type, count=count, used=used)
+    return f"{unseen}🎣 연속 캐스팅 {count}회...! {sec * count}초 후에 /챔질 하세요."
+
+@router.command("/챔질")
+def _cmd_reel(user_id, user, *args):
+    cast = user.get("casting")
+    if not cast:
+        return "⚠️ 먼저 /낚시로 캐스팅부터 해주세요."
+    if "result" in cast:
+        # 타이머가 만료 시점에 미리 계산해 둔 결과
         user["casting"] = None
-        return resolve_fishing_result(user, cast["place"], cast["bait"])
-    if command == "/초기화":
-        if len(parts) < 2:
-            return "사용법: /초기화 [닉네임]"
-        target_nick = parts[1]
-        target_id_to_delete = None
-        for uid, udata in users.items():
-            if udata.get("nickname") == target_nick:
-                target_id_to_delete = uid
-                break
-        if target_id_to_delete:
-            del users[target_id_to_delete]
-            return f"✅ '{target_nick}' 님의 데이터가 초기화되었습니다."
-        else:
-            return f"⚠️ '{target_nick}' 닉네임을 찾을 수 없습니다."
-    return "알 수 없는 명령어입니다. '/도움말'을 확인하세요."
+        return cast["result"]
+    elapsed = time.time() - cast["start"]
+    wait = cast["wait"]
+    if elapsed < wait:
+        remain = int(wait - elapsed)
+        return f"⏳ 아직 챔질할 수 없습니다. 남은 시간: {remain}초"
+    user["casting"] = None
+    return resolve_cast(user_id, user, cast)
+
+def _delete_user(uid: str):
+    store.delete(uid)
+    leaderboards.forget(uid)
+
+@router.command("/초기화", min_args=1, usage="사용법: /초기화 [닉네임]")
+def _cmd_reset(user_id, user, target_nick, *args):
+    target_id_to_delete = store.find_by_nickname(target_nick)
+    if target_id_to_delete:
+        _tx.after.append(lambda: _delete_user(target_id_to_delete))
+        return f"✅ '{target_nick}' 님의 데이터가 초기화되었습니다."
+    else:
+        return f"⚠️ '{target_nick}' 닉네임을 찾을 수 없습니다."
+
+@router.command("/유저검색", min_args=1, usage="사용법: /유저검색 [닉네임 앞부분]")
+def _cmd_search_users(user_id, user, prefix, *args):
+    found = store.search_nicknames(prefix, limit=20)
+    if not found:
+        return f"⚠️ '{prefix}'(으)로 시작하는 닉네임이 없습니다."
+    return "\n".join([f"🔎 '{prefix}' 검색 결과 ({len(found)}명)"] + [f"- {nick}" for nick, _ in found])
+
+def rank_text(board: str, title: str, fmt, user_id: str, k: int = 10) -> str:
+    rows = leaderboards.top(board, k)
+    if not rows:
+        return f"🏆 {title}\n아직 기록이 없습니다."
+    lines = [f"🏆 {title} TOP {len(rows)}"]
+    for i, (nick, score, detail) in enumerate(rows, start=1):
+        lines.append(f"{i}. {nick} {fmt(score, detail)}")
+    rank, total = leaderboards.rank(board, user_id)
+    if rank:
+        lines.append(f"\n내 순위: {rank}위 / {total}명")
+    return "\n".join(lines)
+
+RANK_BOARDS = {
+    "레벨": (leaderboard.LEVEL, "레벨 랭킹", lambda s, d: f"Lv.{s[0]} (Exp {s[1]})"),
+    "골드": (leaderboard.GOLD, "부자 랭킹", lambda s, d: f"💰{s[0]:,}"),
+}
+
+@router.command("/랭킹")
+def _cmd_rank(user_id, user, *args):
+    leaderboards.maybe_refresh(store.backend.rows)
+    what = " ".join(args)
+    if not what:
+        species = leaderboards.species()
+        return "\n\n".join([
+            rank_text(*RANK_BOARDS["레벨"], user_id, k=5),
+            rank_text(*RANK_BOARDS["골드"], user_id, k=5),
+            "어종별 최대어: /랭킹 [어종]\n" + (", ".join(species) if species else "(기록 없음)"),
+        ])
+    if what in RANK_BOARDS:
+        return rank_text(*RANK_BOARDS[what], user_id)
+    if what not in SPECIES_ID:
+        return "사용법: /랭킹 [레벨|골드|어종]"
+    return rank_text(leaderboard.SPECIES_PREFIX + what, f"{what} 최대어 랭킹",
+                     lambda s, d: f"{s[0]}cm ({d['time']})", user_id)
+
+# 기동 시 저장소 전체로 랭킹 구성 (캐시를 거치지 않고 백엔드 행을 바로 읽는다)
+leaderboards.rebuild(store.backend.rows())
 
 # ---------------- Flask 웹서버 부분 ----------------
 
@@ -855,18 +1329,35 @@ def index():
         result_html = f"<h2>결과</h2><pre>{reply}</pre>"
     return Response(HTML_PAGE.format(RESULT=result_html), mimetype="text/html; charset=utf-8")
 
+@app.route("/admin/economy")
+def admin_economy():
+    """분 단위 경제 집계. FISHING_ADMIN_TOKEN 을 X-Admin-Token 헤더(또는 ?token=)로 보내야 한다."""
+    token = os.environ.get("FISHING_ADMIN_TOKEN")
+    if not token or token not in (request.headers.get("X-Admin-Token"), request.args.get("token")):
+        return jsonify({"error": "forbidden"}), 403
+    minutes = max(1, min(econ.retention, request.args.get("minutes", 60, type=int)))
+    data = econ.summary(minutes)
+    data["pid"] = os.getpid()
+    return Response(fastjson.dumps(data), mimetype="application/json")
+
 @app.route("/skill", methods=["POST"])
 def skill():
     try:
-        data = request.get_json()
+        data = fastjson.loads(request.get_data())
         user_id = data['userRequest']['user']['id']
         utter = data['userRequest']['utterance']
-        reply_text = handle_command(user_id, utter)
-        response = {"version": "2.0", "template": {"outputs": [{"simpleText": {"text": reply_text}}]}}
-        return jsonify(response)
+        reply_text = skill_command(user_id, utter)
+        return Response(kakao_body(reply_text), mimetype="application/json")
     except Exception as e:
+        metrics.inc("fishing_skill_errors_total", (("type", type(e).__name__),))
         return jsonify({"error": str(e)}), 500
 
+metrics.counter("fishing_skill_errors_total", "/skill 500 응답 (type=예외 클래스)")
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8000, debug=True)
 
@@ -0,0 +1,114 @@
+# asgi.py
+"""/skill 웹훅의 ASGI 진입점.
+
+app:app(Flask, 동기 워커)과 같은 handle_command 를 asyncio 이벤트 루프에서 받는다.
+요청 수신/응답 전송은 루프가 처리하고, 저장소 I/O 가 들어있는 handle_command 만
+크기가 제한된 스레드 풀에서 실행한다. 대기 중인 요청 수도 상한을 두어
+이벤트 폭주 때 메모리가 무한히 늘지 않도록 503 으로 끊는다.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker --workers=2
+
+환경 변수
+    FISHING_ASGI_WORKERS      handle_command 실행 스레드 수 (기본 32)
+    FISHING_ASGI_MAX_PENDING  동시에 받아둘 수 있는 요청 수 (기본 4096)
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import fastjson
+import metrics
+from app import kakao_body, skill_command
+
+MAX_BODY = 64 * 1024
+
+WORKERS = int(os.environ.get("FISHING_ASGI_WORKERS", "32"))
+MAX_PENDING = int(os.environ.get("FISHING_ASGI_MAX_PENDING", "4096"))
+
+executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="skill")
+_pending = None  # asyncio.Semaphore — 루프가 뜬 뒤 생성
+
+
+def _skill_reply(data: dict) -> bytes:
+    user_id = data['userRequest']['user']['id']
+    utter = data['userRequest']['utterance']
+    return kakao_body(skill_command(user_id, utter))
+
+
+async def _send_json(send, status: int, obj):
+    await _send_body(send, status, fastjson.dumps(obj))
+
+
+async def _send_body(send, status: int, body: bytes):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _read_body(receive, send):
+    """본문 bytes. 연결이 끊겼거나 너무 커서 413 으로 이미 답했으면 None."""
+    chunks, size = [], 0
+    while True:
+        msg = await receive()
+        if msg["type"] == "http.disconnect":
+            return None
+        chunk = msg.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY:
+            await _send_json(send, 413, {"error": "request body too large"})
+            return None
+        chunks.append(chunk)
+        if not msg.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _skill(receive, send):
+    global _pending
+    if _pending is None:
+        _pending = asyncio.Semaphore(MAX_PENDING)
+    if _pending.locked():
+        return await _send_json(send, 503, {"error": "server busy"})
+    async with _pending:
+        try:
+            raw = await _read_body(receive, send)
+            if raw is None:
+                return
+            data = fastjson.loads(raw)
+            loop = asyncio.get_running_loop()
+            body = await loop.run_in_executor(executor, _skill_reply, data)
+        except Exception as e:
+            metrics.inc("fishing_skill_errors_total", (("type", type(e).__name__),))
+            return await _send_json(send, 500, {"error": str(e)})
+        await _send_body(send, 200, body)
+
+
+async def _lifespan(receive, send):
+    while True:
+        msg = await receive()
+        if msg["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif msg["type"] == "lifespan.shutdown":
+            executor.shutdown(wait=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+    if scope["path"] == "/skill" and scope["method"] == "POST":
+        return await _skill(receive, send)
+    if scope["path"] == "/metrics" and scope["method"] == "GET":
+        body = metrics.render().encode()
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", metrics.CONTENT_TYPE.encode()),
+                                (b"content-length", str(len(body)).encode())]})
+        return await send({"type": "http.response.body", "body": body})
+    await _send_json(send, 404, {"error": "not found"})
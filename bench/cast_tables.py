@@ -0,0 +1,112 @@
+# bench/cast_tables.py
+"""FishingGame 캐스팅 판정: 분기 계산(예전) vs 컴파일된 표 조회(roll_cast) 마이크로벤치.
+
+예전 resolve_fishing 의 판정 부분(grade_probs → 어종/사이즈 구간 → 시간/집어제/케미/
+낚싯대/레벨/조기 릴 보정 → 클램프 → 성공 판정)을 reference() 로 그대로 옮겨 두고,
+무작위 상태 조합에서 같은 난수 스트림으로 두 결과가 완전히 같은지 먼저 확인한 뒤 속도를 잰다.
+저장소 I/O 는 빼고 판정만 잰다.
+
+    python bench/cast_tables.py --check 200000 --number 200000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import game  # noqa: E402
+import rng   # noqa: E402
+
+
+def reference(g, rnd, spot, rod, lv, chem_grade, additive_ready, additive_active, secs, early):
+    """user-023 이전 resolve_fishing 의 판정 순서 그대로."""
+    P_SMALL, P_MED, P_LARGE = g.grade_probs(rod, additive_ready, bool(chem_grade), chem_grade, secs)
+    r = rnd.random()*100.0
+    if r <= P_SMALL:
+        grade = "소형"
+    elif r <= P_SMALL + P_MED:
+        grade = "중형"
+    else:
+        grade = "대형"
+
+    name, smin, smax = rnd.choice(g.fish_catalog[spot][grade])
+    r = rnd.random()
+    acc = 0.0
+    chosen_bin = "XS"
+    for b, w in g.SIZE_BINS:
+        acc += w
+        if r <= acc:
+            chosen_bin = b
+            break
+    span = max(1, smax - smin + 1)
+    step = span / 5.0
+    bin_idx = {"XS":0,"S":1,"M":2,"L":3,"XL":4}[chosen_bin]
+    low = int(smin + bin_idx*step)
+    high = int(smin + (bin_idx+1)*step) - 1
+    if high < low: high = low
+    size = rnd.randint(low, min(high, smax))
+    base = g.BASE_BY_GRADE_BIN[grade][chosen_bin]
+
+    time_bonus = g.time_bonus(grade, secs)
+    bonus = 0.0
+    if additive_active:
+        bonus += g.ADDITIVE_BONUS
+    if chem_grade:
+        cg_grade, chem_bonus = g.CHEM_BONUS.get(chem_grade, (None, 0.0))
+        if grade == cg_grade: bonus += chem_bonus
+    rod_bonus = g.ROD_BONUS.get(rod, {})
+    if grade in rod_bonus: bonus += rod_bonus[grade]
+    bonus += g.level_bonus(lv, grade)
+    if early:
+        bonus -= g.EARLY_PENALTY
+    final_p = max(0.0, min(g.MAX_SUCCESS_P, base + time_bonus + bonus))
+    return name, size, grade, rnd.random()*100.0 <= final_p
+
+
+def random_states(g, n, seed):
+    r = random.Random(seed)
+    rods = ["대나무 낚싯대"] + list(g.ROD_BONUS)
+    spots = list(g.fish_catalog)
+    for _ in range(n):
+        early = r.random() < 0.2
+        yield (r.choice(spots), r.choice(rods), r.randint(1, 130), r.choice((0, 0, 1, 2, 3)),
+               r.random() < 0.5, r.random() < 0.5, r.randint(0, 60), early)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--check", type=int, default=200000, help="동일성 확인 케이스 수")
+    ap.add_argument("--number", type=int, default=200000, help="속도 측정 캐스팅 수")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    g = game.FishingGame(os.path.join(tempfile.mkdtemp(prefix="cast-tables-"), "bench.json"))
+    svc = rng.RNGService(args.seed)
+
+    # 1) 동일성: 같은 상태 + 같은 스트림 → 같은 결과, 같은 난수 소비
+    for i, st in enumerate(random_states(g, args.check, args.seed)):
+        a, b = svc.stream(f"u{i}"), svc.stream(f"u{i}")
+        ra, rb = reference(g, a, *st), g.roll_cast(b, *st)
+        if ra != rb or a.counter != b.counter:
+            print(f"❌ 불일치 {st}: {ra} != {rb}")
+            sys.exit(1)
+    print(f"✅ {args.check}개 상태 조합에서 결과/난수 소비 동일")
+
+    # 2) 속도 (상태·스트림 생성은 측정 밖)
+    states = list(random_states(g, args.number, args.seed + 1))
+    for label, fn in (("예전 (분기 계산)", lambda s, st: reference(g, s, *st)),
+                      ("표 조회 (roll_cast)", lambda s, st: g.roll_cast(s, *st))):
+        streams = [svc.stream(f"u{i}") for i in range(len(states))]
+        t = time.perf_counter()
+        for s, st in zip(streams, states):
+            fn(s, st)
+        dt = time.perf_counter() - t
+        print(f"{label:<20} {dt / len(states) * 1e6:6.2f}us/cast")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+# bench/drop_sim.py
+"""낚시 확률 몬테카를로 시뮬레이터 (NumPy 벡터화).
+
+app.py 와 game.py 의 확률 표/계산 함수를 그대로 가져다 수백만 번의 캐스팅을
+배치로 굴리고, 시간당 경험치/골드와 어종별 조과 분포를 출력한다.
+밸런스 상수(P_*, SLOPE_*, SIZE_BINS, BASE_BY_GRADE_BIN, ROD_BONUS, level_bonus ...)를
+바꾼 뒤 배포 전에 돌려보는 용도.
+
+    pip install numpy   # 서버 requirements 에는 넣지 않는다
+    python bench/drop_sim.py --casts 10000000 [--engine app game] [--sec 30] [--out sim.json]
+
+가정
+- 잡은 물고기는 바로 판매(가방이 차서 못 담는 경우 없음), 골드/h 는 판매가 기준
+- 미끼값은 1캐스팅당 1개, 캐스팅 1회 = sec + overhead 초
+- game: --additive / --chem 을 주면 매 캐스팅에 효과가 걸린 상태로 계산(상한 추정)
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from itertools import accumulate
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("FISHING_STORE", "memory")
+
+import app  # noqa: E402
+import game  # noqa: E402
+
+CHUNK = 1 << 21
+LEVEL_BRACKETS = (("Lv1-30", 1), ("Lv31-70", 31), ("Lv71-99", 71), ("Lv100+", 100))
+
+
+class Tally:
+    """캐스팅 수 / 성공 수 / 경험치 합 / 골드 합 + 어종별 마릿수."""
+
+    def __init__(self):
+        self.casts = 0
+        self.catches = 0
+        self.exp = 0
+        self.gold = 0
+        self.species = defaultdict(int)
+        self.length_sum = defaultdict(int)
+
+    def add(self, other):
+        self.casts += other.casts
+        self.catches += other.catches
+        self.exp += other.exp
+        self.gold += other.gold
+        for k, v in other.species.items():
+            self.species[k] += v
+            self.length_sum[k] += other.length_sum[k]
+
+    def summary(self, cast_seconds: float, bait_price: int) -> dict:
+        per_hour = 3600.0 / cast_seconds
+        n = max(1, self.casts)
+        return {
+            "casts": self.casts,
+            "catch_rate": self.catches / n,
+            "exp_per_hour": self.exp / n * per_hour,
+            "gold_per_hour": self.gold / n * per_hour,
+            "bait_cost_per_hour": bait_price * per_hour,
+        }
+
+    def species_table(self) -> dict:
+        total = max(1, self.catches)
+        return {k: {"count": v, "share": v / total, "avg_length": self.length_sum[k] / v}
+                for k, v in sorted(self.species.items(), key=lambda kv: -kv[1])}
+
+
+# ---------------- app.py 엔진 ----------------
+
+class AppModel:
+    """app.resolve_fishing_result: pick_size_with_miss → random.choice → _weighted_length."""
+
+    def __init__(self):
+        # r < P_SMALL, r < P_SMALL + P_MEDIUM, ... 와 같은 부동소수 경계
+        self.cuts = np.array([app.P_SMALL, app.P_SMALL + app.P_MEDIUM,
+                              app.P_SMALL + app.P_MEDIUM + app.P_LARGE])
+        self.species = {}  # place -> [(size, [(name, min_len, cum, exp_tab, price_tab)])]
+        for place, sizes in app.FISH_POOL.items():
+            rows = []
+            for size in app.SIZES:
+                fishes = []
+                for name, lo, hi in sizes[size]:
+                    cum = np.array(app._length_table(lo, hi, app.SIZE_SLOPE[size])[0]) if hi > lo else None
+                    lengths = range(lo, hi + 1)
+                    exp_tab = np.array([app.get_exp_by_length(size, L, place) for L in lengths])
+                    price_tab = np.array([app.calc_sell_price({"length": L, "size": size, "place": place})
+                                          for L in lengths])
+                    fishes.append((name, lo, hi, cum, exp_tab, price_tab))
+                rows.append((size, fishes))
+            self.species[place] = rows
+        self.bait_price = app.SHOP_PRICE["지렁이"]
+
+    def run(self, rng, place: str, n: int) -> Tally:
+        t = Tally()
+        t.casts = n
+        size_idx = np.searchsorted(self.cuts, rng.random(n), side="right")  # 3 = 꽝
+        for si, (size, fishes) in enumerate(self.species[place]):
+            m = int(np.count_nonzero(size_idx == si))
+            if not m:
+                continue
+            pick = rng.integers(0, len(fishes), m)
+            for fi, (name, lo, hi, cum, exp_tab, price_tab) in enumerate(fishes):
+                k = int(np.count_nonzero(pick == fi))
+                if not k:
+                    continue
+                if cum is None:
+                    idx = np.zeros(k, dtype=np.int64)
+                else:
+                    # bisect(cum, random() * total, 0, len(cum) - 1)
+                    idx = np.minimum(np.searchsorted(cum, rng.random(k) * cum[-1], side="right"), len(cum) - 1)
+                t.catches += k
+                t.exp += int(exp_tab[idx].sum())
+                t.gold += int(price_tab[idx].sum())
+                t.species[name] += k
+                t.length_sum[name] += int((lo + idx).sum())
+        return t
+
+
+# ---------------- game.py 엔진 ----------------
+
+class GameModel:
+    """game.FishingGame.resolve_fishing (조기 릴 없음)."""
+
+    def __init__(self):
+        self._tmp = tempfile.mkdtemp(prefix="drop-sim-")
+        self.g = game.FishingGame(os.path.join(self._tmp, "sim.json"))
+        self.grades = ("소형", "중형", "대형")
+        bins = [b for b, _ in self.g.SIZE_BINS]
+        self.bin_cum = np.array(list(accumulate(w for _, w in self.g.SIZE_BINS)))
+        self.base = np.array([[self.g.BASE_BY_GRADE_BIN[gr][b] for b in bins] for gr in self.grades])
+        self.catalog = {}
+        for spot, by_grade in self.g.fish_catalog.items():
+            names, lows, highs, exp_tabs, sale_tabs = [], [], [], [], []
+            for gi, gr in enumerate(self.grades):
+                for name, smin, smax in by_grade[gr]:
+                    names.append(name)
+                    lo_row, hi_row = [], []
+                    span = max(1, smax - smin + 1)
+                    step = span / 5.0
+                    for bi in range(len(bins)):
+                        low = int(smin + bi * step)
+                        high = int(smin + (bi + 1) * step) - 1
+                        if high < low:
+                            high = low
+                        lo_row.append(low)
+                        hi_row.append(min(high, smax))
+                    lows.append(lo_row)
+                    highs.append(hi_row)
+            max_size = max(max(r) for r in highs) + 1
+            for gr in self.grades:
+                exp_tabs.append([self.g.calc_exp(gr, s) for s in range(max_size)])
+                sale_tabs.append([self.g.sale_price_from_record({"price": self.g.calc_price(gr, s), "grade": gr})
+                                  for s in range(max_size)])
+            per_grade = len(by_grade[self.grades[0]])
+            assert all(len(by_grade[gr]) == per_grade for gr in self.grades)
+            self.catalog[spot] = (names, np.array(lows), np.array(highs),
+                                  np.array(exp_tabs), np.array(sale_tabs), per_grade)
+        self.bait_price = self.g.unit_price_map["지렁이"]
+
+    def success_table(self, rod, lv, secs, additive, chem):
+        """등급별 (시간 보정, 기타 보정). resolve_fishing 과 같은 순서로 더한다."""
+        time_b, bonus_b = [], []
+        for gr in self.grades:
+            bonus = 0.0
+            if additive:
+                bonus += self.g.ADDITIVE_BONUS
+            if chem:
+                chem_grade, chem_bonus = self.g.CHEM_BONUS.get(chem, (None, 0.0))
+                if gr == chem_grade:
+                    bonus += chem_bonus
+            rod_bonus = self.g.ROD_BONUS.get(rod, {})
+            if gr in rod_bonus:
+                bonus += rod_bonus[gr]
+            bonus += self.g.level_bonus(lv, gr)
+            time_b.append(self.g.time_bonus(gr, secs))
+            bonus_b.append(bonus)
+        return np.array(time_b), np.array(bonus_b)
+
+    def run(self, rng, spot, rod, lv, secs, n, additive=False, chem=0, additive_ready=False) -> Tally:
+        names, lows, highs, exp_tab, sale_tab, per_grade = self.catalog[spot]
+        p_small, p_med, _ = self.g.grade_probs(rod, additive_ready, bool(chem), chem, secs)
+        cuts = np.array([p_small, p_small + p_med])
+        time_b, bonus_b = self.success_table(rod, lv, secs, additive, chem)
+
+        t = Tally()
+        t.casts = n
+        grade = np.searchsorted(cuts, rng.random(n) * 100.0, side="left")   # r <= P_SMALL → 0 ...
+        sp = grade * per_grade + rng.integers(0, per_grade, n)
+        b = np.searchsorted(self.bin_cum, rng.random(n), side="left")       # r <= acc
+        b[b == len(self.bin_cum)] = 0                                        # 누적합 오차 시 "XS"
+        low, high = lows[sp, b], highs[sp, b]
+        size = low + (rng.random(n) * (high - low + 1)).astype(np.int64)
+        final_p = np.clip(self.base[grade, b] + time_b[grade] + bonus_b[grade], 0.0, self.g.MAX_SUCCESS_P)
+        ok = rng.random(n) * 100.0 <= final_p
+
+        g_ok, s_ok, size_ok = grade[ok], sp[ok], size[ok]
+        t.catches = int(ok.sum())
+        t.exp = int(exp_tab[g_ok, size_ok].sum())
+        t.gold = int(sale_tab[g_ok, size_ok].sum())
+        counts = np.bincount(s_ok, minlength=len(names))
+        lens = np.bincount(s_ok, weights=size_ok, minlength=len(names))
+        for i, name in enumerate(names):
+            if counts[i]:
+                t.species[name] += int(counts[i])
+                t.length_sum[name] += int(lens[i])
+        return t
+
+
+# ---------------- 실행 ----------------
+
+def chunked(rng, n, fn):
+    t = Tally()
+    while n > 0:
+        k = min(n, CHUNK)
+        t.add(fn(rng, k))
+        n -= k
+    return t
+
+
+def run_app(rng, casts, cast_seconds):
+    model = AppModel()
+    places = list(app.FISH_POOL)
+    out, total = {"by_spot": {}}, Tally()
+    for place in places:
+        t = chunked(rng, casts // len(places), lambda r, k: model.run(r, place, k))
+        total.add(t)
+        out["by_spot"][place] = t.summary(cast_seconds, model.bait_price)
+        out["by_spot"][place]["species"] = t.species_table()
+    out["overall"] = total.summary(cast_seconds, model.bait_price)
+    return out
+
+
+def run_game(rng, casts, secs, cast_seconds, additive, chem):
+    model = GameModel()
+    rods = ["대나무 낚싯대"] + list(model.g.ROD_BONUS)
+    spots = list(model.g.fish_catalog)
+    per = casts // (len(spots) * len(rods) * len(LEVEL_BRACKETS))
+    scenarios = []
+    by = {"spot": defaultdict(Tally), "rod": defaultdict(Tally), "level": defaultdict(Tally)}
+    species = Tally()
+    for spot in spots:
+        for rod in rods:
+            for label, lv in LEVEL_BRACKETS:
+                t = chunked(rng, per, lambda r, k: model.run(r, spot, rod, lv, secs, k, additive, chem))
+                s = t.summary(cast_seconds, model.bait_price)
+                s.update(spot=spot, rod=rod, level=label)
+                scenarios.append(s)
+                by["spot"][spot].add(t)
+                by["rod"][rod].add(t)
+                by["level"][label].add(t)
+                species.add(t)
+    out = {"scenarios": scenarios, "species": species.species_table()}
+    for dim, tallies in by.items():
+        out["by_" + dim] = {k: v.summary(cast_seconds, model.bait_price) for k, v in tallies.items()}
+    out["overall"] = species.summary(cast_seconds, model.bait_price)
+    return out
+
+
+def print_summary(title, rows: dict):
+    print(f"\n[{title}]")
+    print(f"{'':<14} {'casts':>11} {'catch%':>8} {'exp/h':>12} {'gold/h':>12} {'미끼/h':>8}")
+    for k, s in rows.items():
+        print(f"{k:<14} {s['casts']:>11,} {s['catch_rate'] * 100:8.3f} {s['exp_per_hour']:12,.1f} "
+              f"{s['gold_per_hour']:12,.1f} {s['bait_cost_per_hour']:8,.0f}")
+
+
+def print_species(title, table: dict, limit: int = 30):
+    print(f"\n[{title}]")
+    for name, row in list(table.items())[:limit]:
+        print(f"  {name:<8} {row['count']:>10,}  {row['share'] * 100:7.3f}%  평균 {row['avg_length']:.1f}cm")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--casts", type=int, default=10_000_000, help="엔진별 총 캐스팅 수")
+    p.add_argument("--engine", nargs="+", choices=["app", "game"], default=["app", "game"])
+    p.add_argument("--sec", type=int, default=60, help="캐스팅 대기 시간(초)")
+    p.add_argument("--overhead", type=float, default=5.0, help="캐스팅 사이 조작 시간(초)")
+    p.add_argument("--additive", action="store_true", help="game: 집어제 효과 적용")
+    p.add_argument("--chem", type=int, choices=[0, 1, 2, 3], default=0, help="game: 케미라이트 등급")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--out", help="결과 JSON 경로")
+    args = p.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    cast_seconds = args.sec + args.overhead
+    result = {"params": vars(args)}
+    for engine in args.engine:
+        t0 = time.perf_counter()
+        if engine == "app":
+            res = run_app(rng, args.casts, cast_seconds)
+            print_summary("app.py 장소별", res["by_spot"])
+            for place, row in res["by_spot"].items():
+                print_species(f"app.py {place} 어종 분포", row["species"])
+        else:
+            res = run_game(rng, args.casts, args.sec, cast_seconds, args.additive, args.chem)
+            print_summary("game.py 낚시대별", res["by_rod"])
+            print_summary("game.py 레벨 구간별", res["by_level"])
+            print_summary("game.py 장소별", res["by_spot"])
+            print_species("game.py 어종 분포", res["species"])
+        res["elapsed_s"] = time.perf_counter() - t0
+        print(f"\n{engine}: {args.casts:,} casts in {res['elapsed_s']:.2f}s")
+        result[engine] = res
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"저장: {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
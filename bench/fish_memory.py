@@ -0,0 +1,79 @@
+# bench/fish_memory.py
+"""물고기 표현(dict vs app.Fish) 메모리 비교.
+
+가방 5칸 + 어망 20마리 + 종류별 최대 기록이 찬 플레이어를 만들어,
+저장소 JSON 을 (1) 기존처럼 dict 로 읽었을 때와 (2) app 의 object_hook 으로
+Fish 로 읽었을 때 상주 메모리를 tracemalloc 으로 잰다. JSON 왕복이 손실 없는지도 확인한다.
+
+    python bench/fish_memory.py [--players 2000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("FISHING_STORE", "memory")
+
+import app  # noqa: E402
+
+
+def random_fish(rng) -> dict:
+    place = rng.choice(app.PLACES)
+    size = rng.choice(app.SIZES)
+    name, lo, hi = rng.choice(app.FISH_POOL[place][size])
+    minute = int(time.time()) // 60 - rng.randrange(60 * 24 * 365)
+    return {"name": name, "length": rng.randint(lo, hi), "size": size, "place": place,
+            "time": app._minute_text(minute)}
+
+
+def player_text(rng) -> str:
+    user = app.new_user()
+    user["nickname"] = f"p{rng.randrange(10**9)}"
+    user["bag"] = [random_fish(rng) for _ in range(user["max_slot"])]
+    user["net"] = [random_fish(rng) for _ in range(20)]
+    for _ in range(200):
+        app.add_catch(user["stats"], random_fish(rng))
+    return json.dumps(user, ensure_ascii=False, default=app._json_default)
+
+
+def resident_bytes(texts, hook):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    users = [json.loads(t, object_hook=hook) for t in texts]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return users, after - before
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--players", type=int, default=2000)
+    p.add_argument("--seed", type=int, default=1)
+    args = p.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    texts = [player_text(rng) for _ in range(args.players)]
+
+    dict_users, dict_bytes = resident_bytes(texts, None)
+    del dict_users
+    fish_users, fish_bytes = resident_bytes(texts, app._json_object_hook)
+
+    lossless = all(json.dumps(u, ensure_ascii=False, default=app._json_default) == t
+                   for u, t in zip(fish_users, texts))
+    fish_count = sum(isinstance(f, app.Fish) for u in fish_users for f in u["bag"] + u["net"])
+    per_dict = dict_bytes / args.players
+    per_fish = fish_bytes / args.players
+    print(f"players: {args.players}  (Fish 객체로 바뀐 가방/어망 물고기 {fish_count}마리)")
+    print(f"dict  : {per_dict:10,.0f} B/player")
+    print(f"Fish  : {per_fish:10,.0f} B/player")
+    print(f"절감  : {per_dict - per_fish:10,.0f} B/player ({(1 - per_fish / per_dict) * 100:.0f}%)")
+    print("JSON round-trip: " + ("lossless" if lossless else "MISMATCH"))
+    return 0 if lossless else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
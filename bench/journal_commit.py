@@ -0,0 +1,85 @@
+# bench/journal_commit.py
+"""UserStore 변경 저널(journal.py) 비용과 복구 시간.
+
+memory 백엔드 위에서 스레드마다 다른 유저로 골드 증감 + 가방에 물고기 추가/판매를
+transact 로 반복하고, 저널 없음 / 저널(fsync 없음) / 저널(fsync, 그룹 커밋) 을 비교한다.
+records/commits 는 fsync 한 번에 묶인 평균 레코드 수다. 마지막으로 같은 저널을
+빈 memory 백엔드에 복구하는 시간을 잰다 (= 크래시 뒤 재시작 비용).
+
+    python bench/journal_commit.py --threads 1,8,32 --ops 2000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import journal  # noqa: E402
+import storage  # noqa: E402
+
+
+def new_user():
+    return {"gold": 0, "lv": 1, "bag": [], "inventory": {"지렁이_normal": 100}}
+
+
+def mutate(user, i):
+    user["gold"] += 7
+    user["inventory"]["지렁이_normal"] -= 1
+    if len(user["bag"]) < 5:
+        user["bag"].append({"name": "붕어", "length": 20 + i % 30, "size": "소형", "place": "민물", "time": "2024-01-01 00:00"})
+    else:
+        user["bag"].clear()
+        user["inventory"]["지렁이_normal"] += 5
+    return ""
+
+
+def run(store, threads, ops):
+    def work(k):
+        uid = f"u{k}"
+        for i in range(ops):
+            store.transact(uid, lambda: mutate(store.get(uid, new_user), i), new_user)
+    ths = [threading.Thread(target=work, args=(k,)) for k in range(threads)]
+    t = time.perf_counter()
+    for th in ths:
+        th.start()
+    for th in ths:
+        th.join()
+    return time.perf_counter() - t
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--threads", default="1,8,32")
+    ap.add_argument("--ops", type=int, default=2000, help="스레드당 트랜잭션 수")
+    args = ap.parse_args()
+
+    print(f"{'':<22} {'threads':>7} {'tx/s':>9} {'records/commits':>16}")
+    for threads in (int(x) for x in args.threads.split(",")):
+        for label, fsync in (("저널 없음", None), ("저널 (fsync 없음)", False), ("저널 (fsync)", True)):
+            root = tempfile.mkdtemp(prefix="journal-")
+            wal = journal.Journal(root, fsync=fsync) if fsync is not None else None
+            store = storage.UserStore(storage.MemoryBackend(), journal=wal)
+            dt = run(store, threads, args.ops)
+            n = threads * args.ops
+            group = f"{wal.records / wal.commits:.1f}" if wal is not None else "-"
+            print(f"{label:<22} {threads:>7} {n / dt:>9.0f} {group:>16}")
+            if wal is not None and fsync:
+                wal.close()
+                size = sum(os.path.getsize(p) for p in journal.segments(root))
+                t = time.perf_counter()
+                fresh = storage.UserStore(storage.MemoryBackend(), journal=journal.Journal(root))
+                applied, skipped = fresh.recover()
+                dt = time.perf_counter() - t
+                same = all(fresh.get(f"u{k}", new_user) == store.get(f"u{k}", new_user) for k in range(threads))
+                print(f"{'  복구':<22} {threads:>7} {applied / dt:>9.0f} rec/s  {size / applied:.0f}B/rec  "
+                      f"{'일치' if same and not skipped else '불일치'}")
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
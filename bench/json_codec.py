@@ -0,0 +1,120 @@
+# bench/json_codec.py
+"""fastjson 계층 전/후 직렬화 비용 비교 (한글 위주 페이로드).
+
+    요청   /skill 본문 파싱 + 카카오 응답 봉투 인코딩
+           전: request.get_json() + jsonify(dict)  (ensure_ascii → 한글 1자 6바이트)
+           후: fastjson.loads + fastjson.kakao_body (봉투 고정, 텍스트만 인코딩)
+    저장   UserStore 가 트랜잭션마다 하는 유저 직렬화 (변경 감지 + 저장)
+    game   FishingGame Store 로그 한 줄 인코딩/디코딩
+
+fastjson 의 백엔드(orjson 이 있으면 orjson)와, orjson 이 없을 때의 표준 json 폴백을 함께 잰다.
+
+    python bench/json_codec.py --fish 20 --number 20000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+os.environ.setdefault("FISHING_STORE", "memory")
+
+import app       # noqa: E402
+import fastjson  # noqa: E402
+
+
+def payload(user_id: str, utter: str) -> dict:
+    """카카오 i 오픈빌더 스킬 요청 형태 (bench/skill_load.py 와 같음)."""
+    return {
+        "intent": {"id": "fallback", "name": "폴백 블록"},
+        "userRequest": {
+            "timezone": "Asia/Seoul",
+            "params": {"ignoreMe": "true"},
+            "block": {"id": "fallback", "name": "폴백 블록"},
+            "utterance": utter,
+            "lang": "ko",
+            "user": {"id": user_id, "type": "botUserKey", "properties": {}},
+        },
+        "bot": {"id": "bench", "name": "낚시 RPG"},
+        "action": {"name": "skill", "clientExtra": None, "params": {}, "id": "skill", "detailParams": {}},
+    }
+
+
+def std_compact(obj, default=None) -> bytes:
+    """orjson 이 없을 때 fastjson 이 쓰는 경로와 같은 표준 json 설정."""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=default).encode()
+
+
+def flask_jsonify(obj) -> bytes:
+    # Flask 기본 JSON 공급자(비디버그): ensure_ascii=True, sort_keys=True, 공백 없음, 끝에 개행
+    return (json.dumps(obj, ensure_ascii=True, sort_keys=True, separators=(",", ":")) + "\n").encode()
+
+
+def sample_user(n_fish: int) -> dict:
+    user = app.new_user()
+    user["nickname"] = "강태공김씨"
+    pool = [f for size in ("소형", "중형", "대형") for f in app.FISH_POOL["바다"][size]]
+    for i in range(n_fish):
+        name, lo, hi = pool[i % len(pool)]
+        size = next(s for s in ("소형", "중형", "대형") if (name, lo, hi) in app.FISH_POOL["바다"][s])
+        fish = app.Fish.caught(name, lo + i % max(1, hi - lo), size, "바다")
+        (user["bag"] if len(user["bag"]) < user["max_slot"] else user["net"]).append(fish)
+        app.add_catch(user["stats"], fish)
+    return user
+
+
+def per_op(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def row(label, before_fn, after_fn, fallback_fn, number, before_len, after_len):
+    b, a, f = per_op(before_fn, number), per_op(after_fn, number), per_op(fallback_fn, number)
+    print(f"{label:<22} {b:8.2f}us {a:8.2f}us ({b / a:4.1f}x) {f:8.2f}us ({b / f:4.1f}x)   "
+          f"{before_len:>6}B → {after_len:>6}B")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--fish", type=int, default=20, help="유저가 가진 물고기 수 (가방+어망)")
+    ap.add_argument("--number", type=int, default=20000)
+    args = ap.parse_args()
+    n = args.number
+
+    user = sample_user(args.fish)
+    reply = app.bag_text(user) + "\n\n" + app.record_text(user)
+    body = json.dumps(payload("botUserKey-한글사용자", "/구매 케미라이트1등급 3"), ensure_ascii=False).encode()
+    envelope = {"version": "2.0", "template": {"outputs": [{"simpleText": {"text": reply}}]}}
+    default = app._json_default
+
+    print(f"fastjson backend: {fastjson.BACKEND}   reply {len(reply)}자, fish {args.fish}마리\n")
+    print(f"{'':<22} {'전':>10} {'후(fastjson)':>17} {'후(표준 폴백)':>17}   크기")
+
+    row("요청 파싱", lambda: json.loads(body), lambda: fastjson.loads(body), lambda: json.loads(body),
+        n, len(body), len(body))
+    row("응답 인코딩", lambda: flask_jsonify(envelope), lambda: fastjson.kakao_body(reply),
+        lambda: b'{"version":"2.0","template":{"outputs":[{"simpleText":{"text":' + std_compact(reply) + b"}}]}}",
+        n, len(flask_jsonify(envelope)), len(fastjson.kakao_body(reply)))
+
+    old_text = json.dumps(user, ensure_ascii=False, default=default)
+    row("UserStore 저장 인코딩", lambda: json.dumps(user, ensure_ascii=False, default=default),
+        lambda: fastjson.dumps(user, default=default).decode(), lambda: std_compact(user, default).decode(),
+        n // 4, len(old_text.encode()), len(fastjson.dumps(user, default=default)))
+
+    plain = json.loads(old_text)   # game.Store 쪽은 순수 dict
+    old_line = (json.dumps("uid-1", ensure_ascii=False) + "\t"
+                + json.dumps(plain, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+    new_line = fastjson.dumps("uid-1") + b"\t" + fastjson.dumps(plain) + b"\n"
+    row("game 로그 인코딩", lambda: (json.dumps("uid-1", ensure_ascii=False) + "\t"
+                                 + json.dumps(plain, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8"),
+        lambda: fastjson.dumps("uid-1") + b"\t" + fastjson.dumps(plain) + b"\n",
+        lambda: std_compact("uid-1") + b"\t" + std_compact(plain) + b"\n",
+        n // 4, len(old_line), len(new_line))
+    rec = new_line[new_line.index(b"\t") + 1:]
+    row("game 로그 디코딩", lambda: json.loads(rec), lambda: fastjson.loads(rec), lambda: json.loads(rec),
+        n // 4, len(rec), len(rec))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# bench/length_sampler.py
+"""app._weighted_length 검증 + 속도 비교.
+
+기존 구현(매번 가중치 리스트 생성 + random.choices)을 기준으로,
+FISH_POOL 의 모든 어종에 대해 같은 시드에서 같은 길이 순서가 나오는지 확인하고
+(분포도 당연히 동일) 1회 샘플링 비용을 비교한다.
+
+    python bench/length_sampler.py [--draws 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("FISHING_STORE", "memory")
+
+import app  # noqa: E402
+
+
+def reference_length(min_len: int, max_len: int, slope: float) -> int:
+    """변경 전 구현 그대로."""
+    span = max_len - min_len
+    if span <= 0:
+        return min_len
+    weights = []
+    for i in range(min_len, max_len + 1):
+        t = (i - min_len) / span
+        w = 1.0 - slope * t
+        if w <= 0:
+            w = 1e-6
+        weights.append(w)
+    return random.choices(range(min_len, max_len + 1), weights=weights, k=1)[0]
+
+
+def species():
+    for place, sizes in app.FISH_POOL.items():
+        for size, fishes in sizes.items():
+            for name, min_len, max_len in fishes:
+                yield name, min_len, max_len, app.SIZE_SLOPE[size]
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--draws", type=int, default=20000)
+    args = p.parse_args(argv)
+
+    mismatches = 0
+    for name, lo, hi, slope in species():
+        random.seed(name)
+        ref = [reference_length(lo, hi, slope) for _ in range(args.draws)]
+        random.seed(name)
+        new = [app._weighted_length(lo, hi, slope) for _ in range(args.draws)]
+        if ref != new:
+            mismatches += 1
+            print(f"MISMATCH {name} ({lo}-{hi}cm)")
+
+    print(f"{'어종':<8} {'범위':>10} {'기존 us':>9} {'표 us':>8} {'배':>6}")
+    for name, lo, hi, slope in species():
+        n = max(1000, args.draws // 10)
+        t = time.perf_counter()
+        for _ in range(n):
+            reference_length(lo, hi, slope)
+        old = (time.perf_counter() - t) / n * 1e6
+        t = time.perf_counter()
+        for _ in range(n):
+            app._weighted_length(lo, hi, slope)
+        new = (time.perf_counter() - t) / n * 1e6
+        print(f"{name:<8} {f'{lo}-{hi}':>10} {old:9.2f} {new:8.2f} {old / new:6.1f}")
+
+    print("identical sequences" if not mismatches else f"{mismatches} species differ")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
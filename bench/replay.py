@@ -0,0 +1,168 @@
+# bench/replay.py
+"""캡처한 /skill 요청 로그(reqlog)를 빈 저장소에 다시 흘려 보내는 도구.
+
+요청마다 시계를 기록된 시각으로 맞추고(app 의 time/datetime 을 가상 시계로 교체),
+rng 서버 시드는 로그 헤더의 값을 쓰므로 같은 로그는 항상 같은 최종 상태를 만든다.
+캡처 때 FISHING_RNG_SEED 가 필수라 모든 세그먼트 헤더의 시드가 같아야 하고, 아니면 멈춘다.
+응답마다 캡처 때 실제로 보낸 응답과 비교해 다른 것을 보고한다 (하나라도 다르면 종료 코드 1).
+처리량과 최종 플레이어 상태 해시도 출력하고, --expect 로 준 상태 덤프와 다른 유저를 보고한다.
+
+    FISHING_RNG_SEED=0x5eed FISHING_REQUEST_LOG_DIR=/var/log/fishing-req gunicorn app:app ...   # 캡처
+    python bench/replay.py /var/log/fishing-req --dump bench/results/replay.json
+    python bench/replay.py /var/log/fishing-req --speed 1 --expect bench/results/replay.json
+
+--speed 0(기본)은 최대 속도, 1 은 기록된 간격 그대로, 2 는 두 배 빠르게.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp(prefix="replay-")
+os.environ["FISHING_DB"] = os.path.join(TMP, "replay.db")
+os.environ.pop("FISHING_REQUEST_LOG_DIR", None)   # 리플레이가 다시 캡처되지 않도록
+os.environ.pop("FISHING_JOURNAL_DIR", None)       # 운영 저널을 읽거나 덧붙이지 않도록
+os.environ["FISHING_RANK_REFRESH"] = "0"           # 랭킹은 이 프로세스의 커밋만으로 (백그라운드 재구성 없이 결정적)
+
+import reqlog  # noqa: E402
+import rng     # noqa: E402
+
+_now = [time.time()]
+
+
+def _set_now(ts: float):
+    _now[0] = ts
+
+
+class _Time:
+    """time 모듈 대신 — time() 만 가상 시계."""
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+    @staticmethod
+    def time():
+        return _now[0]
+
+
+class _DateTime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls.fromtimestamp(_now[0], tz)
+
+
+def final_state(app) -> dict:
+    out = {}
+    for uid in sorted(app.store.uids()):
+        user = app.store.get(uid, app.new_user)
+        out[uid] = json.loads(json.dumps(user, default=app._json_default, sort_keys=True))
+    return out
+
+
+def digest(state: dict) -> str:
+    return hashlib.sha256(json.dumps(state, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def diff_keys(a: dict, b: dict):
+    return sorted(k for k in set(a) | set(b) if a.get(k) != b.get(k))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("log_dir")
+    ap.add_argument("--speed", type=float, default=0.0, help="0=최대 속도, 1=기록 속도")
+    ap.add_argument("--limit", type=int, help="앞에서부터 N개만")
+    ap.add_argument("--dump", help="최종 플레이어 상태를 JSON 으로 저장")
+    ap.add_argument("--expect", help="비교할 상태 덤프(JSON)")
+    args = ap.parse_args()
+
+    seeds = reqlog.seeds(args.log_dir)
+    if len(seeds) != 1 or None in seeds:
+        sys.exit(f"❌ 세그먼트 헤더의 시드가 하나가 아닙니다 {sorted(seeds, key=str)} — FISHING_RNG_SEED 를 고정해 캡처하세요")
+    seed = next(iter(seeds))
+    rng.configure(seed)
+
+    import app
+    app.time = _Time()
+    app.datetime = _DateTime
+    if app.cast_timer is not None:
+        app.cast_timer.threaded = False   # 만료 처리는 가상 시계로 요청 사이에 직접 돌린다
+
+    counts, errors = Counter(), Counter()
+    n = checked = 0
+    mismatches = []   # (n, uid, 발화, 캡처 응답, 리플레이 응답)
+    wall0 = ts0 = None
+    t0 = time.perf_counter()
+    for ts, uid, utter, expected_reply in reqlog.read(args.log_dir):
+        if args.limit is not None and n >= args.limit:
+            break
+        if wall0 is None:
+            wall0, ts0 = time.perf_counter(), ts
+        if args.speed > 0:
+            delay = (ts - ts0) / args.speed - (time.perf_counter() - wall0)
+            if delay > 0:
+                time.sleep(delay)
+        if app.cast_timer is not None:
+            # 캡처 때 타이머 스레드가 만료 시각에 처리했으므로 시계도 항목마다 그 시각으로
+            app.cast_timer.run_due(ts, advance=_set_now)
+        _now[0] = ts
+        head = utter.split(None, 1)[0] if utter and utter.strip() else "/"
+        counts[head if app.router.route(head) is not None else "other"] += 1
+        reply = None
+        try:
+            reply = app.handle_command(uid, utter)
+        except Exception as e:
+            errors[type(e).__name__] += 1
+        if expected_reply is not None:
+            checked += 1
+            if reply != expected_reply:
+                mismatches.append((n, uid, utter, expected_reply, reply))
+        n += 1
+    elapsed = time.perf_counter() - t0
+
+    state = final_state(app)
+    print(f"requests {n}  elapsed {elapsed:.2f}s  throughput {n / elapsed if elapsed else 0:.0f} req/s")
+    print(f"players {len(state)}  seed {seed}  state sha256 {digest(state)}")
+    print("commands " + "  ".join(f"{k}={v}" for k, v in counts.most_common()))
+    if errors:
+        print("errors   " + "  ".join(f"{k}={v}" for k, v in errors.most_common()))
+    failed = False
+    if mismatches:
+        failed = True
+        print(f"❌ 응답 불일치 {len(mismatches)} / {checked}건")
+        for i, uid, utter, want, got in mismatches[:10]:
+            print(f"  #{i} {uid} {utter!r}\n    캡처     {want!r}\n    리플레이 {got!r}")
+    else:
+        print(f"✅ 응답 일치 ({checked}건, 응답이 기록되지 않은 요청 {n - checked}건)")
+
+    if args.dump:
+        with open(args.dump, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, sort_keys=True)
+    if args.expect:
+        with open(args.expect, encoding="utf-8") as f:
+            expected = json.load(f)
+        bad = diff_keys(state, expected)
+        if not bad:
+            print(f"✅ 최종 상태 일치 ({len(state)}명)")
+        else:
+            failed = True
+            print(f"❌ {len(bad)}명 상태 불일치")
+            for uid in bad[:20]:
+                if uid not in state or uid not in expected:
+                    print(f"  {uid}: {'리플레이' if uid not in state else '기대 상태'}에 유저 없음")
+                else:
+                    print(f"  {uid}: {', '.join(diff_keys(state[uid], expected[uid]))}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+# bench/skill_load.py
+"""/skill 웹훅 부하 테스트 + 명령어별 지연시간 벤치마크 (오프라인).
+
+N명의 가상 플레이어가 실제 카카오 userRequest 페이로드로
+/닉네임 → /장소 → /구매 → (/낚시 → /챔질) × R → /일괄판매 → 네
+시나리오를 동시에 진행하고, 명령어별 p50/p95/p99 지연시간과 처리량을 출력한다.
+
+대상(--target, 여러 개 가능)
+    direct    app.handle_command 직접 호출 (웹 계층 없이 순수 처리 비용)
+    flask     Flask test client 로 POST /skill
+    gunicorn  로컬 gunicorn app:app 을 띄워 HTTP 로 호출
+    uvicorn   로컬 uvicorn asgi:app 을 띄워 HTTP 로 호출
+
+결과는 JSON 으로 저장되며 --compare 로 이전 결과와 비교할 수 있다.
+
+    python bench/skill_load.py --players 200 --rounds 3 --target direct flask gunicorn \\
+        --out bench/results/before.json
+    python bench/skill_load.py ... --compare bench/results/before.json
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp(prefix="skill-load-")
+os.environ.setdefault("FISHING_DB", os.path.join(TMP, "inproc.db"))
+
+CAST_SEC = 1
+
+
+# ---------------- 시나리오 ----------------
+
+def payload(user_id: str, utter: str) -> dict:
+    """카카오 i 오픈빌더 스킬 요청 형태."""
+    return {
+        "intent": {"id": "fallback", "name": "폴백 블록"},
+        "userRequest": {
+            "timezone": "Asia/Seoul",
+            "params": {"ignoreMe": "true"},
+            "block": {"id": "fallback", "name": "폴백 블록"},
+            "utterance": utter,
+            "lang": "ko",
+            "user": {"id": user_id, "type": "botUserKey", "properties": {}},
+        },
+        "bot": {"id": "bench", "name": "낚시 RPG"},
+        "action": {"name": "skill", "clientExtra": None, "params": {}, "id": "skill", "detailParams": {}},
+    }
+
+
+def script(run_id: str, idx: int, rounds: int):
+    """(명령어 라벨, 발화) 순서. /챔질은 /낚시 후 CAST_SEC 초 뒤에 보낸다."""
+    place = "바다" if idx % 2 == 0 else "민물"
+    bait = "지렁이" if place == "바다" else "떡밥"
+    yield "/닉네임", f"/닉네임 {run_id}{idx}"
+    yield "/장소", f"/장소 {place}"
+    yield "/구매", f"/구매 {bait}(거래불가) {rounds + 1}"
+    for _ in range(rounds):
+        yield "/낚시", f"/낚시 {CAST_SEC}"
+        yield "/챔질", "/챔질"
+    yield "/일괄판매", "/일괄판매"
+    yield "네", "네"
+
+
+# ---------------- 대상 ----------------
+
+class Direct:
+    name = "direct"
+
+    def __init__(self, args):
+        import app
+        self.handle = app.handle_command
+
+    def client(self):
+        return lambda body: self.handle(body["userRequest"]["user"]["id"], body["userRequest"]["utterance"])
+
+    def close(self):
+        pass
+
+
+class FlaskClient:
+    name = "flask"
+
+    def __init__(self, args):
+        import app
+        self.app = app.app
+
+    def client(self):
+        c = self.app.test_client()
+
+        def call(body):
+            r = c.post("/skill", json=body)
+            if r.status_code != 200:
+                raise RuntimeError(f"HTTP {r.status_code}")
+            return r.data
+        return call
+
+    def close(self):
+        pass
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class _Server:
+    """로컬 서버 프로세스를 띄우고 keep-alive HTTP 로 호출."""
+
+    def __init__(self, args):
+        self.port = _free_port()
+        exe = shutil.which(self.command_name())
+        if exe is None:
+            raise RuntimeError(f"{self.command_name()} 가 설치되어 있지 않습니다")
+        env = dict(os.environ, FISHING_DB=os.path.join(TMP, f"{self.name}.db"))
+        self.proc = subprocess.Popen([exe] + self.argv(args), cwd=ROOT, env=env,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.time() + 20
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"{self.name} 가 시작하지 못했습니다 (rc={self.proc.returncode})")
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.2).close()
+                return
+            except OSError:
+                time.sleep(0.1)
+        self.close()
+        raise RuntimeError(f"{self.name} 시작 시간 초과")
+
+    def client(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+
+        def call(body):
+            nonlocal conn
+            data = json.dumps(body).encode()
+            try:
+                conn.request("POST", "/skill", data, {"Content-Type": "application/json"})
+                r = conn.getresponse()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+                conn.request("POST", "/skill", data, {"Content-Type": "application/json"})
+                r = conn.getresponse()
+            out = r.read()
+            if r.status != 200:
+                raise RuntimeError(f"HTTP {r.status}")
+            return out
+        return call
+
+    def close(self):
+        if self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+class Gunicorn(_Server):
+    name = "gunicorn"
+
+    def command_name(self):
+        return "gunicorn"
+
+    def argv(self, args):
+        return ["app:app", f"--bind=127.0.0.1:{self.port}",
+                f"--workers={args.workers}", f"--threads={args.threads}", "--timeout=60"]
+
+
+class Uvicorn(_Server):
+    name = "uvicorn"
+
+    def command_name(self):
+        return "uvicorn"
+
+    def argv(self, args):
+        return ["asgi:app", "--host=127.0.0.1", f"--port={self.port}",
+                f"--workers={args.workers}", "--log-level=warning"]
+
+
+TARGETS = {t.name: t for t in (Direct, FlaskClient, Gunicorn, Uvicorn)}
+
+
+# ---------------- 실행 ----------------
+
+def percentile(sorted_vals, p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, int(round(p / 100.0 * len(sorted_vals) + 0.5)) - 1))
+    return sorted_vals[k]
+
+
+def run_target(target, args, run_id: str):
+    """플레이어를 concurrency 개 스레드에 나눠 배정. 각 스레드는 자기 플레이어들을
+    돌아가며 진행하고, /챔질 처럼 대기가 필요한 플레이어는 준비될 때까지 건너뛴다."""
+    lat = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+
+    def worker(tid):
+        call = target.client()
+        local, local_err = defaultdict(list), defaultdict(int)
+        players = deque()
+        for idx in range(tid, args.players, args.concurrency):
+            players.append([f"{run_id}-u{idx}", script(run_id, idx, args.rounds), 0.0])
+        while players:
+            p = players.popleft()
+            now = time.perf_counter()
+            if p[2] > now:
+                players.append(p)
+                if all(q[2] > now for q in players):
+                    time.sleep(min(q[2] for q in players) - now)
+                continue
+            step = next(p[1], None)
+            if step is None:
+                continue
+            label, utter = step
+            t = time.perf_counter()
+            try:
+                call(payload(p[0], utter))
+                local[label].append(time.perf_counter() - t)
+            except Exception:
+                local_err[label] += 1
+            # /낚시 다음의 /챔질은 캐스팅 시간이 지나야 보낸다
+            p[2] = time.perf_counter() + (CAST_SEC if label == "/낚시" else 0)
+            players.append(p)
+        with lock:
+            for k, v in local.items():
+                lat[k].extend(v)
+            for k, v in local_err.items():
+                errors[k] += v
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    elapsed = time.perf_counter() - t0
+
+    commands = {}
+    for label in sorted(set(lat) | set(errors)):
+        vals = sorted(lat[label])
+        busy = sum(vals)
+        commands[label] = {
+            "count": len(vals),
+            "errors": errors[label],
+            "p50_ms": percentile(vals, 50) * 1e3,
+            "p95_ms": percentile(vals, 95) * 1e3,
+            "p99_ms": percentile(vals, 99) * 1e3,
+            "mean_ms": (busy / len(vals) * 1e3) if vals else 0.0,
+            "per_thread_rps": (len(vals) / busy) if busy else 0.0,
+        }
+    total = sum(c["count"] for c in commands.values())
+    all_vals = sorted(v for vals in lat.values() for v in vals)
+    return {
+        "elapsed_s": elapsed,
+        "requests": total,
+        "errors": sum(errors.values()),
+        "rps": total / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(all_vals, 50) * 1e3,
+        "p95_ms": percentile(all_vals, 95) * 1e3,
+        "p99_ms": percentile(all_vals, 99) * 1e3,
+        "commands": commands,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def print_result(name, res, base=None):
+    print(f"\n== {name}: {res['requests']} req in {res['elapsed_s']:.2f}s "
+          f"→ {res['rps']:,.0f} req/s  (errors {res['errors']})  "
+          f"p50 {res['p50_ms']:.2f}ms p95 {res['p95_ms']:.2f}ms p99 {res['p99_ms']:.2f}ms")
+    print(f"{'명령어':<8} {'n':>6} {'err':>4} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} {'req/s/스레드':>12}"
+          + ("  Δp95" if base else ""))
+    for label, c in res["commands"].items():
+        line = (f"{label:<8} {c['count']:>6} {c['errors']:>4} {c['p50_ms']:8.2f} {c['p95_ms']:8.2f} "
+                f"{c['p99_ms']:8.2f} {c['per_thread_rps']:12,.0f}")
+        old = (base or {}).get("commands", {}).get(label)
+        if old and old["p95_ms"]:
+            line += f"  {(c['p95_ms'] / old['p95_ms'] - 1) * 100:+.0f}%"
+        print(line)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--target", nargs="+", choices=list(TARGETS), default=["direct", "flask"])
+    p.add_argument("--players", type=int, default=200)
+    p.add_argument("--rounds", type=int, default=3, help="플레이어당 /낚시→/챔질 반복 수")
+    p.add_argument("--concurrency", type=int, default=8, help="클라이언트 스레드 수")
+    p.add_argument("--workers", type=int, default=2, help="gunicorn/uvicorn 워커 수")
+    p.add_argument("--threads", type=int, default=4, help="gunicorn 워커당 스레드 수")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--out", help="결과 JSON 경로")
+    p.add_argument("--compare", help="비교할 이전 결과 JSON")
+    args = p.parse_args(argv)
+
+    random.seed(args.seed)
+    base = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "targets": {},
+    }
+    failed = False
+    for i, name in enumerate(args.target):
+        try:
+            target = TARGETS[name](args)
+        except Exception as e:
+            print(f"\n== {name}: 건너뜀 ({e})")
+            continue
+        try:
+            res = run_target(target, args, run_id=f"b{i}")
+        finally:
+            target.close()
+        result["targets"][name] = res
+        failed |= res["errors"] > 0
+        print_result(name, res, (base or {}).get("targets", {}).get(name))
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n저장: {args.out}")
+    shutil.rmtree(TMP, ignore_errors=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
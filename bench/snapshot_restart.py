@@ -0,0 +1,110 @@
+# bench/snapshot_restart.py
+"""재시작 시간: 저널 전체 재적용 vs 스냅샷 + 저널 꼬리 (snapshot.py).
+
+memory 백엔드 UserStore 에 --players 명을 만들고 각자 --updates 번씩 바꾼 뒤
+    1) 저널만으로 빈 저장소를 복구하는 시간
+    2) 스냅샷을 뜨고(그 동안 다른 스레드의 트랜잭션 지연도 잰다) --tail 번 더 바꾼 뒤,
+       스냅샷 싣기 + 꼬리 재적용으로 복구하는 시간
+을 비교하고, 두 경우 모두 원래 상태와 같은지 확인한다.
+
+    python bench/snapshot_restart.py --players 20000 --updates 20 --tail 2000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import journal   # noqa: E402
+import snapshot  # noqa: E402
+import storage   # noqa: E402
+
+
+def new_user():
+    return {"nickname": None, "gold": 0, "lv": 1, "bag": [], "inventory": {"지렁이_normal": 100}}
+
+
+def bump(store, uid, i):
+    def fn():
+        user = store.get(uid, new_user)
+        user["gold"] += 7
+        user["inventory"]["지렁이_normal"] -= 1
+        if len(user["bag"]) < 5:
+            user["bag"].append({"name": "붕어", "length": 20 + i % 30, "size": "소형", "place": "민물", "time": "2024-01-01 00:00"})
+        else:
+            user["bag"].clear()
+        return ""
+    store.transact(uid, fn, new_user)
+
+
+def reopen(root):
+    """open_store 와 같은 순서: 스냅샷 싣기 → 저널 꼬리 적용."""
+    backend = storage.MemoryBackend()
+    store = storage.UserStore(backend, journal=journal.Journal(root, fsync=False))
+    snaps = snapshot.Snapshotter(backend, store.journal, interval=0)
+    t = time.perf_counter()
+    loaded = snaps.load()
+    applied, skipped = store.recover()
+    return time.perf_counter() - t, loaded, applied, skipped, backend
+
+
+def same(a, b) -> bool:
+    return sorted(a.rows()) == sorted(b.rows())
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--players", type=int, default=20000)
+    ap.add_argument("--updates", type=int, default=20, help="플레이어당 변경 수 (스냅샷 전)")
+    ap.add_argument("--tail", type=int, default=2000, help="스냅샷 뒤 변경 수")
+    args = ap.parse_args()
+    root = tempfile.mkdtemp(prefix="snapshot-")
+    try:
+        backend = storage.MemoryBackend()
+        store = storage.UserStore(backend, cache_size=args.players, journal=journal.Journal(root, fsync=False))
+        for r in range(args.updates):
+            for p in range(args.players):
+                bump(store, f"p{p}", r)
+        n = args.players * args.updates
+        size = sum(os.path.getsize(s) for s in journal.segments(root))
+        dt, _, applied, _, restored = reopen(root)
+        print(f"저널만        {n:>9}건 {size / 1e6:7.1f}MB  복구 {dt:6.2f}s  {'일치' if same(backend, restored) else '불일치'}")
+
+        # 스냅샷을 뜨는 동안 다른 스레드의 트랜잭션 지연
+        snaps = snapshot.Snapshotter(backend, store.journal, interval=0)
+        lat, done = [], threading.Event()
+
+        def writer():
+            i = 0
+            while not done.is_set():
+                t = time.perf_counter()
+                bump(store, f"p{i % args.players}", i)
+                lat.append(time.perf_counter() - t)
+                i += 1
+        th = threading.Thread(target=writer)
+        th.start()
+        t = time.perf_counter()
+        path = snaps.take()
+        took = time.perf_counter() - t
+        done.set()
+        th.join()
+        lat.sort()
+        print(f"스냅샷 뜨기   {took:6.2f}s {os.path.getsize(path) / 1e6:7.1f}MB  "
+              f"그 동안 트랜잭션 {len(lat)}건 p50 {lat[len(lat) // 2] * 1e3:.2f}ms max {lat[-1] * 1e3:.2f}ms")
+
+        for i in range(args.tail):
+            bump(store, f"p{i % args.players}", i)
+        dt, loaded, applied, skipped, restored = reopen(root)
+        print(f"스냅샷+꼬리   {loaded:>9}명 + {applied}건 (건너뜀 {skipped})  복구 {dt:6.2f}s  "
+              f"{'일치' if same(backend, restored) else '불일치'}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# casttimer.py
+"""캐스팅 타이머.
+
+진행 중인 모든 캐스팅을 (만료 시각) 힙 하나로 들고, 만료되는 즉시 resolve 콜백으로
+결과를 미리 계산한다. 계산된 결과는 유저 데이터(캐스팅 항목)에 저장되므로 /챔질 은
+O(1) 로 꺼내 주기만 한다 (유저가 볼 때까지 결과는 그 항목에만 남는다).
+
+힙은 프로세스 단위다. 다른 워커에서 시작된 캐스팅이나 재시작으로 잃은 항목은
+/챔질 때 그 자리에서 계산하는 기존 경로로 처리된다.
+
+    timer = CastTimer(resolve)           # resolve(uid, token) -> 결과 문자열 | None
+    timer.schedule(uid, due, token)      # token: 캐스팅 식별값 (재캐스팅/초기화된 항목 무시용)
+    timer.run_due(now)                   # 스레드 없이 직접 돌릴 때 (리플레이 등)
+    timer.run_due(now, advance=set_clock)  # 항목마다 만료 시각으로 가상 시계를 맞춘 뒤 처리
+"""
+import heapq
+import logging
+import threading
+import time
+from itertools import count
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+metrics.counter("fishing_cast_timer_total", "타이머가 만료 처리한 캐스팅 (result=resolved|error)")
+_RESOLVED, _ERROR = (("result", "resolved"),), (("result", "error"),)
+
+
+class CastTimer:
+    def __init__(self, resolve, threaded: bool = True):
+        self.resolve = resolve
+        self.threaded = threaded
+        self._heap = []            # (due, seq, uid, token)
+        self._seq = count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self.resolved = 0
+        self.errors = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, uid: str, due: float, token):
+        with self._cond:
+            seq = next(self._seq)
+            heapq.heappush(self._heap, (due, seq, uid, token))
+            if self._heap[0][1] == seq:   # 가장 이른 항목이 바뀌었으면 타이머 스레드를 깨운다
+                self._cond.notify()
+        if self.threaded and self._thread is None:
+            self._ensure_thread()
+
+    def run_due(self, now: float = None, advance=None) -> int:
+        """now 까지 만료된 캐스팅을 만료 순으로 모두 처리하고 처리한 개수를 돌려준다.
+        advance(due) 가 있으면 항목마다 처리 직전에 부른다 (리플레이가 가상 시계를 맞추는 데 쓴다)."""
+        now = time.time() if now is None else now
+        n = 0
+        while True:
+            with self._cond:
+                if not self._heap or self._heap[0][0] > now:
+                    return n
+                due, _seq, uid, token = heapq.heappop(self._heap)
+            if advance is not None:
+                advance(due)
+            self._fire(uid, token)
+            n += 1
+
+    def _fire(self, uid, token):
+        try:
+            result = self.resolve(uid, token)
+        except Exception:
+            # 결과 없이 남은 캐스팅은 /챔질 때 그 자리에서 계산된다
+            self.errors += 1
+            metrics.inc("fishing_cast_timer_total", _ERROR)
+            log.exception("cast timer: %s 캐스팅(%s) 만료 처리 실패", uid, token)
+            return
+        if result is not None:
+            self.resolved += 1
+            metrics.inc("fishing_cast_timer_total", _RESOLVED)
+
+    def _ensure_thread(self):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="cast-timer", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                delay = self._heap[0][0] - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+            self.run_due()
@@ -0,0 +1,150 @@
+# economy.py
+"""게임 경제 스트리밍 집계.
+
+명령 처리 쪽은 (ts, kind, key, amount, source) 튜플 하나를 링 버퍼에 넣기만 하고,
+백그라운드 집계 스레드가 주기적으로 꺼내 분 단위 카운터로 말아 둔다.
+관리자 조회는 이 카운터만 읽으므로 유저 저장소를 건드리지 않는다.
+
+kind
+    mint   재화 발행   key=gold|limit_gold  source=sell|bulk_sell|checkin|nickname|master ...
+    sink   재화 소각   key=gold|limit_gold  source=buy|master ...
+    buy    아이템 구매 key=아이템 이름         amount=수량
+    grant  아이템 지급 key=아이템 이름         source=master
+    catch  조과        key=어종               amount=마릿수
+
+카운터는 프로세스 단위다. 워커가 여러 개면 워커마다 따로 집계된다.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+
+
+class RingBuffer:
+    """고정 크기 링 버퍼. 가득 차면 새 이벤트를 버리고 dropped 를 센다."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buf = [None] * capacity
+        self._head = 0   # 다음에 읽을 위치
+        self._size = 0
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def push(self, item) -> bool:
+        with self._lock:
+            if self._size == self.capacity:
+                self.dropped += 1
+                return False
+            self._buf[(self._head + self._size) % self.capacity] = item
+            self._size += 1
+            return True
+
+    def drain(self):
+        with self._lock:
+            n, head = self._size, self._head
+            if head + n <= self.capacity:
+                out = self._buf[head:head + n]
+            else:
+                out = self._buf[head:] + self._buf[:head + n - self.capacity]
+            for i in range(n):
+                self._buf[(head + i) % self.capacity] = None
+            self._head = (head + n) % self.capacity
+            self._size = 0
+            return out
+
+    def __len__(self):
+        return self._size
+
+
+class Economy:
+    def __init__(self, capacity: int = 65536, interval: float = 1.0, retention_minutes: int = 1440):
+        self.ring = RingBuffer(capacity)
+        self.interval = interval
+        self.retention = retention_minutes
+        self._minutes = OrderedDict()   # epoch 분 -> Counter{(kind, key, source): amount}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.processed = 0
+
+    # -- 생산자 --
+    def emit(self, kind: str, key: str, amount: int, source: str = "", ts: float = None):
+        self.ring.push((int(ts if ts is not None else time.time()), kind, key, amount, source))
+        if len(self.ring) * 2 >= self.ring.capacity:
+            self._wake.set()
+        self._ensure_thread()
+
+    def emit_many(self, events):
+        for ev in events:
+            self.ring.push(ev)
+        self._ensure_thread()
+
+    # -- 집계 --
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="economy-aggregator", daemon=True)
+                    self._thread.start()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.aggregate()
+
+    def aggregate(self):
+        events = self.ring.drain()
+        if not events:
+            return
+        with self._lock:
+            for ts, kind, key, amount, source in events:
+                minute = ts // 60
+                bucket = self._minutes.get(minute)
+                if bucket is None:
+                    last = next(reversed(self._minutes), None)   # 넣기 전의 마지막 분
+                    bucket = self._minutes[minute] = Counter()
+                    if last is not None and minute < last:
+                        # 늦게 도착한 과거 분 — 순서 유지
+                        self._minutes = OrderedDict(sorted(self._minutes.items()))
+                bucket[(kind, key, source)] += amount
+            self.processed += len(events)
+            cutoff = int(time.time()) // 60 - self.retention
+            while self._minutes and next(iter(self._minutes)) < cutoff:
+                self._minutes.popitem(last=False)
+
+    # -- 조회 --
+    def summary(self, minutes: int = 60) -> dict:
+        """최근 minutes 분의 합계와 분 단위 골드 흐름."""
+        self.aggregate()
+        since = int(time.time()) // 60 - minutes + 1
+        totals = {"gold_minted": Counter(), "gold_sunk": Counter(),
+                  "limit_gold_minted": Counter(), "limit_gold_sunk": Counter(),
+                  "items_bought": Counter(), "items_granted": Counter(), "fish_caught": Counter()}
+        series = []
+        with self._lock:
+            for minute, bucket in self._minutes.items():
+                if minute < since:
+                    continue
+                row = {"minute": minute * 60, "gold_minted": 0, "gold_sunk": 0, "catches": 0}
+                for (kind, key, source), amount in bucket.items():
+                    if kind in ("mint", "sink"):
+                        totals[f"{key}_{'minted' if kind == 'mint' else 'sunk'}"][source] += amount
+                        if key == "gold":
+                            row["gold_minted" if kind == "mint" else "gold_sunk"] += amount
+                    elif kind == "buy":
+                        totals["items_bought"][key] += amount
+                    elif kind == "grant":
+                        totals["items_granted"][key] += amount
+                    elif kind == "catch":
+                        totals["fish_caught"][key] += amount
+                        row["catches"] += amount
+                series.append(row)
+        out = {name: dict(c.most_common()) for name, c in totals.items()}
+        for cur in ("gold", "limit_gold"):
+            out[f"{cur}_net"] = sum(out[f"{cur}_minted"].values()) - sum(out[f"{cur}_sunk"].values())
+        out["per_minute"] = series
+        out["window_minutes"] = minutes
+        out["events_processed"] = self.processed
+        out["events_dropped"] = self.ring.dropped
+        return out
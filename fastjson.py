@@ -0,0 +1,48 @@
+# fastjson.py
+"""JSON 직렬화 계층.
+
+orjson 이 설치돼 있으면 그것을, 없으면 표준 json 을 쓴다. 어느 쪽이든
+출력은 공백 없는 UTF-8 (한글을 \\uXXXX 로 늘리지 않는다) 이다.
+
+    fastjson.dumps(obj)            -> bytes
+    fastjson.dumps_str(obj)        -> str
+    fastjson.loads(bytes | str)
+    fastjson.kakao_body("텍스트")  -> 카카오 simpleText 응답 본문 bytes
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # 선택 의존성: 없으면 표준 json
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+if orjson is not None:
+    _OPTS = orjson.OPT_NON_STR_KEYS   # 표준 json 처럼 int 키 허용
+
+    def dumps(obj, default=None) -> bytes:
+        return orjson.dumps(obj, default=default, option=_OPTS)
+
+    def dumps_str(obj, default=None) -> str:
+        return orjson.dumps(obj, default=default, option=_OPTS).decode()
+
+    loads = orjson.loads
+else:
+    def dumps(obj, default=None) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=default).encode()
+
+    def dumps_str(obj, default=None) -> str:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=default)
+
+    loads = json.loads
+
+
+# {"version":"2.0","template":{"outputs":[{"simpleText":{"text": ... }}]}}
+# 봉투는 고정이므로 텍스트 부분만 인코딩해서 앞뒤를 붙인다.
+_KAKAO_HEAD = b'{"version":"2.0","template":{"outputs":[{"simpleText":{"text":'
+_KAKAO_TAIL = b"}}]}}"
+
+
+def kakao_body(text: str) -> bytes:
+    return _KAKAO_HEAD + dumps(text) + _KAKAO_TAIL
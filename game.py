@@ -1,10 +1,25 @@
 # game.py
-import os, json, random, threading, time
+import os, json, threading, time, atexit, signal, zlib, functools, errno, weakref, logging
+import fastjson
+import metrics
+import rng
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
 try:
     from zoneinfo import ZoneInfo
 except Exception:
     ZoneInfo = None
+try:
+    import fcntl
+except ImportError:  # Windows 등: 프로세스 내 잠금만 사용
+    fcntl = None
+
+from router import Router
+
+_log = logging.getLogger(__name__)
+metrics.counter("fishing_game_flush_errors_total", "game.Store 백그라운드 flush 실패 (type=예외 클래스)")
 
 class KakaoResp:
     @staticmethod
@@ -19,46 +34,399 @@ class KakaoResp:
         outputs = [{"simpleText":{"text": s}} for s in lines]
         return {"version":"2.0","template":{"outputs": outputs}}
 
+def _lockf(fd, op, offset: int):
+    """fcntl.lockf 1바이트 잠금. 커널의 교착 감지는 프로세스 단위라 스레드가 여럿이면
+    실제 교착이 아니어도 EDEADLK 를 돌려줄 수 있다. (잠금 순서는 항상 스트라이프 → 로그)
+    → 잠깐 쉬고 재시도."""
+    while True:
+        try:
+            fcntl.lockf(fd, op, 1, offset)
+            return
+        except OSError as e:
+            if e.errno != errno.EDEADLK:
+                raise
+            time.sleep(0.001)
+
+
+class StripeLock:
+    """유저 스트라이프 하나의 읽기/쓰기 잠금.
+
+    프로세스 안에서는 Condition 기반 RW 잠금(같은 스레드 재진입 허용),
+    프로세스 사이에서는 잠금 파일의 1바이트 범위에 fcntl 공유/배타 잠금을 건다.
+    (fcntl 레코드 잠금은 프로세스 단위라 스레드 간 구분은 앞단에서 해야 한다)
+
+    release(keep=True) 면 마지막 스레드가 놓아도 fcntl 배타 잠금은 쥔 채로 둔다(cached).
+    아직 로그에 안 쓴 변경이 있는 스트라이프를 다른 프로세스가 읽지 못하게 하고,
+    Store 가 배치 flush 를 마친 뒤 uncache() 로 한꺼번에 놓는다.
+    """
+
+    def __init__(self, fd, offset: int):
+        self._fd = fd
+        self._offset = offset
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = None
+        self._depth = 0
+        self.cached = False
+
+    def _flock(self, op: str):
+        if fcntl is not None and self._fd is not None:
+            _lockf(self._fd, getattr(fcntl, op), self._offset)
+
+    def acquire(self, write: bool = True):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._depth += 1
+                return
+            if write:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+                self._writer, self._depth = me, 1
+                if not self.cached:
+                    self._flock("LOCK_EX")
+            else:
+                while self._writer is not None:
+                    self._cond.wait()
+                self._readers += 1
+                if self._readers == 1 and not self.cached:
+                    self._flock("LOCK_SH")
+
+    def release(self, keep: bool = False):
+        with self._cond:
+            if self._writer == threading.get_ident():
+                self._depth -= 1
+                if self._depth:
+                    return
+                self._writer = None
+                if keep and self._fd is not None:
+                    self.cached = True
+            else:
+                self._readers -= 1
+                if self._readers:
+                    return
+            if not self.cached:
+                self._flock("LOCK_UN")
+            self._cond.notify_all()
+
+    def uncache(self):
+        """쥐고 있던 fcntl 잠금을 놓는다. 지금 쓰는 스레드가 있으면 다음 번에."""
+        if not self.cached or not self._cond.acquire(blocking=False):
+            return
+        try:
+            if self.cached and self._writer is None and not self._readers:
+                self._flock("LOCK_UN")
+                self.cached = False
+        finally:
+            self._cond.release()
+
+
 class Store:
+    """유저 단위 기록 저장소 (append-only 로그 + 오프셋 인덱스).
+
+    한 줄이 한 레코드: json(uid) \\t json(data) \\n
+    같은 uid 가 여러 번 나오면 마지막 줄이 유효하고, data 가 null 이면 삭제.
+    save_user 는 해당 유저의 바이트만 덧붙이므로 전체 플레이어 수와 무관하게 일정하다.
+    죽은(덮어써진) 바이트가 살아있는 바이트보다 많아지면 압축(compact)한다.
+
+    그 앞에 write-back 캐시를 둔다. load_user 는 메모리의 같은 dict 를 돌려주고
+    save_user 는 dirty 표시만 한다. 백그라운드 스레드가 flush_interval 마다,
+    또는 dirty 가 flush_changes 개 쌓이면 한 번의 write 로 모아서 기록한다.
+    SIGTERM/정상 종료 시에도 살아 있는 모든 Store 를 flush 한다 (프로세스당 핸들러 하나).
+
+    여러 gunicorn 워커가 같은 로그를 쓸 때는 locked(uid) 로 유저를 잠근다.
+    유저는 crc32(uid) 로 LOCK_STRIPES 개 스트라이프 중 하나에 묶이고,
+    shared=True 면 dirty 기록이 남은 스트라이프는 스레드가 놓아도 프로세스 간 잠금을
+    쥔 채로 두었다가, 배치 flush 로 기록한 뒤에 놓는다. 쥔 스트라이프가 있으면 배치 간격은
+    lock_hold 로 줄어서, 다른 프로세스는 그만큼만 기다리고 항상 최신 값을 읽는다.
+    잠금 파일의 0번 바이트는 덧붙이기(공유) / 압축(배타)용이다.
+    """
+
+    META_KEY = "#meta"
+    COMPACT_MIN_BYTES = 1 << 20   # 이보다 작은 로그는 압축하지 않음
+    LOCK_STRIPES = 256
 
-def get_meta(self):
-    with self._lock:
-        db = self._read()
-        if "meta" not in db:
-            db["meta"] = {"access_enabled": False, "owner": None}
-            self._write(db)
-        return db["meta"]
-
-def set_meta(self, meta:dict):
-    with self._lock:
-        db = self._read()
-        db["meta"] = meta
-        self._write(db)
-
-    def __init__(self, path: str):
+    def __init__(self, path: str, hot_size: int = 5000,
+                 flush_interval: float = 0.2, flush_changes: int = 100,
+                 shared: bool = True, register: bool = True, lock_hold: float = 0.02):
         self.path = path
+        self.shared = shared
+        self.hot_size = hot_size
+        self.flush_interval = flush_interval
+        self.lock_hold = lock_hold
+        self._holding = False   # 프로세스 간 잠금을 쥔 스트라이프가 있는지
+        self.flush_changes = flush_changes
         self._lock = threading.Lock()
-        if not os.path.exists(self.path):
-            self._write({"users":{}, "meta":{"access_enabled": False, "owner": None}})
-
-    def _read(self):
+        self._hot = OrderedDict()   # uid -> [user, _loc(uid)]  (LRU)
+        self._dirty = set()
+        self._wake = threading.Event()
+        self._fd = None
+        self._ino = None
+        self._index = {}   # uid -> (offset, length)  ※ 줄 전체 기준
+        self._end = 0      # 인덱싱이 끝난 위치
+        self._live = 0     # 살아있는 레코드 바이트 수
+        self._gen = 0      # 파일을 다시 열 때마다 증가 (압축 전후 오프셋 구분)
+        self.corrupt_lines = 0
+        self.flush_errors = 0          # 백그라운드 flush 실패 횟수 (dirty 는 남겨 두고 다음 주기에 재시도)
+        self.last_flush_error = None
+        self._closed = False
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock_fd = None
+        if fcntl is not None and shared:
+            self._lock_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        self._stripes = [StripeLock(self._lock_fd, i + 1) for i in range(self.LOCK_STRIPES)]
+        with self._lock:
+            with self._log_lock(exclusive=True):
+                self._migrate_legacy()
+            self._sync()
+            if self.META_KEY not in self._index:
+                self._append(self.META_KEY, {"access_enabled": False, "owner": None})
+        self._flusher = threading.Thread(target=self._flush_loop, name="store-flush", daemon=True)
+        self._flusher.start()
+        if register:   # 이전(migration)용 임시 Store 는 종료 훅에 올리지 않는다
+            _register_store(self)
+
+    # ── 로그 파일 ─────────────────────────────────────────
+    def _migrate_legacy(self):
+        # 예전 형식(전체 DB 를 담은 JSON 한 덩어리)이면 로그로 변환
         try:
-            with open(self.path,"r",encoding="utf-8") as f:
-                return json.load(f)
+            with open(self.path, "rb") as f:
+                head = f.read(64).lstrip()
+        except FileNotFoundError:
+            return
+        if not head.startswith(b"{"):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                db = json.load(f)
         except Exception:
-            return {"users":{}, "meta":{"access_enabled": False, "owner": None}}
+            return
+        records = list(db.get("users", {}).items())
+        records.append((self.META_KEY, db.get("meta", {"access_enabled": False, "owner": None})))
+        self._rewrite((self._encode(k, v) for k, v in records))
 
-    def _write(self, data):
-        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+    def _rewrite(self, lines):
         tmp = self.path + ".tmp"
-        with open(tmp,"w",encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with open(tmp, "wb") as f:
+            for line in lines:
+                f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
         os.replace(tmp, self.path)
 
+    @staticmethod
+    def _encode(uid: str, data) -> bytes:
+        return fastjson.dumps(uid) + b"\t" + fastjson.dumps(data) + b"\n"
+
+    def _reopen(self):
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self._ino = os.fstat(self._fd).st_ino
+        self._index, self._end, self._live = {}, 0, 0
+        self._gen += 1
+
+    def _sync(self):
+        """다른 프로세스가 덧붙인/압축한 내용을 인덱스에 반영."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+        if self._fd is None or st is None or st.st_ino != self._ino:
+            self._reopen()
+            st = os.fstat(self._fd)
+        if st.st_size > self._end:
+            self._scan(st.st_size)
+
+    def _scan(self, size: int):
+        buf = os.pread(self._fd, size - self._end, self._end)
+        pos = 0
+        while True:
+            nl = buf.find(b"\n", pos)
+            if nl < 0:
+                break  # 쓰는 중인 마지막 줄은 다음에
+            line = buf[pos:nl]
+            tab = line.find(b"\t")
+            try:
+                uid = fastjson.loads(line[:tab]) if tab > 0 else None
+            except ValueError:
+                uid = None   # 깨진 줄은 건너뛴다 (이전 기록이 유효)
+            if uid is None:
+                self.corrupt_lines += 1
+            else:
+                old = self._index.get(uid)
+                if old is not None:
+                    self._live -= old[1]
+                if line[tab + 1:] == b"null":
+                    self._index.pop(uid, None)
+                else:
+                    self._index[uid] = (self._end + pos, nl + 1 - pos)
+                    self._live += nl + 1 - pos
+            pos = nl + 1
+        self._end += pos
+
+    def _loc(self, uid: str):
+        loc = self._index.get(uid)
+        return None if loc is None else (self._gen,) + loc
+
+    def _get(self, uid: str):
+        loc = self._index.get(uid)
+        if loc is None:
+            return None
+        line = os.pread(self._fd, loc[1], loc[0])
+        return fastjson.loads(line[line.index(b"\t") + 1:])
+
+    def _append(self, uid: str, data):
+        self._append_many([(uid, data)])
+
+    def _append_many(self, records):
+        data = b"".join(self._encode(uid, data) for uid, data in records)
+        with self._log_lock(exclusive=False):
+            self._sync()   # 그 사이 압축됐으면 새 파일로 갈아탄다
+            os.write(self._fd, data)
+            self._sync()
+        if self._end - self._live > max(self.COMPACT_MIN_BYTES, self._live):
+            self.compact()
+
+    @contextmanager
+    def _log_lock(self, exclusive: bool):
+        if self._lock_fd is None:
+            yield
+            return
+        _lockf(self._lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH, 0)
+        try:
+            yield
+        finally:
+            _lockf(self._lock_fd, fcntl.LOCK_UN, 0)
+
+    def compact(self):
+        """살아있는 레코드만 새 파일로 옮겨 쓴다. (호출 측에서 self._lock 보유)"""
+        with self._log_lock(exclusive=True):
+            self._compact_locked()
+
+    def _compact_locked(self):
+        self._sync()
+        for uid in [k for k, e in self._hot.items() if k not in self._dirty and self._loc(k) != e[1]]:
+            del self._hot[uid]
+        items = sorted(self._index.values())
+        self._rewrite(os.pread(self._fd, length, off) for off, length in items)
+        self._reopen()
+        self._sync()
+        # 위치가 바뀌었으니 캐시가 가리키는 오프셋도 갱신
+        for uid, entry in self._hot.items():
+            entry[1] = self._loc(uid)
+
+    # ── write-back 캐시 ───────────────────────────────────
+    def _hot_get(self, uid: str):
+        entry = self._hot.get(uid)
+        if entry is None:
+            return None
+        if uid not in self._dirty and self._loc(uid) != entry[1]:
+            # 다른 프로세스가 더 새 기록을 남김 → 캐시 폐기
+            del self._hot[uid]
+            return None
+        self._hot.move_to_end(uid)
+        return entry[0]
+
+    def _hot_put(self, uid: str, user: dict):
+        self._hot[uid] = [user, self._loc(uid)]
+        self._hot.move_to_end(uid)
+        if len(self._hot) > self.hot_size:
+            evict = []
+            for k in self._hot:
+                if len(self._hot) - len(evict) <= self.hot_size:
+                    break
+                if k != uid:
+                    evict.append(k)
+            self._flush_locked([k for k in evict if k in self._dirty])
+            for k in evict:
+                del self._hot[k]
+
+    def _flush_locked(self, uids):
+        if not uids:
+            return
+        self._append_many([(k, self._hot[k][0]) for k in uids])
+        for k in uids:
+            self._dirty.discard(k)
+            self._hot[k][1] = self._loc(k)
+
+    def flush(self):
+        """dirty 유저를 모두 로그에 기록하고, 쥐고 있던 스트라이프 잠금을 놓는다."""
+        with self._lock:
+            if self._dirty:
+                self._sync()
+                self._flush_locked(list(self._dirty))
+            # save_user 는 잠금을 놓기 전에 불리므로 여기서 dirty 가 비었으면 놓아도 된다
+            holding = False
+            for stripe in self._stripes:
+                if stripe.cached:
+                    stripe.uncache()
+                    holding = holding or stripe.cached
+            self._holding = holding
+
+    def _flush_loop(self):
+        last = time.monotonic()
+        while not self._closed:
+            # 쥔 스트라이프가 생기면 lock_hold 안에 놓을 수 있도록 shared 는 짧게 깨어 본다
+            woke = self._wake.wait(self.lock_hold if self.shared else self.flush_interval)
+            self._wake.clear()
+            now = time.monotonic()
+            if not (woke or self._holding or now - last >= self.flush_interval):
+                continue
+            last = now
+            try:
+                self.flush()
+            except Exception as e:
+                # 디스크 가득/직렬화 실패 등 — dirty 는 그대로 두고 다음 주기에 재시도.
+                # 같은 실패가 이어지면 (lock_hold 마다 깨므로) 로그는 처음 한 번만
+                self.flush_errors += 1
+                metrics.inc("fishing_game_flush_errors_total", (("type", type(e).__name__),))
+                if self.last_flush_error != repr(e):
+                    _log.exception("store flush 실패 (%s, dirty %d명) — 재시도합니다", self.path, len(self._dirty))
+                self.last_flush_error = repr(e)
+            else:
+                if self.last_flush_error is not None:
+                    _log.warning("store flush 복구 (%s, 실패 %d회 뒤)", self.path, self.flush_errors)
+                    self.last_flush_error = None
+
+    # ── 프로세스 간 잠금 ─────────────────────────────────
+    @contextmanager
+    def locked(self, uid: str, write: bool = True):
+        """uid 가 속한 스트라이프를 잠근다. 같은 스레드에서 재진입 가능.
+        읽기 잠금 안에서 쓰기 잠금으로 올리는 것은 지원하지 않는다."""
+        stripe = self._stripes[zlib.crc32(uid.encode("utf-8")) % self.LOCK_STRIPES]
+        stripe.acquire(write)
+        try:
+            yield
+        finally:
+            # 아직 안 쓴 변경이 있으면 다음 배치 flush 까지 프로세스 간 잠금 유지
+            keep = self.shared and uid in self._dirty
+            stripe.release(keep=keep)
+            if keep:
+                self._holding = True
+
+    # ── 공개 API ─────────────────────────────────────────
+    def get_meta(self):
+        with self._lock:
+            self._sync()
+            meta = self._get(self.META_KEY)
+            if meta is None:
+                meta = {"access_enabled": False, "owner": None}
+                self._append(self.META_KEY, meta)
+            return meta
+
+    def set_meta(self, meta:dict):
+        with self._lock:
+            self._sync()
+            self._append(self.META_KEY, meta)
+
     def load_user(self, uid: str):
         with self._lock:
-            db = self._read()
-            u = db["users"].get(uid)
+            self._sync()
+            u = self._hot_get(uid)
+            if u is not None:
+                return u
+            u = self._get(uid)
             if not u:
                 u = {
                     "nickname": None,
@@ -82,20 +450,209 @@ def set_meta(self, meta:dict):
                     "rods_owned": {"대나무 낚싯대": True},  # 보유 목록
                     "last_attend": 0
                 }
-                db["users"][uid] = u
-                self._write(db)
+                self._dirty.add(uid)
+            self._hot_put(uid, u)
             return u
 
     def save_user(self, uid: str, user: dict):
         with self._lock:
-            db = self._read()
-            db["users"][uid] = user
-            self._write(db)
+            self._hot_put(uid, user)
+            self._dirty.add(uid)
+            if len(self._dirty) >= self.flush_changes:
+                self._wake.set()
+
+    def delete_user(self, uid: str):
+        with self._lock:
+            self._hot.pop(uid, None)
+            self._dirty.discard(uid)
+            self._sync()
+            if uid in self._index:
+                self._append(uid, None)
+
+    def uids(self):
+        with self._lock:
+            self._sync()
+            return [k for k in self._index if k != self.META_KEY]
+
+    def close(self):
+        self.flush()
+        self._closed = True
+        self._wake.set()
+        _live_stores.discard(self)
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+
+# ── 종료 시 flush (프로세스당 한 번 등록) ──────────────────
+_live_stores = weakref.WeakSet()
+_exit_hooks_lock = threading.Lock()
+_exit_hooks_installed = False
+
+def _flush_live_stores():
+    for st in list(_live_stores):
+        try:
+            st.flush()
+        except Exception:
+            pass
+
+def _register_store(store: Store):
+    global _exit_hooks_installed
+    _live_stores.add(store)
+    with _exit_hooks_lock:
+        if _exit_hooks_installed:
+            return
+        _exit_hooks_installed = True
+        atexit.register(_flush_live_stores)
+        # gunicorn 재시작(SIGTERM) 시 유실 방지. 기존 핸들러는 그대로 이어서 호출
+        try:
+            prev = signal.getsignal(signal.SIGTERM)
+
+            def handler(signum, frame):
+                _flush_live_stores()
+                if callable(prev):
+                    prev(signum, frame)
+                elif prev == signal.SIG_DFL:
+                    raise SystemExit(128 + signum)
+
+            signal.signal(signal.SIGTERM, handler)
+        except ValueError:
+            pass  # 메인 스레드가 아니면 atexit 에만 의존
+
+
+class ShardUnavailable(Exception):
+    """해당 샤드를 열 수 없음. 다른 샤드의 유저는 영향 없음."""
+
+
+class ShardedStore:
+    """유저를 uid 해시로 N개의 Store(로그 파일)에 나눠 담는다.
+
+    <path>.shards/shard-XX.log 마다 잠금·쓰기 경로·캐시가 따로라 쓰기 처리량이
+    샤드 수만큼 늘고, 한 샤드가 깨져도 그 샤드 유저만 ShardUnavailable 이 난다.
+    샤드는 처음 쓰일 때 연다. meta 는 0번 샤드에 둔다.
+    샤드 수는 SHARDS 파일에 기록되며, 바꾸려면 재분배가 필요하다.
+    """
+
+    def __init__(self, path: str, shards: int = 8, **store_kwargs):
+        self.path = path
+        self.dir = path + ".shards"
+        self.shards = shards
+        self._store_kwargs = store_kwargs
+        self._stores = [None] * shards
+        self._open_lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+        # 여러 워커가 동시에 떠도 이전(migration)은 한 번만
+        init_fd = os.open(os.path.join(self.dir, "SHARDS.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                _lockf(init_fd, fcntl.LOCK_EX, 0)
+            self._init_layout()
+        finally:
+            os.close(init_fd)
+
+    def _init_layout(self):
+        marker = os.path.join(self.dir, "SHARDS")
+        if os.path.exists(marker):
+            with open(marker, "r", encoding="utf-8") as f:
+                existing = int(f.read().strip() or 0)
+            if existing != self.shards:
+                raise ValueError(f"{self.dir} 는 {existing}개 샤드로 만들어졌습니다. (요청: {self.shards})")
+            return
+        self._migrate_single()
+        with open(marker, "w", encoding="utf-8") as f:
+            f.write(str(self.shards))
+
+    def shard_of(self, uid: str) -> int:
+        if uid == Store.META_KEY:
+            return 0
+        # Store 의 잠금 스트라이프(crc32)와 겹치지 않도록 다른 해시 사용
+        return zlib.adler32(uid.encode("utf-8")) % self.shards
+
+    def _shard_path(self, i: int) -> str:
+        return os.path.join(self.dir, f"shard-{i:02d}.log")
+
+    def shard(self, i: int) -> Store:
+        st = self._stores[i]
+        if st is not None:
+            return st
+        with self._open_lock:
+            if self._stores[i] is None:
+                try:
+                    self._stores[i] = Store(self._shard_path(i), **self._store_kwargs)
+                except Exception as e:
+                    raise ShardUnavailable(f"shard {i}: {e}") from e
+            return self._stores[i]
+
+    def _for(self, uid: str) -> Store:
+        return self.shard(self.shard_of(uid))
+
+    def _migrate_single(self):
+        # 기존 단일 파일(JSON 또는 로그)이 있으면 샤드로 나눠 옮긴다
+        if not os.path.isfile(self.path):
+            return
+        src = Store(self.path, shared=False, register=False)
+        try:
+            for uid in src.uids():
+                self._for(uid).save_user(uid, src._get(uid))
+            self.shard(0).set_meta(src.get_meta())
+        finally:
+            src.close()
+        self.flush()
+        os.replace(self.path, self.path + ".migrated")
+
+    # ── Store 와 같은 인터페이스 ─────────────────────────
+    def locked(self, uid: str, write: bool = True):
+        return self._for(uid).locked(uid, write=write)
+
+    def load_user(self, uid: str):
+        return self._for(uid).load_user(uid)
+
+    def save_user(self, uid: str, user: dict):
+        self._for(uid).save_user(uid, user)
+
+    def delete_user(self, uid: str):
+        self._for(uid).delete_user(uid)
+
+    def get_meta(self):
+        return self.shard(0).get_meta()
+
+    def set_meta(self, meta: dict):
+        self.shard(0).set_meta(meta)
+
+    def uids(self):
+        out = []
+        for i in range(self.shards):
+            out.extend(self.shard(i).uids())
+        return out
+
+    def flush(self):
+        for st in self._stores:
+            if st is not None:
+                st.flush()
+
+    def close(self):
+        for st in self._stores:
+            if st is not None:
+                st.close()
+
+def _user_command(write: bool = True):
+    """cmd_* 메서드를 해당 유저 잠금 안에서 실행 (첫 인자가 uid)."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(self, uid, *args, **kwargs):
+            with self.store.locked(uid, write=write):
+                return fn(self, uid, *args, **kwargs)
+        return wrapper
+    return deco
+
 
 class FishingGame:
-    def __init__(self, db_path="fishing.json"):
-        self.store = Store(db_path)
-        random.seed()
+    def __init__(self, db_path="fishing.json", shards: int = 1):
+        self.store = ShardedStore(db_path, shards) if shards > 1 else Store(db_path)
 
         # 상점 품목 (번호 고정)
         self.shop_items = [
@@ -115,19 +672,19 @@ class FishingGame:
             {"id":13,"name":"프로 낚싯대","price":20000,"desc":"대형 +2%p, 소형 -5%p","rod":True},
             {"id":14,"name":"레전드 낚싯대","price":100000,"desc":"대형 +5%p, 소형 -20%p","rod":True},
         ]
-self.required_bait = {"바다":"지렁이","민물":"떡밥"}
-self.unit_price_map = {
-    "지렁이": 10,
-    "떡밥": 10,
-    "집어제": 500,
-    "케미라이트1등급": 600,
-    "케미라이트2등급": 350,
-    "케미라이트3등급": 200,
-    "철제 낚싯대": 1000,
-    "강화 낚싯대": 5000,
-    "프로 낚싯대": 20000,
-    "레전드 낚싯대": 100000,
-}
+        self.required_bait = {"바다":"지렁이","민물":"떡밥"}
+        self.unit_price_map = {
+            "지렁이": 10,
+            "떡밥": 10,
+            "집어제": 500,
+            "케미라이트1등급": 600,
+            "케미라이트2등급": 350,
+            "케미라이트3등급": 200,
+            "철제 낚싯대": 1000,
+            "강화 낚싯대": 5000,
+            "프로 낚싯대": 20000,
+            "레전드 낚싯대": 100000,
+        }
 
         # 어종/사이즈 범위
         self.fish_catalog = {
@@ -143,6 +700,47 @@ self.unit_price_map = {
             }
         }
 
+        self._compile_tables()
+        self.router = self._build_router()
+
+    # ── 명령어 라우팅 ─────────────────────────────────────
+    def _build_router(self):
+        # 인자를 받지 않는 명령도 뒤에 붙은 토큰은 무시한다 (app.py 의 핸들러들처럼 *args)
+        r = Router(empty=self.cmd_home, unknown=lambda uid, *a: self.help_text("알 수 없는 명령어입니다."))
+        r.register(("/", "/홈"), lambda uid, *a: self.cmd_home(uid))
+        r.register("/시작", lambda uid, *a: self.cmd_start(uid))
+        r.register("/도움말", lambda uid, *a: self.help_text())
+        r.register("/닉네임", self.cmd_set_nickname, rest=True)
+        r.register("/상태", lambda uid, *a: self.cmd_status(uid))
+        r.register("/가방", lambda uid, *a: self.cmd_inventory(uid))
+        r.register("/장소", self.cmd_set_spot, rest=True)
+        r.register("/상점", lambda uid, *a: self.cmd_shop())
+        r.register("/낚시대", lambda uid, *a: self.cmd_rod_list())
+        r.register("/구매", self.cmd_buy, rest=True)
+        r.register("/판매", self.cmd_sell_one, rest=True)
+        r.register("/전부판매", lambda uid, *a: self.cmd_sell_all(uid))
+        r.register("/출석", lambda uid, *a: self.cmd_attend(uid))
+        r.register("/케미라이트사용", self.cmd_use_chem, rest=True)
+        for grade in (1, 2, 3):
+            name = f"케미라이트{grade}등급"   # /케미라이트1등급 사용
+            r.register("/" + name, lambda uid, *a, name=name: self.cmd_use_chem_named(uid, name))
+        r.register("/장착", self.cmd_equip_rod, rest=True)
+        r.register("/초보자찬스", lambda uid, *a: self.cmd_newbie_chance(uid))
+        r.register("/집어제사용", lambda uid, *a: self.cmd_use_chum(uid))
+        r.register("/아이템판매", self.cmd_sell_item_prepare, rest=True)
+        r.register("/판매확인", lambda uid, *a: self.cmd_sell_item_confirm(uid))
+        r.register("/판매취소", lambda uid, *a: self.cmd_sell_item_cancel(uid))
+        r.register("/활성화", lambda uid, *a: self.cmd_enable_access(uid))
+        r.register("/해제", lambda uid, *a: self.cmd_disable_access(uid))
+        r.register("/낚시", self.cmd_cast, rest=True)
+        r.register("/릴감기", lambda uid, *a: self.cmd_reel(uid))
+        return r
+
+    def handle(self, uid:str, utter:str):
+        """발화 하나를 처리해 카카오 응답(dict)을 돌려줍니다."""
+        res = self.router.dispatch(utter, uid)
+        return res if isinstance(res, dict) else KakaoResp.text(res)
+
     # ── 도움말/시작/닉네임 ─────────────────────────────────
     def help_text(self, extra:str=""):
         lines = [
@@ -160,14 +758,15 @@ self.unit_price_map = {
         if extra: lines.append(f"\n⚠️ {extra}")
         return "\n".join(lines)
 
+    @_user_command(write=False)
     def cmd_start(self, uid:str):
         u = self.store.load_user(uid)
         if not u.get("nick_locked"):
-            return "처음 오셨네요! 닉네임을 설정해 주세요. (닉네임은 이후 변경 불가)
-예) /닉네임 낚시왕카카오"
+            return "처음 오셨네요! 닉네임을 설정해 주세요. (닉네임은 이후 변경 불가)\n예) /닉네임 낚시왕카카오"
         return "이미 닉네임이 설정되었습니다. 메뉴를 보려면 '/' 를 입력하세요."
 
 
+    @_user_command()
     def cmd_set_nickname(self, uid:str, arg:str):
         name = arg if arg is not None else ""
         if not name or name.strip() == "":
@@ -189,8 +788,11 @@ self.unit_price_map = {
         if lv >= 31: return "낚시인"
         return "낚린이"
 
+    LEVEL_BRACKETS = (31, 71, 100)   # level_bonus 구간 경계 (1~30 / 31~70 / 71~99 / 100~)
+
     def level_bonus(self, lv:int, grade:str)->float:
         # 모든등급 공통 보정은 소형만. 중형/대형은 등급별 보정만
+        # 구간을 바꾸면 LEVEL_BRACKETS 도 같이 바꿀 것 (_compile_tables)
         if lv >= 100:
             if grade == "소형": return 10.0
             if grade == "중형": return 15.0
@@ -213,84 +815,83 @@ self.unit_price_map = {
         return f"{self.title_by_level(u['lv'])} {nick}"
 
     # ── 상태/가방 ────────────────────────────────────────
+    @_user_command(write=False)
     def cmd_status(self, uid:str):
         u = self.store.load_user(uid)
         inv = u["inventory"]
         used, _ = self.count_used_slots(u)
-        return (f"[상태] {self.display_name(u) + (f"\n집어제 효과 남은 횟수: {u.get(\'additive_uses\',0)}회" if u.get("additive_uses",0)>0 else "")} | Lv.{u['lv']}  Exp:{u['exp']}/{self.required_exp(u.get('lv',1))}  Gold:{u['gold']} | 제한골드:{u.get('gold_restricted',0)}\n"
+        additive = f"\n집어제 효과 남은 횟수: {u.get('additive_uses',0)}회" if u.get("additive_uses",0)>0 else ""
+        return (f"[상태] {self.display_name(u) + additive} | Lv.{u['lv']}  Exp:{u['exp']}/{self.required_exp(u.get('lv',1))}  Gold:{u['gold']} | 제한골드:{u.get('gold_restricted',0)}\n"
                 f"장소: {u['spot']}  |  장착 낚시대: {u['rod']}\n"
                 f"가방: {used}/5칸 사용\n"
                 f"지렁이({inv['지렁이']}), 떡밥({inv['떡밥']}), 집어제({inv['집어제']}), "
                 f"케미1({inv['케미라이트1등급']}), 케미2({inv['케미라이트2등급']}), 케미3({inv['케미라이트3등급']})")
 
+    @_user_command(write=False)
     def cmd_inventory(self, uid:str):
-    u = self.store.load_user(uid)
-    inv = u["inventory"]
-    used, max_slot = self.count_used_slots(u)
-    lines = [f"[가방] {used}/{max_slot}칸 사용"]
-
-    # Build slot entries: fishes first (as recorded), then consumables present (1-slot per type)
-    slots = []
-    # 1) Fishes in bag
-    for fish in u["bag"]:
-        sale = self.sale_price_from_record(fish)
-        slots.append(f"{fish['name']} {fish['size']}cm ({fish['grade']}) - 판매가 {sale}골드")
-    # 2) Consumables (if present)
-    def add_consume_line(name, label):
-        if inv.get(name,0) > 0:
-            if name == "집어제":
-                slots.append(f"{label} ({inv[name]}개) - 소모품 · 사용: /집어제사용")
-            elif name.startswith("케미라이트"):
-                grade = "1" if "1등급" in label else ("2" if "2등급" in label else "3")
-                slots.append(f"{label} ({inv[name]}개) - 소모품 · 사용: /{label} 사용 (20:00~05:00)")
-            elif name in ("지렁이","떡밥"):
-                slots.append(f"{label} ({inv[name]}개) - 소모품")
-            else:
-        # 집어제 지속 차감
-        if u.get("additive_uses",0) > 0:
-            u["additive_uses"] -= 1
-                slots.append(f"{label} ({inv[name]}개)")
-    add_consume_line("지렁이","지렁이")
-    add_consume_line("떡밥","떡밥")
-    add_consume_line("집어제","집어제")
-    add_consume_line("케미라이트1등급","케미라이트1등급")
-    add_consume_line("케미라이트2등급","케미라이트2등급")
-    add_consume_line("케미라이트3등급","케미라이트3등급")
-
-    # Cap to 5 slots and pad with empty
-    view_slots = slots[:5]
-    while len(view_slots) < 5:
-        view_slots.append("비어있음")
-
-    # Numbered lines 1~5
-    for i, entry in enumerate(view_slots, 1):
-        lines.append(f"{i}. {entry}")
-
-    # Missing (not owned) consumables list
-    missing = []
-    for key, label in [("지렁이","지렁이"),("떡밥","떡밥"),("집어제","집어제"),
-                       ("케미라이트1등급","케미라이트1등급"),("케미라이트2등급","케미라이트2등급"),("케미라이트3등급","케미라이트3등급")]:
-        if inv.get(key,0) <= 0:
-            missing.append(label)
-    if missing:
-        lines.append("")
-        lines.append("보유하지 않은 물품: " + ", ".join(missing))
-
-    return "
-".join(lines)
+        u = self.store.load_user(uid)
+        inv = u["inventory"]
+        used, max_slot = self.count_used_slots(u)
+        lines = [f"[가방] {used}/{max_slot}칸 사용"]
+
+        # Build slot entries: fishes first (as recorded), then consumables present (1-slot per type)
+        slots = []
+        # 1) Fishes in bag
+        for fish in u["bag"]:
+            sale = self.sale_price_from_record(fish)
+            slots.append(f"{fish['name']} {fish['size']}cm ({fish['grade']}) - 판매가 {sale}골드")
+        # 2) Consumables (if present)
+        def add_consume_line(name, label):
+            if inv.get(name,0) > 0:
+                if name == "집어제":
+                    slots.append(f"{label} ({inv[name]}개) - 소모품 · 사용: /집어제사용")
+                elif name.startswith("케미라이트"):
+                    grade = "1" if "1등급" in label else ("2" if "2등급" in label else "3")
+                    slots.append(f"{label} ({inv[name]}개) - 소모품 · 사용: /{label} 사용 (20:00~05:00)")
+                elif name in ("지렁이","떡밥"):
+                    slots.append(f"{label} ({inv[name]}개) - 소모품")
+                else:
+                    slots.append(f"{label} ({inv[name]}개)")
+        add_consume_line("지렁이","지렁이")
+        add_consume_line("떡밥","떡밥")
+        add_consume_line("집어제","집어제")
+        add_consume_line("케미라이트1등급","케미라이트1등급")
+        add_consume_line("케미라이트2등급","케미라이트2등급")
+        add_consume_line("케미라이트3등급","케미라이트3등급")
+
+        # Cap to 5 slots and pad with empty
+        view_slots = slots[:5]
+        while len(view_slots) < 5:
+            view_slots.append("비어있음")
+
+        # Numbered lines 1~5
+        for i, entry in enumerate(view_slots, 1):
+            lines.append(f"{i}. {entry}")
+
+        # Missing (not owned) consumables list
+        missing = []
+        for key, label in [("지렁이","지렁이"),("떡밥","떡밥"),("집어제","집어제"),
+                           ("케미라이트1등급","케미라이트1등급"),("케미라이트2등급","케미라이트2등급"),("케미라이트3등급","케미라이트3등급")]:
+            if inv.get(key,0) <= 0:
+                missing.append(label)
+        if missing:
+            lines.append("")
+            lines.append("보유하지 않은 물품: " + ", ".join(missing))
+
+        return "\n".join(lines)
 
 
     def inventory_slot_lines(self, u:dict):
-    # (Deprecated in new layout) Kept for compatibility if referenced elsewhere.
-    inv = u["inventory"]
-    lines = []
-    if inv.get("지렁이",0) > 0: lines.append(f"지렁이 ({inv['지렁이']}개) - 소모품")
-    if inv.get("떡밥",0) > 0: lines.append(f"떡밥 ({inv['떡밥']}개) - 소모품")
-    if inv.get("집어제",0) > 0: lines.append(f"집어제 ({inv['집어제']}개) - 소모품 · 사용: /집어제사용")
-    if inv.get("케미라이트1등급",0) > 0: lines.append(f"케미라이트1등급 ({inv['케미라이트1등급']}개) - 소모품 · 사용: /케미라이트사용 1")
-    if inv.get("케미라이트2등급",0) > 0: lines.append(f"케미라이트2등급 ({inv['케미라이트2등급']}개) - 소모품 · 사용: /케미라이트사용 2")
-    if inv.get("케미라이트3등급",0) > 0: lines.append(f"케미라이트3등급 ({inv['케미라이트3등급']}개) - 소모품 · 사용: /케미라이트사용 3")
-    return lines
+        # (Deprecated in new layout) Kept for compatibility if referenced elsewhere.
+        inv = u["inventory"]
+        lines = []
+        if inv.get("지렁이",0) > 0: lines.append(f"지렁이 ({inv['지렁이']}개) - 소모품")
+        if inv.get("떡밥",0) > 0: lines.append(f"떡밥 ({inv['떡밥']}개) - 소모품")
+        if inv.get("집어제",0) > 0: lines.append(f"집어제 ({inv['집어제']}개) - 소모품 · 사용: /집어제사용")
+        if inv.get("케미라이트1등급",0) > 0: lines.append(f"케미라이트1등급 ({inv['케미라이트1등급']}개) - 소모품 · 사용: /케미라이트사용 1")
+        if inv.get("케미라이트2등급",0) > 0: lines.append(f"케미라이트2등급 ({inv['케미라이트2등급']}개) - 소모품 · 사용: /케미라이트사용 2")
+        if inv.get("케미라이트3등급",0) > 0: lines.append(f"케미라이트3등급 ({inv['케미라이트3등급']}개) - 소모품 · 사용: /케미라이트사용 3")
+        return lines
 
 
     def count_used_slots(self, u:dict):
@@ -305,6 +906,7 @@ self.unit_price_map = {
         return used, {}
 
     # ── 장소/상점/구매/판매/출석/버프 ──────────────────────
+    @_user_command()
     def cmd_set_spot(self, uid:str, arg:str):
         arg = (arg or "").strip()
         if arg not in ("바다","민물"):
@@ -315,6 +917,7 @@ self.unit_price_map = {
         need = {"바다":"지렁이","민물":"떡밥"}[arg]
         return f"장소를 {arg}(으)로 설정했어요. 이제 /낚시 [1~60]s 으로 시작하세요! (필요 소모품: {need})"
 
+    @_user_command(write=False)
     def get_spot(self, uid:str):
         u = self.store.load_user(uid)
         return u.get("spot","민물")
@@ -325,6 +928,7 @@ self.unit_price_map = {
             lines.append(f"{it['id']}. {it['name']} - {it['price']}골드 ({it['desc']})")
         return "\n".join(lines)
 
+    @_user_command()
     def cmd_buy(self, uid:str, arg:str):
         if not arg.isdigit():
             return "구매할 번호를 입력해 주세요. 예) /구매 1"
@@ -334,19 +938,19 @@ self.unit_price_map = {
             return "없는 상품 번호예요."
         u = self.store.load_user(uid)
         # 결제 가능 여부 (제한골드 우선 사용: 지렁이/떡밥만)
-price = item["price"]
-name = item.get("name","")
-can_use_restricted = ("지렁이" in name) or ("떡밥" in name)
-normal = u.get("gold",0)
-restricted = u.get("gold_restricted",0)
-if can_use_restricted:
-    use_restricted = min(price, restricted)
-    remain = price - use_restricted
-    if normal < remain:
-        return "골드가 부족해요."
-else:
-    if normal < price:
-        return "골드가 부족해요."
+        price = item["price"]
+        name = item.get("name","")
+        can_use_restricted = ("지렁이" in name) or ("떡밥" in name)
+        normal = u.get("gold",0)
+        restricted = u.get("gold_restricted",0)
+        if can_use_restricted:
+            use_restricted = min(price, restricted)
+            remain = price - use_restricted
+            if normal < remain:
+                return "골드가 부족해요."
+        else:
+            if normal < price:
+                return "골드가 부족해요."
 
         # 슬롯 체크 (소모품만)
         if not item.get("rod"):
@@ -366,15 +970,15 @@ else:
 
         # 결제 + 지급
         # 실제 차감
-price = item["price"]
-name = item.get("name","")
-can_use_restricted = ("지렁이" in name) or ("떡밥" in name)
-if can_use_restricted:
-    use_restricted = min(price, u.get("gold_restricted",0))
-    u["gold_restricted"] = u.get("gold_restricted",0) - use_restricted
-    u["gold"] -= (price - use_restricted)
-else:
-    u["gold"] -= price
+        price = item["price"]
+        name = item.get("name","")
+        can_use_restricted = ("지렁이" in name) or ("떡밥" in name)
+        if can_use_restricted:
+            use_restricted = min(price, u.get("gold_restricted",0))
+            u["gold_restricted"] = u.get("gold_restricted",0) - use_restricted
+            u["gold"] -= (price - use_restricted)
+        else:
+            u["gold"] -= price
         if item.get("rod"):
             u["rods_owned"][item["name"]] = True
             msg_tail = " (낚시대 보유 목록에 추가)"
@@ -396,6 +1000,7 @@ else:
         m = self.sale_multiplier(fish.get("grade", "소형"))
         return int(round(base * m))
 
+    @_user_command()
     def cmd_sell_one(self, uid:str, arg:str):
         if not arg.isdigit(): return "판매할 번호를 입력해 주세요. 예) /판매 1"
         idx = int(arg)-1
@@ -407,6 +1012,7 @@ else:
         self.store.save_user(uid,u)
         return f"{fish['name']} {fish['size']}cm를 {sale}골드에 판매! 현재 {u['gold']}골드"
 
+    @_user_command()
     def cmd_sell_all(self, uid:str):
         u = self.store.load_user(uid)
         total = sum(self.sale_price_from_record(f) for f in u["bag"])
@@ -416,6 +1022,7 @@ else:
         self.store.save_user(uid,u)
         return f"총 {cnt}마리, {total}골드 획득! 현재 {u['gold']}골드"
 
+    @_user_command()
     def cmd_attend(self, uid:str):
         u = self.store.load_user(uid)
 
@@ -462,6 +1069,7 @@ else:
         except Exception:
             return datetime.now()
 
+    @_user_command()
     def cmd_use_chem(self, uid:str, arg:str):
         # /케미라이트사용 [1|2|3] - 밤 20:00~05:00만 사용 가능
         u = self.store.load_user(uid)
@@ -495,6 +1103,7 @@ else:
                  "구매: /구매 [번호]   장착: /장착 낚시대 [이름]"]
         return "\n".join(lines)
 
+    @_user_command()
     def cmd_equip_rod(self, uid:str, arg:str):
         # /장착 낚시대 [이름]
         parts = (arg or "").split(maxsplit=1)
@@ -511,6 +1120,7 @@ else:
         return f"{name} 을(를) 장착했습니다!"
 
     # ── 낚시 처리 ────────────────────────────────────────
+    @_user_command()
     def prepare_cast(self, uid:str, spot:str):
         if spot not in ("바다","민물"):
             return False, "장소는 바다/민물만 가능해요."
@@ -523,6 +1133,36 @@ else:
         self.store.save_user(uid,u)
         return True, f"{spot} 낚시 소모품 {need} 1개 사용!"
 
+    @_user_command()
+    def cmd_cast(self, uid:str, arg:str):
+        # /낚시 [1~60]s
+        sec_txt = (arg or "").strip().rstrip("sS초")
+        if not sec_txt.isdigit() or not 1 <= int(sec_txt) <= 60:
+            return "사용법: /낚시 [1~60]s  (예: /낚시 15s)"
+        u = self.store.load_user(uid)
+        if u.get("casting"):
+            remain = max(0, int(u["casting"]["start"] + u["casting"]["sec"] - time.time()))
+            return f"이미 캐스팅 중이에요. {remain}초 후 /릴감기 로 확인하세요."
+        spot = u.get("spot", "민물")
+        ok, msg = self.prepare_cast(uid, spot)
+        if not ok:
+            return msg
+        u["casting"] = {"start": time.time(), "sec": int(sec_txt), "spot": spot}
+        self.store.save_user(uid, u)
+        return f"{msg}\n🎣 캐스팅! {sec_txt}초 후 /릴감기 로 결과를 확인하세요."
+
+    @_user_command()
+    def cmd_reel(self, uid:str):
+        u = self.store.load_user(uid)
+        cast = u.get("casting")
+        if not cast:
+            return "먼저 /낚시 [1~60]s 으로 캐스팅해 주세요."
+        u["casting"] = None
+        self.store.save_user(uid, u)
+        elapsed = int(time.time() - cast["start"])
+        early = elapsed < cast["sec"]
+        return self.resolve_fishing(uid, cast["spot"], cast["sec"], min(elapsed, cast["sec"]), early)
+
     # 소형/중형/대형 가격 & 경험치
     def calc_price(self, grade:str, size_cm:int):
         if grade == "소형":
@@ -534,19 +1174,49 @@ else:
         return size_cm
 
     
-def calc_exp(self, grade:str, size_cm:int) -> int:
-    """
-    EXP 계산 규칙:
-    - 소형: size_cm
-    - 중형: size_cm * 10
-    - 대형: size_cm * 100
-    """
-    if grade == "대형":
-        return size_cm * 100
-    if grade == "중형":
-        return size_cm * 10
-    return size_cm  # 소형
+    def calc_exp(self, grade:str, size_cm:int) -> int:
+        """
+        EXP 계산 규칙:
+        - 소형: size_cm
+        - 중형: size_cm * 10
+        - 대형: size_cm * 100
+        """
+        if grade == "대형":
+            return size_cm * 100
+        if grade == "중형":
+            return size_cm * 10
+        return size_cm  # 소형
+
+
+    # ── 확률 표 (resolve_fishing 과 시뮬레이터가 같이 쓴다) ──────────
+    # 등급 선택 확률(기본): 소형 98.99%, 중형 1.00%, 대형 0.01%
+    GRADE_P = {"소형": 98.99, "중형": 1.0, "대형": 0.01}
+    # '모든 장비+아이템' 콤보(강화 낚싯대, 집어제 준비, 케미 2등급 준비, 60s 이상) 시 중형 가중치 상승
+    COMBO_RODS = ("강화 낚싯대","철제 낚싯대")
+    COMBO_P_MED = 5.5
+    # 등급별 시간 보정 상한(%p). 초당 상한/60 씩 올라 60초에 상한 도달
+    TIME_BONUS_CAP = {"소형": 38.2252, "중형": 5.0, "대형": 1.0}
+    ADDITIVE_BONUS = 5.0
+    CHEM_BONUS = {1: ("대형", 5.0), 2: ("중형", 3.0), 3: ("소형", 1.0)}  # 케미 등급 → (대상 등급, %p)
+    ROD_BONUS = {
+        "철제 낚싯대": {"소형": 2.0, "중형": 2.0},
+        "강화 낚싯대": {"소형": 5.0, "중형": 5.0},
+        "프로 낚싯대": {"대형": 2.0, "소형": -5.0},
+        "레전드 낚싯대": {"대형": 5.0, "소형": -20.0},
+    }
+    EARLY_PENALTY = 80.0
+    MAX_SUCCESS_P = 95.0
 
+    def grade_probs(self, rod:str, additive_ready, chem_ready, chem_grade, secs:int):
+        P_SMALL, P_MED, P_LARGE = self.GRADE_P["소형"], self.GRADE_P["중형"], self.GRADE_P["대형"]
+        if (rod in self.COMBO_RODS and additive_ready and chem_ready and chem_grade == 2 and secs >= 60):
+            P_MED = self.COMBO_P_MED
+            P_SMALL = 100.0 - P_MED - P_LARGE
+        return P_SMALL, P_MED, P_LARGE
+
+    def time_bonus(self, grade:str, secs:int) -> float:
+        cap = self.TIME_BONUS_CAP.get(grade)
+        return min(cap, secs * (cap/60.0)) if cap is not None else 0.0
 
     SIZE_BINS = [("XS",0.40),("S",0.30),("M",0.20),("L",0.07),("XL",0.03)]
     BASE_BY_GRADE_BIN = {
@@ -555,101 +1225,113 @@ def calc_exp(self, grade:str, size_cm:int) -> int:
         "대형": {"XS":0.002,"S":0.0015,"M":0.001,"L":0.00035,"XL":0.00015} # 각 어종 0.005%p 분배
     }
 
-    def pick_species_and_size(self, spot:str, grade:str):
-        name, smin, smax = random.choice(self.fish_catalog[spot][grade])
-        # 사이즈 구간 선택(확률 가중)
-        r = random.random()
-        acc = 0.0
-        chosen_bin = "XS"
-        for b, w in self.SIZE_BINS:
+    # ── 컴파일된 확률 표 ─────────────────────────────────
+    GRADES = ("소형", "중형", "대형")
+
+    def _compile_tables(self):
+        """위 상수/보정 함수로 (낚싯대, 레벨 구간, 케미, 집어제, 조기 릴, 등급, 사이즈 구간, 초) 별
+        최종 성공률과 등급 경계를 미리 계산해 둔다. resolve_fishing 과 같은 순서로 더하므로 값이 같다."""
+        secs_range = range(61)
+        rods = [None] + sorted(set(self.ROD_BONUS) | set(self.COMBO_RODS))
+        self._rod_index = {rod: i for i, rod in enumerate(rods) if rod is not None}
+        levels = (1,) + self.LEVEL_BRACKETS
+        chems = (0,) + tuple(sorted(self.CHEM_BONUS))
+        self._chem_index = {cg: i for i, cg in enumerate(chems) if cg}
+        bins = [b for b, _ in self.SIZE_BINS]
+
+        # 등급 경계 [낚싯대][집어제 준비][케미][초] -> (소형 상한, 중형 상한)
+        def cuts(rod, additive_ready, cg, secs):
+            p_small, p_med, _ = self.grade_probs(rod, additive_ready, bool(cg), cg, secs)
+            return (p_small, p_small + p_med)
+        self._grade_cuts = tuple(
+            tuple(tuple(tuple(cuts(rod, ready, cg, s) for s in secs_range) for cg in chems) for ready in (False, True))
+            for rod in rods)
+
+        # 등급별 시간 보정 [등급][초]
+        time_b = [[self.time_bonus(g, s) for s in secs_range] for g in self.GRADES]
+
+        # 최종 성공률 [낚싯대][레벨 구간][케미][집어제 사용중][조기 릴][등급][사이즈 구간][초]
+        def success(rod, lv, cg, additive, early, gi, b):
+            g = self.GRADES[gi]
+            bonus = 0.0
+            if additive:
+                bonus += self.ADDITIVE_BONUS
+            if cg:
+                chem_grade, chem_bonus = self.CHEM_BONUS.get(cg, (None, 0.0))
+                if g == chem_grade: bonus += chem_bonus
+            rod_bonus = self.ROD_BONUS.get(rod, {})
+            if g in rod_bonus: bonus += rod_bonus[g]
+            bonus += self.level_bonus(lv, g)
+            if early:
+                bonus -= self.EARLY_PENALTY
+            base = self.BASE_BY_GRADE_BIN[g][b]
+            return tuple(max(0.0, min(self.MAX_SUCCESS_P, base + t + bonus)) for t in time_b[gi])
+        self._success_p = tuple(
+            tuple(tuple(tuple(tuple(
+                tuple(tuple(success(rod, lv, cg, add, early, gi, b) for b in bins) for gi in range(len(self.GRADES)))
+                for early in (False, True)) for add in (False, True)) for cg in chems) for lv in levels)
+            for rod in rods)
+
+        # 사이즈 구간 누적 확률, 어종별 구간 범위 [장소][등급] -> [(이름, lows, highs)]
+        acc, self._bin_cum = 0.0, []
+        for _, w in self.SIZE_BINS:
             acc += w
-            if r <= acc:
-                chosen_bin = b
-                break
-        # 구간 범위 동일 5등분
-        span = max(1, smax - smin + 1)
-        step = span / 5.0
-        bin_idx = {"XS":0,"S":1,"M":2,"L":3,"XL":4}[chosen_bin]
-        low = int(smin + bin_idx*step)
-        high = int(smin + (bin_idx+1)*step) - 1
-        if high < low: high = low
-        size = random.randint(low, min(high, smax))
-        base = self.BASE_BY_GRADE_BIN[grade][chosen_bin]
-        return {"name":name, "size":size, "grade":grade, "base_prob":base, "bin":chosen_bin}
-
+            self._bin_cum.append(acc)
+        self._catalog = {}
+        for spot, by_grade in self.fish_catalog.items():
+            per_grade = []
+            for g in self.GRADES:
+                rows = []
+                for name, smin, smax in by_grade[g]:
+                    span = max(1, smax - smin + 1)
+                    step = span / 5.0
+                    lows, highs = [], []
+                    for bi in range(len(bins)):
+                        low = int(smin + bi*step)
+                        high = int(smin + (bi+1)*step) - 1
+                        if high < low: high = low
+                        lows.append(low)
+                        highs.append(min(high, smax))
+                    rows.append((name, tuple(lows), tuple(highs)))
+                per_grade.append(rows)
+            self._catalog[spot] = per_grade
+
+    def roll_cast(self, rnd, spot:str, rod:str, lv:int, chem_grade:int, additive_ready, additive_active, secs:int, early:bool):
+        """캐스팅 한 번 판정: (이름, 크기, 등급, 성공 여부). 표 조회만 하고 난수 소비 순서는 예전과 같다."""
+        rod_i = self._rod_index.get(rod, 0)
+        chem_i = self._chem_index.get(chem_grade, 0)
+        s = secs if secs < 60 else 60
+        small, med = self._grade_cuts[rod_i][1 if additive_ready else 0][chem_i][s]
+        r = rnd.random()*100.0
+        gi = 0 if r <= small else 1 if r <= med else 2
+        name, lows, highs = rnd.choice(self._catalog[spot][gi])
+        b = bisect_left(self._bin_cum, rnd.random())
+        if b == len(self._bin_cum): b = 0   # 누적합 오차 시 "XS"
+        size = rnd.randint(lows[b], highs[b])
+        final_p = self._success_p[rod_i][bisect_right(self.LEVEL_BRACKETS, lv)][chem_i][
+            1 if additive_active else 0][1 if early else 0][gi][b][s]
+        return name, size, self.GRADES[gi], rnd.random()*100.0 <= final_p
+
+    @_user_command()
     def resolve_fishing(self, uid:str, spot:str, chosen_sec:int, elapsed_sec:int, early_penalty:bool):
         u = self.store.load_user(uid)
-
-        # 등급 평균 확률에 맞춘 1차 등급 결정 (소형30, 중형1, 대형0.01)
-                # 등급 선택 확률(기본): 소형 98.99%, 중형 1.00%, 대형 0.01%
-        P_SMALL, P_MED, P_LARGE = 98.99, 1.0, 0.01
-        # '모든 장비+아이템' 콤보(강화 낚싯대, 집어제 준비, 케미 2등급 준비, 60s 이상) 시 중형 가중치 상승
-        rod = u.get("rod","대나무 낚싯대")
-        if (rod in ("강화 낚싯대","철제 낚싯대") and u.get("additive_ready") and u.get("chem_ready") and u.get("chem_grade") == 2 and secs >= 60):
-            P_MED = 5.5
-            P_SMALL = 100.0 - P_MED - P_LARGE
-        r = random.random()*100.0
-        if r <= P_SMALL:
-            grade = "소형"
-        elif r <= P_SMALL + P_MED:
-            grade = "중형"
-        else:
-            grade = "대형"
-
-
-        # 등급별 시간 보정 (초당: 최대보정/60, 상한 적용)
         secs = elapsed_sec if early_penalty else chosen_sec
-        time_bonus = 0.0
-        if g == "소형":
-            time_bonus = min(38.2252, secs * (38.2252/60.0))
-        elif g == "중형":
-            time_bonus = min(5.0, secs * (5.0/60.0))
-        elif g == "대형":
-            time_bonus = min(1.0, secs * (1.0/60.0))
-
-        pick = self.pick_species_and_size(spot, grade)
-        name, size, g = pick["name"], pick["size"], pick["grade"]
-        base = pick["base_prob"]
-
-        # 집어제/케미라이트
-        bonus = 0.0
-        if u.get("additive_uses",0) > 0:
-            bonus += 5.0
-            u["additive_uses"] = u.get("additive_uses",0)  # 차감은 결과 처리 후
+
+        # 등급 → 어종/사이즈 → 성공 판정 (보정치는 _compile_tables 의 표에서 조회)
+        rnd = rng.stream(uid, u.get("rng", 0))   # 유저별 스트림 (rng.py)
+        chem = u.get("chem_grade",0) if u.get("chem_ready") else 0
+        name, size, g, success = self.roll_cast(
+            rnd, spot, u.get("rod","대나무 낚싯대"), u["lv"], chem,
+            u.get("additive_ready"), u.get("additive_uses",0) > 0, secs, early_penalty)
+        u["rng"] = rnd.counter
         if u.get("chem_ready"):
-            cg = u.get("chem_grade",0)
-            if cg == 1 and g == "대형": bonus += 5.0
-            if cg == 2 and g == "중형": bonus += 3.0
-            if cg == 3 and g == "소형": bonus += 1.0
             u["chem_ready"] = False
             u["chem_grade"] = 0
 
-        # 낚시대 보정 (철/강=소·중만, 프로/레전드=대형 only + 소형 감소)
-        rod = u.get("rod","대나무 낚싯대")
-        if rod == "철제 낚싯대" and g in ("소형","중형"): bonus += 2.0
-        if rod == "강화 낚싯대" and g in ("소형","중형"): bonus += 5.0
-        if rod == "프로 낚싯대":
-            if g == "대형": bonus += 2.0
-            if g == "소형": bonus -= 5.0
-        if rod == "레전드 낚싯대":
-            if g == "대형": bonus += 5.0
-            if g == "소형": bonus -= 20.0
-
-        # 레벨 보정 (소형 공통 + 등급별)
-        bonus += self.level_bonus(u["lv"], g)
-
-        # 조기 릴 패널티
-        if early_penalty:
-            bonus -= 80.0
-
-        # 최종 성공률 (0~95로 클램프)
-        final_p = max(0.0, min(95.0, base + time_bonus + bonus))
-        roll = random.random()*100.0
-
-        if roll <= final_p:
-        # 집어제 지속 차감
-        if u.get("additive_uses",0) > 0:
-            u["additive_uses"] -= 1
+        if success:
+            # 집어제 지속 차감
+            if u.get("additive_uses",0) > 0:
+                u["additive_uses"] -= 1
             # 가방 슬롯 체크(물고기 1마리=1칸)
             used, _ = self.count_used_slots(u)
             if used >= 5:
@@ -673,14 +1355,14 @@ def calc_exp(self, grade:str, size_cm:int) -> int:
 
     
 
-def required_exp(self, lv:int) -> int:
-    """
-    레벨업 임계치: 레벨별 상승 (선형)
-    - 다음 레벨까지 필요한 Exp = 100 + 50*(lv-1)
-      (Lv1→2:100, Lv2→3:150, Lv3→4:200, ...)
-    """
-    if lv < 1: lv = 1
-    return 100 + 50*(lv-1)
+    def required_exp(self, lv:int) -> int:
+        """
+        레벨업 임계치: 레벨별 상승 (선형)
+        - 다음 레벨까지 필요한 Exp = 100 + 50*(lv-1)
+          (Lv1→2:100, Lv2→3:150, Lv3→4:200, ...)
+        """
+        if lv < 1: lv = 1
+        return 100 + 50*(lv-1)
 # ── 경험치/레벨업 ────────────────────────────────────
     def gain_exp(self, u:dict, exp:int):
         u["exp"] += exp
@@ -693,6 +1375,7 @@ def required_exp(self, lv:int) -> int:
         # 저장은 호출부에서
 
 
+    @_user_command()
     def cmd_newbie_chance(self, uid:str):
         u = self.store.load_user(uid)
         # 등급 확인
@@ -725,256 +1408,271 @@ def required_exp(self, lv:int) -> int:
         return f"✅ 초보자찬스! 1000골드(제한) 획득. 오늘 사용 {nb['count']}/3 | 제한골드 {u['gold_restricted']}"
 
 
-def cmd_home(self, uid:str):
-    u = self.store.load_user(uid)
-    header = "\n".join([
-        "🎣 낚시 RPG 사용법",
-        "1) /장소 [바다|민물]   ← 먼저 장소를 설정하세요",
-        "2) /낚시 [1~60]s      ← 해당 초 만큼 캐스팅 (예: /낚시 15s)",
-        "3) 시간이 끝나면 /릴감기 로 결과 확인",
-        ""
-    ])
-    shop = "\n".join([
-        "🏪 상점 이용 방법",
-        "/상점               → 상점 목록 보기",
-        "/구매 [번호]        → 해당 번호 아이템 구매",
-        "/판매 [번호]        → 해당 번호 물고기 판매",
-        "/전부판매           → 가방 속 물고기 전부 판매",
-        "",
-        "/출석               → 출석 보상 받기",
-        "/초보자찬스         → 낚린이 전용 보너스(1일 3회)",
-    ])
-    try:
-        tz = ZoneInfo("Asia/Seoul") if ZoneInfo else None
-    except Exception:
-        tz = None
-    if tz is not None:
-        today_str = datetime.now(tz).strftime("%Y-%m-%d")
-    else:
-        t = time.gmtime(time.time() + 9*3600)
-        today_str = f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d}"
-    nb = u.get("newbie_chance", {"date":"", "count":0})
-    used = nb["count"] if nb.get("date")==today_str else 0
-    title = self.title_by_level(u.get("lv",1))
-    if title == "낚린이":
-        shop += f"\n(오늘 사용: {used}회, 남은 횟수: {max(0,3-used)}회)\n"
-    else:
-        shop += "\n(초보자찬스는 낚린이 전용입니다)\n"
-    nick = f"닉네임: {u.get('nickname') or '-'}"
-    stat = self.cmd_status(uid)
-    bag = self.cmd_inventory(uid)
-    return "\n".join([header, shop, "", nick, stat, "", bag])
-
-
-def cmd_sell_item(self, uid:str, arg:str):
-    arg = arg.strip()
-    if not arg:
-        return "아이템 이름과 수량을 입력해 주세요. 예) /아이템판매 지렁이 3"
-    parts = arg.split()
-    if len(parts) == 1:
-        name, qty = parts[0], 1
-    else:
-        name = " ".join(parts[:-1])
-        qty_str = parts[-1]
-        if qty_str.isdigit():
-            qty = int(qty_str)
+    @_user_command(write=False)
+    def cmd_home(self, uid:str):
+        u = self.store.load_user(uid)
+        header = "\n".join([
+            "🎣 낚시 RPG 사용법",
+            "1) /장소 [바다|민물]   ← 먼저 장소를 설정하세요",
+            "2) /낚시 [1~60]s      ← 해당 초 만큼 캐스팅 (예: /낚시 15s)",
+            "3) 시간이 끝나면 /릴감기 로 결과 확인",
+            ""
+        ])
+        shop = "\n".join([
+            "🏪 상점 이용 방법",
+            "/상점               → 상점 목록 보기",
+            "/구매 [번호]        → 해당 번호 아이템 구매",
+            "/판매 [번호]        → 해당 번호 물고기 판매",
+            "/전부판매           → 가방 속 물고기 전부 판매",
+            "",
+            "/출석               → 출석 보상 받기",
+            "/초보자찬스         → 낚린이 전용 보너스(1일 3회)",
+        ])
+        try:
+            tz = ZoneInfo("Asia/Seoul") if ZoneInfo else None
+        except Exception:
+            tz = None
+        if tz is not None:
+            today_str = datetime.now(tz).strftime("%Y-%m-%d")
         else:
-            name = " ".join(parts)
-            qty = 1
+            t = time.gmtime(time.time() + 9*3600)
+            today_str = f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d}"
+        nb = u.get("newbie_chance", {"date":"", "count":0})
+        used = nb["count"] if nb.get("date")==today_str else 0
+        title = self.title_by_level(u.get("lv",1))
+        if title == "낚린이":
+            shop += f"\n(오늘 사용: {used}회, 남은 횟수: {max(0,3-used)}회)\n"
+        else:
+            shop += "\n(초보자찬스는 낚린이 전용입니다)\n"
+        nick = f"닉네임: {u.get('nickname') or '-'}"
+        stat = self.cmd_status(uid)
+        bag = self.cmd_inventory(uid)
+        return "\n".join([header, shop, "", nick, stat, "", bag])
+
+
+    @_user_command()
+    def cmd_sell_item(self, uid:str, arg:str):
+        arg = arg.strip()
+        if not arg:
+            return "아이템 이름과 수량을 입력해 주세요. 예) /아이템판매 지렁이 3"
+        parts = arg.split()
+        if len(parts) == 1:
+            name, qty = parts[0], 1
+        else:
+            name = " ".join(parts[:-1])
+            qty_str = parts[-1]
+            if qty_str.isdigit():
+                qty = int(qty_str)
+            else:
+                name = " ".join(parts)
+                qty = 1
 
-    if qty < 1:
-        return "수량은 1 이상이어야 합니다."
+        if qty < 1:
+            return "수량은 1 이상이어야 합니다."
 
-    u = self.store.load_user(uid)
-    if name in ("철제 낚싯대","강화 낚싯대","프로 낚싯대","레전드 낚싯대"):
-        if u["rod"] == name:
-            return "착용 중인 낚싯대는 판매할 수 없습니다."
-        if not u["rods_owned"].get(name):
-            return f"{name}은(는) 보유하고 있지 않습니다."
-        owned_others = [r for r,v in u["rods_owned"].items() if v and r != name]
-        if not owned_others:
-            return "최소 1개의 낚싯대는 보유해야 합니다. 판매가 불가능합니다."
-        price = self.unit_price_map.get(name, 0)
-        refund = int(price * 0.5)
-        u["rods_owned"][name] = False
+        u = self.store.load_user(uid)
+        if name in ("철제 낚싯대","강화 낚싯대","프로 낚싯대","레전드 낚싯대"):
+            if u["rod"] == name:
+                return "착용 중인 낚싯대는 판매할 수 없습니다."
+            if not u["rods_owned"].get(name):
+                return f"{name}은(는) 보유하고 있지 않습니다."
+            owned_others = [r for r,v in u["rods_owned"].items() if v and r != name]
+            if not owned_others:
+                return "최소 1개의 낚싯대는 보유해야 합니다. 판매가 불가능합니다."
+            price = self.unit_price_map.get(name, 0)
+            refund = int(price * 0.5)
+            u["rods_owned"][name] = False
+            u["gold"] = u.get("gold", 0) + refund
+            self.store.save_user(uid, u)
+            return f"{name}을(를) 판매했습니다. 환불 금액 {refund}골드. 현재 골드 {u['gold']}골드"
+
+        inv = u["inventory"]
+        if name not in inv:
+            return f"{name}은(는) 판매할 수 없는 품목입니다."
+        if inv[name] <= 0:
+            return f"{name}이(가) 가방에 없습니다."
+        if inv[name] < qty:
+            return f"{name} 보유 수량이 부족합니다. (보유: {inv[name]}개)"
+
+        unit = self.unit_price_map.get(name, 0)
+        if unit <= 0:
+            return f"{name}은(는) 환불이 불가능한 품목입니다."
+
+        inv[name] -= qty
+        refund = int(unit * 0.5) * qty
         u["gold"] = u.get("gold", 0) + refund
         self.store.save_user(uid, u)
-        return f"{name}을(를) 판매했습니다. 환불 금액 {refund}골드. 현재 골드 {u['gold']}골드"
-
-    inv = u["inventory"]
-    if name not in inv:
-        return f"{name}은(는) 판매할 수 없는 품목입니다."
-    if inv[name] <= 0:
-        return f"{name}이(가) 가방에 없습니다."
-    if inv[name] < qty:
-        return f"{name} 보유 수량이 부족합니다. (보유: {inv[name]}개)"
-
-    unit = self.unit_price_map.get(name, 0)
-    if unit <= 0:
-        return f"{name}은(는) 환불이 불가능한 품목입니다."
-
-    inv[name] -= qty
-    refund = int(unit * 0.5) * qty
-    u["gold"] = u.get("gold", 0) + refund
-    self.store.save_user(uid, u)
-    return f"{name} {qty}개를 판매했습니다. 환불 금액 {refund}골드. 현재 골드 {u['gold']}골드"
-
-
-def cmd_use_chum(self, uid:str):
-    u = self.store.load_user(uid)
-    inv = u["inventory"]
-    if inv.get("집어제",0) <= 0:
-        return "집어제가 없어요. 상점에서 구매해 주세요."
-    inv["집어제"] -= 1
-    u["additive_uses"] = 3
-    u["additive_ready"] = False
-    self.store.save_user(uid, u)
-    return f"✅ 집어제 1개를 사용했습니다. (남은 수량: {inv['집어제']}개)\n효과가 3회 낚시 동안 지속됩니다."
-
-
-def cmd_use_chem_named(self, uid:str, item_name:str):
-    u = self.store.load_user(uid)
-    hour = self.seoul_now().hour
-    allowed = (hour >= 20 or hour < 5)
-    if not allowed:
-        return "케미라이트는 20:00~05:00 사이에만 사용할 수 있어요. (서울 기준)"
-    inv = u["inventory"]
-    if inv.get(item_name,0) <= 0:
-        return f"{item_name}이(가) 없어요. 상점에서 구매해 주세요."
-    inv[item_name] -= 1
-    grade = 1 if "1등급" in item_name else (2 if "2등급" in item_name else 3)
-    u["chem_ready"] = True
-    u["chem_grade"] = grade
-    self.store.save_user(uid, u)
-    return f"✅ {item_name} 1개를 사용했습니다. (남은 수량: {inv[item_name]}개)"
-
-
-def cmd_sell_item_prepare(self, uid:str, arg:str):
-    arg = (arg or "").strip()
-    if not arg:
-        return "아이템 이름과 수량을 입력해 주세요. 예) /아이템판매 지렁이 3"
-
-    parts = arg.split()
-    if len(parts) == 1:
-        name, qty = parts[0], 1
-    else:
-        name = " ".join(parts[:-1])
-        qty_str = parts[-1]
-        qty = int(qty_str[:-1]) if qty_str.endswith("개") and qty_str[:-1].isdigit() else (int(qty_str) if qty_str.isdigit() else 1)
-
-    if qty < 1:
-        return "수량은 1 이상이어야 합니다."
-
-    u = self.store.load_user(uid)
-
-    # Rod handling
-    if name in ("철제 낚싯대","강화 낚싯대","프로 낚싯대","레전드 낚싯대"):
-        if u["rod"] == name:
-            return "착용 중인 낚싯대는 판매할 수 없습니다."
-        if not u["rods_owned"].get(name):
-            return f"{name}은(는) 보유하고 있지 않습니다."
-        owned_others = [r for r,v in u["rods_owned"].items() if v and r != name]
-        if not owned_others:
-            return "최소 1개의 낚싯대는 보유해야 합니다. 판매가 불가능합니다."
-        price = self.unit_price_map.get(name, 0)
-        refund = int(price * 0.5)
-        u["pending_sale"] = {"type":"rod","name":name,"qty":1,"refund":refund}
+        return f"{name} {qty}개를 판매했습니다. 환불 금액 {refund}골드. 현재 골드 {u['gold']}골드"
+
+
+    @_user_command()
+    def cmd_use_chum(self, uid:str):
+        u = self.store.load_user(uid)
+        inv = u["inventory"]
+        if inv.get("집어제",0) <= 0:
+            return "집어제가 없어요. 상점에서 구매해 주세요."
+        inv["집어제"] -= 1
+        u["additive_uses"] = 3
+        u["additive_ready"] = False
+        self.store.save_user(uid, u)
+        return f"✅ 집어제 1개를 사용했습니다. (남은 수량: {inv['집어제']}개)\n효과가 3회 낚시 동안 지속됩니다."
+
+
+    @_user_command()
+    def cmd_use_chem_named(self, uid:str, item_name:str):
+        u = self.store.load_user(uid)
+        hour = self.seoul_now().hour
+        allowed = (hour >= 20 or hour < 5)
+        if not allowed:
+            return "케미라이트는 20:00~05:00 사이에만 사용할 수 있어요. (서울 기준)"
+        inv = u["inventory"]
+        if inv.get(item_name,0) <= 0:
+            return f"{item_name}이(가) 없어요. 상점에서 구매해 주세요."
+        inv[item_name] -= 1
+        grade = 1 if "1등급" in item_name else (2 if "2등급" in item_name else 3)
+        u["chem_ready"] = True
+        u["chem_grade"] = grade
+        self.store.save_user(uid, u)
+        return f"✅ {item_name} 1개를 사용했습니다. (남은 수량: {inv[item_name]}개)"
+
+
+    @_user_command()
+    def cmd_sell_item_prepare(self, uid:str, arg:str):
+        arg = (arg or "").strip()
+        if not arg:
+            return "아이템 이름과 수량을 입력해 주세요. 예) /아이템판매 지렁이 3"
+
+        parts = arg.split()
+        if len(parts) == 1:
+            name, qty = parts[0], 1
+        else:
+            name = " ".join(parts[:-1])
+            qty_str = parts[-1]
+            qty = int(qty_str[:-1]) if qty_str.endswith("개") and qty_str[:-1].isdigit() else (int(qty_str) if qty_str.isdigit() else 1)
+
+        if qty < 1:
+            return "수량은 1 이상이어야 합니다."
+
+        u = self.store.load_user(uid)
+
+        # Rod handling
+        if name in ("철제 낚싯대","강화 낚싯대","프로 낚싯대","레전드 낚싯대"):
+            if u["rod"] == name:
+                return "착용 중인 낚싯대는 판매할 수 없습니다."
+            if not u["rods_owned"].get(name):
+                return f"{name}은(는) 보유하고 있지 않습니다."
+            owned_others = [r for r,v in u["rods_owned"].items() if v and r != name]
+            if not owned_others:
+                return "최소 1개의 낚싯대는 보유해야 합니다. 판매가 불가능합니다."
+            price = self.unit_price_map.get(name, 0)
+            refund = int(price * 0.5)
+            u["pending_sale"] = {"type":"rod","name":name,"qty":1,"refund":refund}
+            self.store.save_user(uid, u)
+            return (f"⚠️ 되팔기 안내\n"
+                    f"상점에서 산 물건을 되팔면 구매가격의 50%만 환불됩니다.\n\n"
+                    f"판매 대상: {name} ×1\n"
+                    f"환불 예정: 💰{refund}\n\n"
+                    f"진행하시겠습니까?\n/판매확인  |  /판매취소")
+
+        # Consumables
+        inv = u["inventory"]
+        if name not in inv:
+            return f"{name}은(는) 판매할 수 없는 품목입니다."
+        if inv[name] <= 0:
+            return f"{name}이(가) 가방에 없습니다."
+        if inv[name] < qty:
+            return f"{name} 보유 수량이 부족합니다. (보유: {inv[name]}개)"
+
+        unit = self.unit_price_map.get(name, 0)
+        if unit <= 0:
+            return f"{name}은(는) 환불이 불가능한 품목입니다."
+
+        refund = int(unit * 0.5) * qty
+        u["pending_sale"] = {"type":"consumable","name":name,"qty":qty,"refund":refund}
         self.store.save_user(uid, u)
         return (f"⚠️ 되팔기 안내\n"
                 f"상점에서 산 물건을 되팔면 구매가격의 50%만 환불됩니다.\n\n"
-                f"판매 대상: {name} ×1\n"
+                f"판매 대상: {name} ×{qty}\n"
                 f"환불 예정: 💰{refund}\n\n"
                 f"진행하시겠습니까?\n/판매확인  |  /판매취소")
 
-    # Consumables
-    inv = u["inventory"]
-    if name not in inv:
-        return f"{name}은(는) 판매할 수 없는 품목입니다."
-    if inv[name] <= 0:
-        return f"{name}이(가) 가방에 없습니다."
-    if inv[name] < qty:
-        return f"{name} 보유 수량이 부족합니다. (보유: {inv[name]}개)"
-
-    unit = self.unit_price_map.get(name, 0)
-    if unit <= 0:
-        return f"{name}은(는) 환불이 불가능한 품목입니다."
-
-    refund = int(unit * 0.5) * qty
-    u["pending_sale"] = {"type":"consumable","name":name,"qty":qty,"refund":refund}
-    self.store.save_user(uid, u)
-    return (f"⚠️ 되팔기 안내\n"
-            f"상점에서 산 물건을 되팔면 구매가격의 50%만 환불됩니다.\n\n"
-            f"판매 대상: {name} ×{qty}\n"
-            f"환불 예정: 💰{refund}\n\n"
-            f"진행하시겠습니까?\n/판매확인  |  /판매취소")
-
-
-def cmd_sell_item_confirm(self, uid:str):
-    u = self.store.load_user(uid)
-    p = u.get("pending_sale") or {}
-    if not p:
-        return "대기 중인 판매가 없습니다. 예) /아이템판매 집어제 1"
-    name = p.get("name")
-    qty = p.get("qty", 1)
-    refund = int(p.get("refund", 0))
-    typ = p.get("type")
-
-    if typ == "rod":
-        if u["rod"] == name:
-            return "착용 중인 낚싯대는 판매할 수 없습니다."
-        if not u["rods_owned"].get(name):
+
+    @_user_command()
+    def cmd_sell_item_confirm(self, uid:str):
+        u = self.store.load_user(uid)
+        p = u.get("pending_sale") or {}
+        if not p:
+            return "대기 중인 판매가 없습니다. 예) /아이템판매 집어제 1"
+        name = p.get("name")
+        qty = p.get("qty", 1)
+        refund = int(p.get("refund", 0))
+        typ = p.get("type")
+
+        if typ == "rod":
+            if u["rod"] == name:
+                return "착용 중인 낚싯대는 판매할 수 없습니다."
+            if not u["rods_owned"].get(name):
+                u["pending_sale"] = {}
+                self.store.save_user(uid, u)
+                return f"{name}은(는) 더 이상 보유하고 있지 않습니다."
+            owned_others = [r for r,v in u["rods_owned"].items() if v and r != name]
+            if not owned_others:
+                return "최소 1개의 낚싯대는 보유해야 합니다. 판매가 불가능합니다."
+            u["rods_owned"][name] = False
+            u["gold"] = u.get("gold", 0) + refund
             u["pending_sale"] = {}
             self.store.save_user(uid, u)
-            return f"{name}은(는) 더 이상 보유하고 있지 않습니다."
-        owned_others = [r for r,v in u["rods_owned"].items() if v and r != name]
-        if not owned_others:
-            return "최소 1개의 낚싯대는 보유해야 합니다. 판매가 불가능합니다."
-        u["rods_owned"][name] = False
-        u["gold"] = u.get("gold", 0) + refund
-        u["pending_sale"] = {}
-        self.store.save_user(uid, u)
-        return f"{name}을(를) 판매했습니다. 환불 금액 💰{refund}. 현재 골드 💰{u['gold']}"
+            return f"{name}을(를) 판매했습니다. 환불 금액 💰{refund}. 현재 골드 💰{u['gold']}"
 
-    inv = u["inventory"]
-    if inv.get(name,0) < qty:
-        u["pending_sale"] = {}
-        self.store.save_user(uid, u)
-        return f"{name} 수량이 변경되어 판매할 수 없습니다. (보유: {inv.get(name,0)}개)"
-    inv[name] -= qty
-    u["gold"] = u.get("gold", 0) + refund
-    u["pending_sale"] = {}
-    self.store.save_user(uid, u)
-    return f"{name} {qty}개를 판매했습니다. 환불 금액 💰{refund}. 현재 골드 💰{u['gold']}"
-
-def cmd_sell_item_cancel(self, uid:str):
-    u = self.store.load_user(uid)
-    if u.get("pending_sale"):
+        inv = u["inventory"]
+        if inv.get(name,0) < qty:
+            u["pending_sale"] = {}
+            self.store.save_user(uid, u)
+            return f"{name} 수량이 변경되어 판매할 수 없습니다. (보유: {inv.get(name,0)}개)"
+        inv[name] -= qty
+        u["gold"] = u.get("gold", 0) + refund
         u["pending_sale"] = {}
         self.store.save_user(uid, u)
-        return "되팔기를 취소했습니다."
-    return "취소할 대기 중인 판매가 없습니다."
+        return f"{name} {qty}개를 판매했습니다. 환불 금액 💰{refund}. 현재 골드 💰{u['gold']}"
 
-
-def cmd_enable_access(self, uid:str):
-    meta = self.store.get_meta()
-    if not meta.get("access_enabled"):
-        meta["access_enabled"] = True
-        meta["owner"] = uid
-        self.store.set_meta(meta)
-        return "채널 기능이 활성화되었습니다. (설정자: 본인)"
-    if meta.get("owner") in (None, uid):
-        meta["access_enabled"] = True
-        meta["owner"] = uid if meta.get("owner") is None else meta.get("owner")
+    @_user_command()
+    def cmd_sell_item_cancel(self, uid:str):
+        u = self.store.load_user(uid)
+        if u.get("pending_sale"):
+            u["pending_sale"] = {}
+            self.store.save_user(uid, u)
+            return "되팔기를 취소했습니다."
+        return "취소할 대기 중인 판매가 없습니다."
+
+
+    def cmd_enable_access(self, uid:str):
+        with self.store.locked(Store.META_KEY):
+            return self._enable_access(uid)
+
+    def _enable_access(self, uid:str):
+        meta = self.store.get_meta()
+        if not meta.get("access_enabled"):
+            meta["access_enabled"] = True
+            meta["owner"] = uid
+            self.store.set_meta(meta)
+            return "채널 기능이 활성화되었습니다. (설정자: 본인)"
+        if meta.get("owner") in (None, uid):
+            meta["access_enabled"] = True
+            meta["owner"] = uid if meta.get("owner") is None else meta.get("owner")
+            self.store.set_meta(meta)
+            return "이미 활성화되어 있습니다."
+        return "이미 다른 사용자가 활성화했습니다. 변경은 채널 주인만 가능합니다."
+
+    def cmd_disable_access(self, uid:str):
+        with self.store.locked(Store.META_KEY):
+            return self._disable_access(uid)
+
+    def _disable_access(self, uid:str):
+        meta = self.store.get_meta()
+        owner = meta.get("owner")
+        if owner not in (None, uid):
+            return "채널 주인만 해제할 수 있습니다."
+        meta["access_enabled"] = False
+        meta["owner"] = owner if owner else uid
         self.store.set_meta(meta)
-        return "이미 활성화되어 있습니다."
-    return "이미 다른 사용자가 활성화했습니다. 변경은 채널 주인만 가능합니다."
-
-def cmd_disable_access(self, uid:str):
-    meta = self.store.get_meta()
-    owner = meta.get("owner")
-    if owner not in (None, uid):
-        return "채널 주인만 해제할 수 있습니다."
-    meta["access_enabled"] = False
-    meta["owner"] = owner if owner else uid
-    self.store.set_meta(meta)
-    return "채널 기능을 해제했습니다."
+        return "채널 기능을 해제했습니다."
@@ -0,0 +1,155 @@
+# history.py
+"""조과(잡은 물고기) 원본 기록용 append-only 컬럼 로그.
+
+유저 데이터에는 집계(종류별 최대, 크기별 마릿수, 합계)만 남기고,
+한 마리씩의 원본 기록은 여기로 보낸다. FISHING_HISTORY_DIR 가 없으면 꺼진다.
+
+디렉터리 구조
+    <dir>/seg-<pid>-<시작시각>/   프로세스마다 자기 세그먼트에만 쓴다(워커 간 잠금 불필요)
+        ts.col      uint32  epoch 초
+        length.col  uint16  cm
+        uid.col     uint32  uid.dict 줄 번호
+        name.col    uint16  name.dict 줄 번호
+        size.col    uint8   SIZES 인덱스
+        place.col   uint8   PLACES 인덱스
+        uid.dict / name.dict  문자열 사전(한 줄에 하나, append-only)
+
+기록은 메모리에 모았다가 batch 개가 차거나 flush()/종료 시 한꺼번에 쓴다.
+사전 → 컬럼 순서로 쓰므로, 도중에 죽어도 읽을 때 가장 짧은 컬럼 길이까지만 유효하다.
+"""
+import atexit
+import os
+import threading
+import time
+from array import array
+
+SIZES = ("소형", "중형", "대형")
+PLACES = ("바다", "민물")
+
+# 컬럼 이름 → array typecode
+COLUMNS = (("ts", "I"), ("length", "H"), ("uid", "I"), ("name", "H"), ("size", "B"), ("place", "B"))
+
+
+class _Dict:
+    """문자열 ↔ 번호 사전. 새 항목은 flush 때 파일 끝에 추가."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index = {}
+        self.new = []
+
+    def code(self, s: str) -> int:
+        c = self.index.get(s)
+        if c is None:
+            c = self.index[s] = len(self.index)
+            self.new.append(s)
+        return c
+
+    def write(self):
+        if self.new:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(s + "\n" for s in self.new))
+            self.new = []
+
+
+def _read_dict(path: str):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return f.read().split("\n")[:-1]
+
+
+class CatchLog:
+    def __init__(self, root: str, batch: int = 256):
+        self.root = root
+        self.batch = batch
+        self._lock = threading.Lock()
+        self._seg = None
+        self._pid = None
+        self._buf = {name: array(code) for name, code in COLUMNS}
+        atexit.register(self.flush)
+
+    def _segment(self):
+        # fork(gunicorn preload) 뒤에는 새 세그먼트를 연다
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._seg = os.path.join(self.root, f"seg-{self._pid}-{time.time_ns()}")
+            os.makedirs(self._seg, exist_ok=True)
+            self._uids = _Dict(os.path.join(self._seg, "uid.dict"))
+            self._names = _Dict(os.path.join(self._seg, "name.dict"))
+            self._buf = {name: array(code) for name, code in COLUMNS}
+        return self._seg
+
+    def append(self, uid: str, fish: dict, ts: float = None):
+        with self._lock:
+            self._segment()
+            b = self._buf
+            b["ts"].append(int(ts if ts is not None else time.time()))
+            b["length"].append(fish["length"])
+            b["uid"].append(self._uids.code(uid))
+            b["name"].append(self._names.code(fish["name"]))
+            b["size"].append(SIZES.index(fish["size"]))
+            b["place"].append(PLACES.index(fish["place"]))
+            if len(b["ts"]) >= self.batch:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self._seg is None or self._pid != os.getpid() or not self._buf["ts"]:
+            return
+        self._uids.write()
+        self._names.write()
+        for name, code in COLUMNS:
+            with open(os.path.join(self._seg, name + ".col"), "ab") as f:
+                self._buf[name].tofile(f)
+            self._buf[name] = array(code)
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+
+def _load_column(seg: str, name: str, code: str):
+    a = array(code)
+    path = os.path.join(seg, name + ".col")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            data = f.read()
+        a.frombytes(data[:len(data) - len(data) % a.itemsize])
+    return a
+
+
+def scan(root: str, uid: str = None):
+    """모든 세그먼트의 기록을 dict 로 돌려준다. uid 를 주면 해당 유저만.
+    세그먼트 안에서는 기록 순서, 세그먼트 간에는 순서를 보장하지 않는다."""
+    if not os.path.isdir(root):
+        return
+    for entry in sorted(os.listdir(root)):
+        seg = os.path.join(root, entry)
+        if not entry.startswith("seg-") or not os.path.isdir(seg):
+            continue
+        uids = _read_dict(os.path.join(seg, "uid.dict"))
+        names = _read_dict(os.path.join(seg, "name.dict"))
+        cols = {name: _load_column(seg, name, code) for name, code in COLUMNS}
+        n = min(len(c) for c in cols.values())
+        want = None
+        if uid is not None:
+            if uid not in uids:
+                continue
+            want = uids.index(uid)
+        for i in range(n):
+            if want is not None and cols["uid"][i] != want:
+                continue
+            yield {
+                "uid": uids[cols["uid"][i]],
+                "name": names[cols["name"][i]],
+                "length": cols["length"][i],
+                "size": SIZES[cols["size"][i]],
+                "place": PLACES[cols["place"][i]],
+                "ts": cols["ts"][i],
+            }
+
+
+def open_log(root: str = None):
+    """FISHING_HISTORY_DIR 가 설정된 경우에만 CatchLog 를 연다."""
+    root = root or os.environ.get("FISHING_HISTORY_DIR")
+    return CatchLog(root) if root else None
@@ -0,0 +1,261 @@
+# journal.py
+"""플레이어 변경 저널 (그룹 커밋 + 재시작 복구).
+
+선기록(write-ahead) 로그가 아니라 커밋 후 재실행(redo) 로그다. UserStore 는 백엔드 저장이
+성공한 뒤에 (버전 충돌로 버려질 시도는 남기지 않도록) 유저 잠금 안에서 변경 레코드를 덧붙이고,
+잠금을 놓은 뒤 응답하기 전에 디스크에 내려갈(fsync) 때까지 기다린다. 그래서 저장은 됐지만
+레코드가 내려가기 전에 죽으면 그 변경은 응답을 못 받은 요청과 같이 취급된다 (memory 백엔드는 사라지고,
+SQLite 는 백엔드에 남아 있을 수 있다). 동시에 커밋하는 스레드들의 레코드는 한 번의 write + fsync 로
+묶인다 — 먼저 잠금을 잡은 스레드가 그때까지 쌓인 것을 모두 쓰고, 나머지는 그 결과를 기다리기만 한다.
+
+레코드 한 줄: [ns, uid, base, ops]
+    ns    저장 직전 시각(time_ns). 여러 프로세스의 세그먼트를 합칠 때의 순서
+    base  이 변경을 적용하기 전의 유저 버전
+    ops   변경 목록, null 이면 유저 삭제
+        ["+", path, n]      정수 증감 (골드, 경험치, 레벨, 인벤토리 수량)
+        ["push", path, xs]  리스트 끝에 추가 (가방/어망에 물고기)
+        ["pop", path, n]    리스트 끝에서 n개 제거
+        ["set", path, v]    그 밖의 값 (path 가 [] 이면 유저 전체)
+        ["del", path]       키 삭제
+    path 는 키 목록
+
+복구(UserStore.recover)는 base 가 현재 버전과 같은 레코드만 적용하므로 여러 번 돌려도
+결과가 같고, 백엔드(또는 먼저 실은 스냅샷)에 이미 반영된 레코드는 건너뛴다.
+다 반영된 세그먼트는 snapshot.py 가 스냅샷을 쓴 뒤 지운다.
+
+디렉터리 구조
+    <dir>/wal-<시작 ns>-<pid>.log   프로세스마다 따로, rotate_bytes 를 넘으면 새 파일
+"""
+import heapq
+import os
+import threading
+import time
+
+import fastjson
+import metrics
+
+metrics.counter("fishing_journal_records_total", "저널에 기록한 변경 레코드 수")
+metrics.counter("fishing_journal_bytes_total", "저널에 기록한 바이트 수")
+metrics.histogram("fishing_journal_commit_seconds", "그룹 커밋 한 번(write + fsync) 시간")
+
+_fsync = getattr(os, "fdatasync", os.fsync)
+
+
+# ---------------- 변경 레코드 ----------------
+
+_PLAIN = {dict, list, str, int, float, bool, type(None)}
+
+
+def diff(old, new, default=None) -> list:
+    """old → new 로 가는 변경 목록. old 가 None(새 유저)이면 전체 설정 한 개.
+    old 는 순수 JSON 값, new 는 트랜잭션이 바꾼 유저 dict 그대로다. new 안의 앱 객체는
+    old 와 다를 때만 default 로 JSON 값으로 바꿔 비교한다 (레코드에 남는 값도 append 의 default 로 직렬화)."""
+    if old is None:
+        return [["set", [], new]]
+    ops = []
+    _diff(old, new, [], ops, default)
+    return ops
+
+
+def _diff(old, new, path, ops, default):
+    if default is not None and type(new) not in _PLAIN:
+        new = default(new)
+    if type(old) is dict and type(new) is dict:
+        for k, v in new.items():
+            if k not in old:
+                ops.append(["set", path + [k], v])
+            elif old[k] != v:
+                _diff(old[k], v, path + [k], ops, default)
+        for k in old:
+            if k not in new:
+                ops.append(["del", path + [k]])
+    elif type(old) is list and type(new) is list:
+        if default is not None:
+            new = [x if type(x) in _PLAIN else default(x) for x in new]
+        n, m = len(old), len(new)
+        if m == n and new == old:
+            return
+        if m > n and new[:n] == old:
+            ops.append(["push", path, new[n:]])
+        elif m < n and old[:m] == new:
+            ops.append(["pop", path, n - m])
+        else:
+            ops.append(["set", path, new])
+    elif type(old) is int and type(new) is int:
+        if new != old:
+            ops.append(["+", path, new - old])
+    elif old != new or type(old) is not type(new):
+        ops.append(["set", path, new])
+
+
+def apply(user, ops):
+    """변경 목록을 적용한 유저를 돌려준다 (user 는 제자리에서 바뀐다)."""
+    for op in ops:
+        kind, path = op[0], op[1]
+        if not path:
+            user = op[2]
+            continue
+        parent = user
+        for k in path[:-1]:
+            parent = parent[k]
+        k = path[-1]
+        if kind == "+":
+            parent[k] += op[2]
+        elif kind == "push":
+            parent[k].extend(op[2])
+        elif kind == "pop":
+            del parent[k][len(parent[k]) - op[2]:]
+        elif kind == "set":
+            parent[k] = op[2]
+        elif kind == "del":
+            parent.pop(k, None)
+    return user
+
+
+# ---------------- 기록 ----------------
+
+class Journal:
+    def __init__(self, root: str, rotate_bytes: int = 64 << 20, fsync: bool = True):
+        self.root = root
+        self.rotate_bytes = rotate_bytes
+        self.fsync = fsync
+        self._buf = []        # 아직 쓰지 않은 줄
+        self._seq = 0         # 마지막으로 받은 레코드 번호
+        self._durable = 0     # 디스크에 내려간 마지막 번호
+        self._lock = threading.Lock()         # _buf / _seq
+        self._flush_lock = threading.Lock()   # write + fsync 는 한 번에 한 스레드
+        self._fd = None
+        self._pid = None
+        self._path = None
+        self._written = 0
+        self.records = 0
+        self.commits = 0
+
+    def append(self, uid: str, base: int, ops, ns: int = None, default=None) -> int:
+        """레코드를 버퍼에 넣고 번호를 돌려준다 (wait 에 넘긴다). default 는 ops 안의 앱 객체 직렬화용."""
+        line = fastjson.dumps([time.time_ns() if ns is None else ns, uid, base, ops], default=default) + b"\n"
+        with self._lock:
+            self._buf.append(line)
+            self._seq += 1
+            return self._seq
+
+    def wait(self, seq: int):
+        """seq 번 레코드까지 디스크에 내려갈 때까지 기다린다."""
+        if self._durable >= seq:
+            return
+        with self._flush_lock:
+            if self._durable >= seq:
+                return   # 앞선 스레드가 같이 써 줬다
+            with self._lock:
+                lines, self._buf = self._buf, []
+                upto = self._seq
+            try:
+                self._write(b"".join(lines))
+            except OSError:
+                with self._lock:
+                    self._buf[:0] = lines   # 다음 커밋이 다시 시도
+                self._path = None
+                raise
+            self._durable = upto
+            self.records += len(lines)
+            metrics.inc("fishing_journal_records_total", (), len(lines))
+
+    def commit(self, uid: str, base: int, ops, ns: int = None):
+        """레코드를 남기고 디스크에 내려갈 때까지 기다린다."""
+        self.wait(self.append(uid, base, ops, ns))
+
+    def _write(self, data: bytes):
+        t = time.perf_counter()
+        fd = self._segment()
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        if self.fsync:
+            _fsync(fd)
+        self._written += len(data)
+        self.commits += 1
+        metrics.inc("fishing_journal_bytes_total", (), len(data))
+        metrics.observe("fishing_journal_commit_seconds", time.perf_counter() - t)
+
+    def _segment(self) -> int:
+        # fork(gunicorn preload) 뒤에는 자기 세그먼트를 새로 연다
+        if self._path is None or self._pid != os.getpid() or self._written >= self.rotate_bytes:
+            if self._fd is not None and self._pid == os.getpid():
+                os.close(self._fd)
+            os.makedirs(self.root, exist_ok=True)
+            self._pid = os.getpid()
+            self._path = os.path.join(self.root, f"wal-{time.time_ns()}-{self._pid}.log")
+            self._fd = os.open(self._path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            self._written = 0
+            if self.fsync:
+                _fsync_dir(self.root)
+        return self._fd
+
+    def rotate(self):
+        """다음 커밋부터 새 세그먼트에 쓴다 (스냅샷이 지난 세그먼트를 지울 수 있도록)."""
+        self.close()
+
+    def close(self):
+        with self._flush_lock:
+            if self._fd is not None and self._pid == os.getpid():
+                os.close(self._fd)
+            self._fd = self._path = None
+
+
+def _fsync_dir(path: str):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+# ---------------- 읽기 ----------------
+
+def segments(root: str):
+    if not os.path.isdir(root):
+        return []
+    return [os.path.join(root, n) for n in sorted(os.listdir(root))
+            if n.startswith("wal-") and n.endswith(".log")]
+
+
+def _read_segment(path: str):
+    """[ns, uid, base, ops] 순서대로. 쓰다 만 마지막 줄과 깨진 줄은 버린다."""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return
+    end = raw.rfind(b"\n")
+    for line in raw[:end + 1].split(b"\n"):
+        if not line:
+            continue
+        try:
+            rec = fastjson.loads(line)
+        except ValueError:
+            continue
+        if type(rec) is list and len(rec) == 4:
+            yield rec
+
+
+def read(root: str):
+    """모든 세그먼트를 시각 순으로 합쳐 [ns, uid, base, ops] 를 돌려준다.
+    한 세그먼트 안에서도 레코드는 fsync 묶음에 들어간 순서(유저마다는 순서대로, 유저 사이는 뒤섞임)라서
+    세그먼트마다 ns 로 먼저 정렬한 뒤 합친다."""
+    by_ns = lambda r: r[0]
+    return heapq.merge(*(sorted(_read_segment(p), key=by_ns) for p in segments(root)), key=by_ns)
+
+
+def open_journal(root: str = None):
+    """FISHING_JOURNAL_DIR 가 설정된 경우에만 Journal 을 연다."""
+    root = root or os.environ.get("FISHING_JOURNAL_DIR")
+    if not root:
+        return None
+    rotate_mb = int(os.environ.get("FISHING_JOURNAL_ROTATE_MB", "64"))
+    return Journal(root, rotate_bytes=rotate_mb << 20,
+                   fsync=os.environ.get("FISHING_JOURNAL_FSYNC", "1") != "0")
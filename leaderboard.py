@@ -0,0 +1,180 @@
+# leaderboard.py
+"""서버 전체 랭킹.
+
+보드마다 uid → 점수 dict 와 정렬 리스트를 함께 들고 있어서
+갱신은 bisect 로 O(log n) 탐색(+ 리스트 이동), 상위 K명 조회는 O(K) 이다.
+골드처럼 점수가 내려가는 보드도 있어서 상위 K명만 남기지 않고 전원을 정렬해 둔다.
+
+앱은 유저 트랜잭션이 커밋될 때마다 observe(uid, user) 를 부르고,
+바뀐 보드 항목만 다시 꽂는다. 전체 구성(rebuild)은 캐시나 유저 잠금을 거치지 않고
+백엔드 행(JSON)을 바로 훑는다. 기동 시 한 번 하고, 워커가 여러 개면 다른 워커의 변경은
+refresh_interval 마다 백그라운드 rebuild 로 따라잡는다.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from itertools import count
+
+import fastjson
+
+LEVEL = "level"
+GOLD = "gold"
+SPECIES_PREFIX = "species:"
+
+
+class Board:
+    """점수(숫자 튜플)가 큰 순. 동점이면 먼저 달성한 사람이 위."""
+
+    def __init__(self):
+        self._keys = {}     # uid -> 정렬 키
+        self._detail = {}   # uid -> (score, detail)
+        self._sorted = []   # [(-s1, -s2, ..., seq, uid)]
+        self._seq = count()
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def update(self, uid: str, score: tuple, detail=None):
+        old = self._detail.get(uid)
+        if old is not None and old[0] == score:
+            self._detail[uid] = (score, detail)
+            return
+        self.remove(uid)
+        key = tuple(-s for s in score) + (next(self._seq), uid)
+        self._keys[uid] = key
+        self._detail[uid] = (score, detail)
+        insort(self._sorted, key)
+
+    def remove(self, uid: str):
+        key = self._keys.pop(uid, None)
+        if key is not None:
+            del self._sorted[bisect_left(self._sorted, key)]
+            del self._detail[uid]
+
+    def top(self, k: int):
+        """[(uid, score, detail)] 상위 k명."""
+        return [(key[-1],) + self._detail[key[-1]] for key in self._sorted[:k]]
+
+    def rank(self, uid: str):
+        key = self._keys.get(uid)
+        return None if key is None else bisect_left(self._sorted, key) + 1
+
+
+class Leaderboards:
+    def __init__(self, refresh_interval: float = 60.0):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._boards = {}
+        self._seen = {}      # uid -> 이 유저가 올라가 있는 보드 이름들
+        self._nick = {}      # uid -> nickname
+        self._pending = None  # rebuild 중에 들어온 (uid, user|None) — 교체 직전에 다시 적용
+        self._built_at = 0.0
+        self._rebuilding = False
+
+    @staticmethod
+    def entries(user: dict):
+        """유저 한 명이 올라갈 (보드, 점수, 부가정보) 목록. O(어종 수)."""
+        out = [(LEVEL, (user.get("level", 1), user.get("exp", 0)), None),
+               (GOLD, (user.get("gold", 0),), None)]
+        stats = user.get("stats") or {}
+        for name, fish in stats.get("best", {}).items():
+            out.append((SPECIES_PREFIX + name, (fish["length"],), fish))
+        return out
+
+    def _observe(self, boards, seen, nick, uid, user):
+        if not user or not user.get("nickname"):
+            self._forget(boards, seen, nick, uid)
+            return
+        nick[uid] = user["nickname"]
+        names = set()
+        for name, score, detail in self.entries(user):
+            board = boards.get(name)
+            if board is None:
+                board = boards[name] = Board()
+            board.update(uid, score, detail)
+            names.add(name)
+        for name in seen.get(uid, ()):
+            if name not in names:
+                boards[name].remove(uid)
+        seen[uid] = names
+
+    @staticmethod
+    def _forget(boards, seen, nick, uid):
+        for name in seen.pop(uid, ()):
+            boards[name].remove(uid)
+        nick.pop(uid, None)
+
+    def observe(self, uid: str, user: dict):
+        with self._lock:
+            self._observe(self._boards, self._seen, self._nick, uid, user)
+            if self._pending is not None:
+                self._pending.append((uid, user))
+
+    def forget(self, uid: str):
+        with self._lock:
+            self._forget(self._boards, self._seen, self._nick, uid)
+            if self._pending is not None:
+                self._pending.append((uid, None))
+
+    def rebuild(self, rows):
+        """백엔드 행 (uid, version, nickname, text) 을 훑어 새 보드를 만든 뒤 한 번에 교체.
+        훑는 동안의 observe/forget 은 모아 두었다가 교체 직전에 새 보드에도 적용한다."""
+        with self._lock:
+            self._pending = []
+        boards, seen, nick = {}, {}, {}
+        try:
+            for uid, _version, _nickname, text in rows:
+                if not text:
+                    continue   # 삭제 표시
+                try:
+                    user = fastjson.loads(text)
+                except ValueError:
+                    continue
+                self._observe(boards, seen, nick, uid, user)
+        except BaseException:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            for uid, user in self._pending:
+                self._observe(boards, seen, nick, uid, user)
+            self._boards, self._seen, self._nick = boards, seen, nick
+            self._pending = None
+            self._built_at = time.time()
+
+    def maybe_refresh(self, rows):
+        """마지막 rebuild 가 refresh_interval 보다 오래됐으면 백그라운드에서 다시 만든다
+        (다른 워커 변경 반영). rows 는 행 이터러블을 돌려주는 함수 — 예: store.backend.rows"""
+        if not self.refresh_interval or time.time() - self._built_at < self.refresh_interval:
+            return
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def run():
+            try:
+                self.rebuild(rows())
+            except Exception:
+                self._built_at = time.time()   # 실패해도 다음 주기까지는 기존 보드로
+            finally:
+                self._rebuilding = False
+        threading.Thread(target=run, name="leaderboard-rebuild", daemon=True).start()
+
+    def top(self, board: str, k: int = 10):
+        """[(nickname, score, detail)] 상위 k명."""
+        with self._lock:
+            b = self._boards.get(board)
+            if b is None:
+                return []
+            return [(self._nick.get(uid, "?"), score, detail) for uid, score, detail in b.top(k)]
+
+    def rank(self, board: str, uid: str):
+        with self._lock:
+            b = self._boards.get(board)
+            return (b.rank(uid), len(b)) if b is not None else (None, 0)
+
+    def species(self):
+        with self._lock:
+            return sorted(name[len(SPECIES_PREFIX):] for name, b in self._boards.items()
+                          if name.startswith(SPECIES_PREFIX) and len(b))
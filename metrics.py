@@ -0,0 +1,154 @@
+# metrics.py
+"""Prometheus 텍스트 형식 메트릭.
+
+요청 경로에서는 잠금 없이 스레드마다 따로 가진 dict 만 갱신하고,
+/metrics 스크레이프 때 모든 스레드의 값을 합친다. 끝난 스레드의 값은 기본 샤드로
+합쳐지고 그 스레드의 샤드는 버려진다 (짧게 사는 스레드가 많아도 샤드 수가 늘지 않는다).
+
+    metrics.inc("fishing_commands_total", (("command", "/낚시"),))
+    metrics.observe("fishing_command_seconds", 0.0012, (("command", "/낚시"),))
+    text = metrics.render()
+"""
+import threading
+import weakref
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_meta = {}        # name -> (type, help, buckets)
+_shards = []      # 살아 있는 스레드별 _Shard
+_shards_lock = threading.RLock()   # 종료 정리가 스크레이프 중인 스레드에서 돌 수도 있다
+_local = threading.local()
+
+
+class _Shard:
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        self.counters = {}     # (name, labels) -> value
+        self.histograms = {}   # (name, labels) -> [bucket counts..., +Inf count, sum]
+
+    def merge(self, other: "_Shard"):
+        for key, v in _items(other.counters):
+            self.counters[key] = self.counters.get(key, 0) + v
+        for key, row in _items(other.histograms):
+            acc = self.histograms.get(key)
+            if acc is None:
+                self.histograms[key] = list(row)
+            else:
+                for i, v in enumerate(row):
+                    acc[i] += v
+
+
+class _Owner:
+    """thread-local 에만 붙는 표식. 스레드가 끝나 사라지면 그 스레드의 샤드를 정리한다."""
+    __slots__ = ("__weakref__",)
+
+
+_base = _Shard()  # 끝난 스레드들의 합
+
+
+def _shard() -> _Shard:
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _Shard()
+        with _shards_lock:
+            _shards.append(shard)
+        owner = _local.owner = _Owner()
+        weakref.finalize(owner, _retire, shard)
+        _local.shard = shard
+    return shard
+
+
+def _retire(shard: _Shard):
+    with _shards_lock:
+        _shards.remove(shard)
+        _base.merge(shard)
+
+
+def counter(name: str, help: str):
+    _meta[name] = ("counter", help, None)
+
+
+def histogram(name: str, help: str, buckets=LATENCY_BUCKETS):
+    _meta[name] = ("histogram", help, tuple(buckets))
+
+
+def inc(name: str, labels: tuple = (), value=1):
+    c = _shard().counters
+    key = (name, labels)
+    c[key] = c.get(key, 0) + value
+
+
+def observe(name: str, value: float, labels: tuple = ()):
+    h = _shard().histograms
+    key = (name, labels)
+    row = h.get(key)
+    buckets = _meta[name][2]
+    if row is None:
+        row = h[key] = [0] * (len(buckets) + 2)
+    row[bisect_left(buckets, value)] += 1
+    row[-1] += value
+
+
+def _items(d: dict):
+    # 다른 스레드가 새 키를 넣는 중일 수 있다 — 복사가 성공할 때까지 재시도
+    while True:
+        try:
+            return list(d.items())
+        except RuntimeError:
+            continue
+
+
+def snapshot():
+    """모든 스레드 값을 합친 (counters, histograms)."""
+    total = _Shard()
+    # 잠금을 쥔 채로 합친다 — 그 사이 끝난 스레드가 두 번 세어지거나 빠지지 않도록
+    with _shards_lock:
+        total.merge(_base)
+        for shard in _shards:
+            total.merge(shard)
+    return total.counters, total.histograms
+
+
+def _fmt_labels(labels, extra=()):
+    pairs = tuple(labels) + tuple(extra)
+    if not pairs:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt_num(v) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def render() -> str:
+    counters, histograms = snapshot()
+    by_name = {}
+    for (name, labels), v in counters.items():
+        by_name.setdefault(name, []).append((labels, v))
+    for (name, labels), row in histograms.items():
+        by_name.setdefault(name, []).append((labels, row))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help, buckets = _meta.get(name, ("counter", "", None))
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, v in sorted(by_name[name], key=lambda x: x[0]):
+            if kind != "histogram":
+                lines.append(f"{name}{_fmt_labels(labels)} {_fmt_num(v)}")
+                continue
+            cum = 0
+            for bound, n in zip(buckets, v):
+                cum += n
+                lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', repr(bound)),))} {cum}")
+            cum += v[len(buckets)]
+            lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', '+Inf'),))} {cum}")
+            lines.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_num(v[-1])}")
+            lines.append(f"{name}_count{_fmt_labels(labels)} {cum}")
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
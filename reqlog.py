@@ -0,0 +1,173 @@
+# reqlog.py
+"""/skill 요청 캡처 로그 (운영 부하 재현용).
+
+요청 경로는 응답을 만든 뒤 (ts, uid, utterance, reply) 튜플을 deque 에 넣기만 하고,
+기록 스레드가 모아서 gzip 세그먼트에 한 줄씩 JSON 으로 쓴다.
+디스크가 가득 차거나 쓰기가 실패하면 그 배치를 버리고 dropped 를 센다 — 요청은 절대 기다리지 않는다.
+FISHING_REQUEST_LOG_DIR 가 없으면 꺼진다. 켤 때는 FISHING_RNG_SEED 로 시드를 고정해야 한다
+(워커마다 시드가 다르면 리플레이가 같은 난수를 낼 수 없다).
+
+디렉터리 구조
+    <dir>/req-<pid>-<시작시각>.jsonl.gz   프로세스마다 따로, rotate_bytes 를 넘거나 rotate_seconds 가 지나면 새 파일
+        {"seed": ..., "pid": ...}          첫 줄: 헤더 (rng 서버 시드 — 리플레이에서 같은 난수를 쓰기 위해)
+        [ts, uid, utterance, reply]        이후 한 줄에 요청 하나. ts 는 요청을 받은 시각,
+                                           reply 는 보낸 응답 텍스트 (처리 중 예외면 null)
+
+gzip 멤버를 배치마다 끊어 쓰므로 도중에 죽어도 마지막 배치까지는 읽을 수 있다.
+"""
+import atexit
+import gzip
+import heapq
+import json
+import os
+import threading
+import time
+import zlib
+from collections import deque
+
+import rng
+
+
+class RequestLog:
+    def __init__(self, root: str, batch: int = 512, interval: float = 0.5,
+                 max_pending: int = 65536, rotate_bytes: int = 64 << 20, rotate_seconds: float = 3600.0):
+        self.root = root
+        self.batch = batch
+        self.interval = interval
+        self.max_pending = max_pending
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self._q = deque()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._path = None
+        self._opened_at = 0.0
+        self._written = 0
+        self.records = 0
+        self.dropped = 0
+        self.last_error = None
+        atexit.register(self.flush)
+
+    # -- 생산자 --
+    def append(self, uid: str, utter: str, reply: str = None, ts: float = None):
+        if len(self._q) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._q.append((time.time() if ts is None else ts, uid, utter, reply))
+        if len(self._q) >= self.batch:
+            self._wake.set()
+        self._ensure_thread()
+
+    # -- 기록 --
+    def _ensure_thread(self):
+        # fork(gunicorn preload) 뒤에는 스레드가 없으니 새로 띄운다
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self._path = None
+                    self._thread = threading.Thread(target=self._loop, name="request-log", daemon=True)
+                    self._thread.start()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def _segment(self):
+        now = time.time()
+        if (self._path is None or self._written >= self.rotate_bytes
+                or now - self._opened_at >= self.rotate_seconds):
+            os.makedirs(self.root, exist_ok=True)
+            self._path = os.path.join(self.root, f"req-{os.getpid()}-{time.time_ns()}.jsonl.gz")
+            self._opened_at = now
+            self._written = 0
+            header = json.dumps({"seed": rng.service.seed, "pid": os.getpid()}) + "\n"
+            return header
+        return ""
+
+    def flush(self):
+        with self._lock:
+            while self._q:
+                rows = [self._q.popleft() for _ in range(min(len(self._q), self.batch * 8))]
+                try:
+                    text = self._segment() + "".join(
+                        json.dumps(r, ensure_ascii=False) + "\n" for r in rows)
+                    data = text.encode("utf-8")
+                    with open(self._path, "ab") as f:
+                        f.write(gzip.compress(data, compresslevel=1))
+                    self._written += len(data)
+                    self.records += len(rows)
+                except OSError as e:
+                    # 디스크 가득/권한 등 — 버리고 다음 배치는 새 파일로 다시 시도
+                    self.dropped += len(rows)
+                    self.last_error = repr(e)
+                    self._path = None
+
+
+def _read_segment(path: str):
+    """(seed, [ts, uid, utterance, reply]) 기록된 순서대로. 끝이 잘린 gzip 멤버는 버린다."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    parts, pos = [], 0
+    while pos < len(raw):
+        d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            chunk = d.decompress(raw[pos:])
+        except zlib.error:
+            break
+        if not d.eof:
+            break
+        parts.append(chunk)
+        pos = len(raw) - len(d.unused_data)
+    text = b"".join(parts)
+    lines = text.decode("utf-8", "replace").split("\n")
+    seed = None
+    for line in lines:
+        if not line:
+            continue
+        row = json.loads(line)
+        if isinstance(row, dict):
+            seed = row.get("seed")
+            continue
+        yield seed, row
+
+
+def segments(root: str):
+    if not os.path.isdir(root):
+        return []
+    return [os.path.join(root, n) for n in sorted(os.listdir(root))
+            if n.startswith("req-") and n.endswith(".jsonl.gz")]
+
+
+def read(root: str):
+    """모든 세그먼트를 시각 순으로 합쳐 (ts, uid, utterance, reply) 를 돌려준다.
+    응답이 끝난 순서로 기록되므로 세그먼트 안에서도 ts 로 한 번 정렬한 뒤 합친다."""
+    streams = [sorted(((row[0], row[1], row[2], row[3] if len(row) > 3 else None)
+                       for _seed, row in _read_segment(p)), key=lambda r: r[0])
+               for p in segments(root)]
+    return heapq.merge(*streams, key=lambda r: r[0])
+
+
+def seeds(root: str):
+    """세그먼트 헤더에 기록된 rng 서버 시드 집합."""
+    out = set()
+    for p in segments(root):
+        for seed, _row in _read_segment(p):
+            out.add(seed)
+            break
+    return out
+
+
+def open_log(root: str = None):
+    """FISHING_REQUEST_LOG_DIR 가 설정된 경우에만 RequestLog 를 연다. 시드가 고정돼 있지 않으면 ValueError."""
+    root = root or os.environ.get("FISHING_REQUEST_LOG_DIR")
+    if not root:
+        return None
+    if not os.environ.get("FISHING_RNG_SEED", "").strip():
+        raise ValueError("FISHING_REQUEST_LOG_DIR 를 쓰려면 FISHING_RNG_SEED 로 rng 시드를 고정해야 합니다")
+    rotate_mb = int(os.environ.get("FISHING_REQUEST_LOG_ROTATE_MB", "64"))
+    return RequestLog(root, rotate_bytes=rotate_mb << 20)
@@ -0,0 +1,97 @@
+# rng.py
+"""유저별 난수 스트림.
+
+전역 random 모듈은 스레드끼리 상태를 나눠 써서 부하 중에는 어떤 결과도 재현되지 않는다.
+여기서는 (서버 시드, uid) 로 64비트 키를 만들고, n 번째 난수를 SplitMix64(key + n·γ) 로
+바로 계산하는 카운터 방식을 쓴다. 스트림 상태는 카운터 하나뿐이라 유저 데이터에
+같이 저장하면 되고, 같은 시드로 같은 요청을 다시 흘리면 결과가 바이트 단위로 같다.
+트랜잭션이 충돌로 재시도돼도 저장된 카운터에서 다시 시작하므로 결과가 바뀌지 않는다.
+
+    s = rng.stream(uid, user.get("rng", 0))
+    size = s.random(); fish = s.choice(pool)
+    user["rng"] = s.counter
+
+환경 변수
+    FISHING_RNG_SEED  서버 시드 (정수). 비우면 기동 때마다 os.urandom 으로 정한다.
+                      부하 테스트·리플레이·분쟁 조과 확인 때는 고정해서 쓴다.
+"""
+import hashlib
+import os
+from functools import lru_cache
+
+_MASK = (1 << 64) - 1
+_GAMMA = 0x9E3779B97F4A7C15
+_INV_2_53 = 1.0 / (1 << 53)
+
+
+def _mix(z: int) -> int:
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    return z ^ (z >> 31)
+
+
+class Stream:
+    """random.Random 에서 쓰는 만큼만 흉내 낸 카운터 기반 스트림."""
+    __slots__ = ("key", "counter")
+
+    def __init__(self, key: int, counter: int = 0):
+        self.key = key
+        self.counter = counter
+
+    def next64(self) -> int:
+        self.counter += 1
+        return _mix((self.key + self.counter * _GAMMA) & _MASK)
+
+    def random(self) -> float:
+        """[0, 1) 균등. 상위 53비트를 쓴다."""
+        return (self.next64() >> 11) * _INV_2_53
+
+    def randrange(self, n: int) -> int:
+        return int(self.random() * n)
+
+    def randint(self, a: int, b: int) -> int:
+        return a + self.randrange(b - a + 1)
+
+    def choice(self, seq):
+        return seq[self.randrange(len(seq))]
+
+
+class RNGService:
+    def __init__(self, seed: int = None):
+        if seed is None:
+            seed = int.from_bytes(os.urandom(8), "big")
+        self.seed = seed
+        self._seed_bytes = (seed & _MASK).to_bytes(8, "big")
+        self._key = lru_cache(maxsize=65536)(self._derive)
+
+    def _derive(self, uid: str) -> int:
+        h = hashlib.blake2b(uid.encode(), digest_size=8, key=self._seed_bytes)
+        return int.from_bytes(h.digest(), "big")
+
+    def stream(self, uid: str, counter: int = 0) -> Stream:
+        return Stream(self._key(uid), counter)
+
+
+def _env_seed():
+    raw = os.environ.get("FISHING_RNG_SEED", "").strip()
+    return int(raw, 0) if raw else None
+
+
+service = RNGService(_env_seed())
+
+
+def configure(seed: int = None) -> RNGService:
+    """서버 시드를 바꾼다 (리플레이·벤치용). 이미 만든 스트림에는 영향 없음."""
+    global service
+    service = RNGService(seed)
+    return service
+
+
+def use(svc) -> None:
+    """stream(uid, counter) 를 가진 다른 구현으로 갈아끼운다 (테스트용 고정 난수 등)."""
+    global service
+    service = svc
+
+
+def stream(uid: str, counter: int = 0) -> Stream:
+    return service.stream(uid, counter)
@@ -0,0 +1,88 @@
+# router.py
+"""표 기반 명령어 라우터.
+
+명령어 문자열 → Route 를 dict 로 찾으므로 분기 수와 무관하게 O(1) 이다.
+app.handle_command 와 game.FishingGame.handle 이 같은 라우터를 쓴다.
+
+처리 순서
+1) middleware(*ctx, text)  : 확인 대기(예/아니오 등) 같은 상태 처리. 응답을 돌려주면 종료
+2) 명령어 조회
+3) guard(route, *ctx)      : 닉네임 미설정 등 공통 차단. route 가 None 이면 없는 명령어
+4) 인자 검사(min_args → usage) 후 handler(*ctx, *args)
+"""
+
+
+class Route:
+    __slots__ = ("name", "handler", "min_args", "usage", "rest", "meta")
+
+    def __init__(self, name, handler, min_args=0, usage=None, rest=False, meta=None):
+        self.name = name
+        self.handler = handler
+        self.min_args = min_args
+        self.usage = usage
+        self.rest = rest
+        self.meta = meta or {}
+
+
+class Router:
+    def __init__(self, empty=None, unknown=None):
+        self._routes = {}
+        self._middleware = []
+        self._guards = []
+        self.empty = empty        # 빈 입력: empty(*ctx)
+        self.unknown = unknown    # 없는 명령어: unknown(*ctx)
+
+    def register(self, names, handler, *, min_args=0, usage=None, rest=False, **meta):
+        """names: 명령어 하나 또는 여러 개(별칭).
+        rest=True 면 나머지 토큰을 공백으로 이어 하나의 인자로 넘긴다."""
+        if isinstance(names, str):
+            names = (names,)
+        for name in names:
+            self._routes[name] = Route(name, handler, min_args, usage, rest, meta)
+        return handler
+
+    def command(self, *names, **opts):
+        """@router.command("/상점") 형태의 등록 데코레이터."""
+        def deco(fn):
+            return self.register(names, fn, **opts)
+        return deco
+
+    def middleware(self, fn):
+        self._middleware.append(fn)
+        return fn
+
+    def guard(self, fn):
+        self._guards.append(fn)
+        return fn
+
+    def route(self, name):
+        return self._routes.get(name)
+
+    def commands(self):
+        return list(self._routes)
+
+    def dispatch(self, utter: str, *ctx):
+        text = (utter or "").strip()
+        for mw in self._middleware:
+            reply = mw(*ctx, text)
+            if reply is not None:
+                return reply
+
+        parts = text.split()
+        if not parts:
+            return self.empty(*ctx) if self.empty else None
+
+        route = self._routes.get(parts[0])
+        for guard in self._guards:
+            reply = guard(route, *ctx)
+            if reply is not None:
+                return reply
+        if route is None:
+            return self.unknown(*ctx) if self.unknown else None
+
+        args = parts[1:]
+        if len(args) < route.min_args:
+            return route.usage
+        if route.rest:
+            args = [" ".join(args)]
+        return route.handler(*ctx, *args)
@@ -0,0 +1,247 @@
+# snapshot.py
+"""유저 저장소 스냅샷 (백그라운드 직렬화) + 저널 정리.
+
+주기적으로 백엔드의 유저 행 (uid, version, nickname, JSON) 을 통째로 떠서
+저널 디렉터리에 바이너리 파일로 쓰고, 그 스냅샷에 모두 들어간 저널 세그먼트를 지운다.
+시작할 때는 가장 최근 스냅샷을 백엔드에 싣고 남은 저널(꼬리)만 다시 적용하므로,
+재시작 시간이 저널 길이가 아니라 마지막 스냅샷 이후의 변경량에 비례한다.
+
+뜨기(capture)는 백엔드.rows() 를 리스트로 받아 두는 것까지다.
+- memory : 행은 바뀌지 않는 튜플이라 dict 얕은 복사 한 번 (잠금은 그 동안만, 포인터 복사)
+- sqlite : WAL 읽기 트랜잭션 하나로 훑어 전부 메모리에 올린다 (쓰기는 막히지 않는다).
+           읽기 트랜잭션은 다 읽으면 바로 닫으므로 압축/쓰기/fsync 동안 WAL 체크포인트를 막지 않는다
+직렬화/압축/fsync 는 전부 스냅샷 스레드에서 한다. gunicorn 워커는 스레드를 여러 개 쓰므로
+fork 대신 이 방식을 쓴다.
+
+파일 형식 (<dir>/snap-<뜬 시각 ns>.bin)
+    헤더   "FSNP" u16 형식버전 u64 뜬 시각(ns)
+    본문   zlib 스트림: 행마다 u16 uid길이 u64 version u16 닉네임길이(0xFFFF=없음) u32 JSON길이 + 바이트들
+    꼬리   "FEND" u64 행 수 u32 crc32(압축 전 본문)
+임시 파일에 쓰고 fsync 한 뒤 이름을 바꾸므로, 읽을 때 꼬리가 맞지 않으면 그 전 스냅샷을 쓴다.
+
+지워도 되는 세그먼트: 뜬 시각 전에 마지막으로 쓰였고, 이 프로세스 것이거나 주인 프로세스가 이미 없는 것.
+(저널 레코드는 저장이 끝난 뒤에 쓰이므로 그 전에 쓰인 레코드는 모두 스냅샷에 들어 있다)
+"""
+import os
+import struct
+import threading
+import time
+import zlib
+
+import journal
+import metrics
+
+metrics.counter("fishing_snapshots_total", "스냅샷 결과 (result=ok|error|corrupt)")
+metrics.histogram("fishing_snapshot_seconds", "스냅샷 단계별 시간 (phase=capture|write|load)",
+                  buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+
+MAGIC, END = b"FSNP", b"FEND"
+FORMAT = 1
+_HEAD = struct.Struct("<4sHQ")
+_ROW = struct.Struct("<HQHI")
+_TAIL = struct.Struct("<4sQI")
+_NO_NICK = 0xFFFF
+_CHUNK = 1000          # 행 몇 개마다 압축기에 넘길지
+_OK, _ERROR, _CORRUPT = (("result", "ok"),), (("result", "error"),), (("result", "corrupt"),)
+_CAPTURE, _WRITE, _LOAD = (("phase", "capture"),), (("phase", "write"),), (("phase", "load"),)
+
+
+class SnapshotError(Exception):
+    """스냅샷 파일이 잘렸거나 체크섬이 맞지 않음."""
+
+
+# ---------------- 파일 ----------------
+
+def write(path: str, ns: int, rows) -> int:
+    """rows[(uid, version, nickname, text)] 를 path 에 원자적으로 쓴다. 쓴 바이트 수."""
+    tmp = path + ".tmp"
+    comp = zlib.compressobj(1)
+    crc, count = 0, 0
+    with open(tmp, "wb") as f:
+        f.write(_HEAD.pack(MAGIC, FORMAT, ns))
+        parts = []
+        for uid, version, nickname, text in rows:
+            u = uid.encode("utf-8")
+            n = nickname.encode("utf-8") if nickname is not None else b""
+            t = text.encode("utf-8")
+            parts.append(_ROW.pack(len(u), version, len(n) if nickname is not None else _NO_NICK, len(t)))
+            parts += (u, n, t)
+            count += 1
+            if len(parts) >= _CHUNK * 4:
+                chunk = b"".join(parts)
+                parts = []
+                crc = zlib.crc32(chunk, crc)
+                f.write(comp.compress(chunk))
+        chunk = b"".join(parts)
+        crc = zlib.crc32(chunk, crc)
+        f.write(comp.compress(chunk))
+        f.write(comp.flush())
+        f.write(_TAIL.pack(END, count, crc))
+        f.flush()
+        os.fsync(f.fileno())
+        size = f.tell()
+    os.replace(tmp, path)
+    journal._fsync_dir(os.path.dirname(path) or ".")
+    return size
+
+
+def read(path: str):
+    """(뜬 시각 ns, [(uid, version, nickname, text)]). 형식/체크섬이 틀리면 SnapshotError."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    if len(raw) < _HEAD.size + _TAIL.size:
+        raise SnapshotError(f"{path}: 잘린 파일")
+    magic, fmt, ns = _HEAD.unpack_from(raw, 0)
+    end, count, crc = _TAIL.unpack_from(raw, len(raw) - _TAIL.size)
+    if magic != MAGIC or end != END or fmt != FORMAT:
+        raise SnapshotError(f"{path}: 형식이 다름")
+    try:
+        body = zlib.decompress(raw[_HEAD.size:len(raw) - _TAIL.size])
+    except zlib.error as e:
+        raise SnapshotError(f"{path}: {e}")
+    if zlib.crc32(body) != crc:
+        raise SnapshotError(f"{path}: 체크섬 불일치")
+    rows, pos, size = [], 0, _ROW.size
+    while pos < len(body):
+        ulen, version, nlen, tlen = _ROW.unpack_from(body, pos)
+        pos += size
+        uid = body[pos:pos + ulen].decode("utf-8")
+        pos += ulen
+        if nlen == _NO_NICK:
+            nickname = None
+        else:
+            nickname = body[pos:pos + nlen].decode("utf-8")
+            pos += nlen
+        rows.append((uid, version, nickname, body[pos:pos + tlen].decode("utf-8")))
+        pos += tlen
+    if len(rows) != count:
+        raise SnapshotError(f"{path}: 행 수 불일치")
+    return ns, rows
+
+
+def snapshots(root: str):
+    """최근 것이 먼저."""
+    if not os.path.isdir(root):
+        return []
+    return [os.path.join(root, n) for n in sorted(os.listdir(root), reverse=True)
+            if n.startswith("snap-") and n.endswith(".bin")]
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True   # 권한 없음 = 살아 있음
+    return True
+
+
+# ---------------- 스냅샷 스레드 ----------------
+
+class Snapshotter:
+    KEEP = 2   # 남겨 둘 스냅샷 수 (최신 것이 깨졌을 때 대비)
+
+    def __init__(self, backend, wal, interval: float = 300.0, max_records: int = 100000):
+        self.backend = backend
+        self.journal = wal
+        self.root = wal.root
+        self.interval = interval
+        self.max_records = max_records
+        self._lock = threading.Lock()   # 스냅샷은 한 번에 하나
+        self._wake = threading.Event()
+        self._thread = None
+        self._last_at = time.time()
+        self._last_records = 0
+        self._soon = False        # 다음 주기를 기다리지 않고 바로 뜬다
+        self.loaded = None        # 시작할 때 실은 스냅샷 경로
+        self.taken = 0
+        self.last_error = None
+
+    def load(self) -> int:
+        """가장 최근의 온전한 스냅샷을 백엔드에 싣는다. 실은 행 수."""
+        for path in snapshots(self.root):
+            t = time.perf_counter()
+            try:
+                ns, rows = read(path)
+            except (OSError, SnapshotError) as e:
+                self.last_error = repr(e)
+                metrics.inc("fishing_snapshots_total", _CORRUPT)
+                continue
+            self.backend.restore(rows)
+            metrics.observe("fishing_snapshot_seconds", time.perf_counter() - t, _LOAD)
+            self.loaded = path
+            self._last_at = ns / 1e9
+            return len(rows)
+        return 0
+
+    def start(self, pending: int = 0):
+        """pending: 시작할 때 다시 적용한 저널 레코드 수 — max_records 이상이면 첫 스냅샷을 바로 뜬다."""
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._loop, name="snapshot", daemon=True)
+            self._thread.start()
+            if pending >= self.max_records:
+                self._soon = True
+                self._wake.set()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(min(self.interval, 5.0))
+            self._wake.clear()
+            due = (self._soon or time.time() - self._last_at >= self.interval
+                   or self.journal.records - self._last_records >= self.max_records)
+            if not due:
+                continue
+            try:
+                self.take()
+            except Exception as e:
+                # 디스크 가득 등 — 저널은 그대로 남아 있으니 다음 주기에 다시
+                self.last_error = repr(e)
+                metrics.inc("fishing_snapshots_total", _ERROR)
+                self._last_at = time.time()
+                self._soon = False
+
+    def take(self) -> str:
+        """지금 상태를 떠서 쓰고, 다 들어간 저널 세그먼트를 지운다. 쓴 파일 경로."""
+        with self._lock:
+            ns = time.time_ns()
+            self._last_records = self.journal.records
+            self.journal.rotate()   # 이후 레코드는 새 세그먼트로 (열린 세그먼트를 지우지 않도록)
+            t = time.perf_counter()
+            rows = list(self.backend.rows())   # sqlite 읽기 트랜잭션은 여기서 끝난다
+            metrics.observe("fishing_snapshot_seconds", time.perf_counter() - t, _CAPTURE)
+            t = time.perf_counter()
+            path = os.path.join(self.root, f"snap-{ns}.bin")
+            write(path, ns, rows)
+            metrics.observe("fishing_snapshot_seconds", time.perf_counter() - t, _WRITE)
+            self._prune(ns)
+            self._last_at = time.time()
+            self._soon = False
+            self.taken += 1
+            metrics.inc("fishing_snapshots_total", _OK)
+            return path
+
+    def _prune(self, ns: int):
+        me = os.getpid()
+        for seg in journal.segments(self.root):
+            try:
+                pid = int(os.path.basename(seg)[:-4].rsplit("-", 1)[1])
+                if os.stat(seg).st_mtime_ns >= ns or (pid != me and _alive(pid)):
+                    continue
+                os.remove(seg)
+            except (OSError, ValueError, IndexError):
+                continue
+        for old in snapshots(self.root)[self.KEEP:]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def open_snapshots(backend, wal):
+    """저널이 켜져 있을 때만. FISHING_SNAPSHOT_INTERVAL(초, 0=끔), FISHING_SNAPSHOT_RECORDS."""
+    if wal is None:
+        return None
+    interval = float(os.environ.get("FISHING_SNAPSHOT_INTERVAL", "300"))
+    max_records = int(os.environ.get("FISHING_SNAPSHOT_RECORDS", "100000"))
+    return Snapshotter(backend, wal, interval, max_records)
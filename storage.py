@@ -0,0 +1,627 @@
+# storage.py
+"""유저 데이터 저장소.
+
+app.py 의 get_user 뒤에 붙는 교체 가능한 백엔드 + 프로세스 내 캐시.
+- MemoryBackend : 기존 동작(프로세스 메모리 dict). 테스트/로컬용
+- SQLiteBackend : 기본값. WAL 모드라 여러 gunicorn 워커/스레드가 같은 파일을 공유
+- ShardedBackend: uid 해시로 N개 SQLite 파일에 분산 (FISHING_SHARDS > 1)
+
+쓰기는 유저 단위 버전(낙관적 잠금)으로 검증한다. 다른 워커가 먼저 저장했으면
+캐시를 버리고 최신 데이터로 명령을 다시 실행하므로 진행도가 갈라지지 않는다.
+삭제해도 행은 삭제 표시(tombstone, data='')로 남기고 버전을 올린다. 다시 만들어진 유저는
+그 다음 버전부터 이어가므로, 옛 유저를 캐시에 든 다른 워커가 버전만 보고 최신으로 착각하지 않는다.
+
+닉네임은 별도 인덱스(닉네임 → uid)로 관리한다. 선점(claim)이 원자적이라 중복 닉네임이
+생기지 않고, 관리자 조회는 전체 유저를 훑지 않는다. 접두어 검색도 지원한다.
+
+FISHING_JOURNAL_DIR 가 있으면 저장에 성공할 때마다 변경 레코드를 저널(journal.py, 커밋 후 재실행 로그)에 그룹 커밋으로
+남기고, 시작할 때 백엔드에 아직 없는 변경을 다시 적용한다 (memory 백엔드도 재시작 후 복구,
+SQLite 는 synchronous=NORMAL 로 잃을 수 있는 마지막 커밋까지 보호).
+같은 디렉터리에 주기적으로 스냅샷(snapshot.py)을 떠서 저널을 줄이고, 시작할 때는
+최신 스냅샷을 먼저 실은 뒤 저널 꼬리만 적용한다.
+"""
+import os
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from bisect import bisect_left
+from collections import OrderedDict
+
+import fastjson
+import journal
+import metrics
+import snapshot
+
+metrics.histogram("fishing_store_seconds", "UserStore 백엔드 호출 시간 (op=version|load|save)")
+metrics.counter("fishing_store_bytes_written_total", "백엔드에 저장한 유저 JSON 바이트 수")
+metrics.counter("fishing_store_cache_total", "UserStore 캐시 조회 결과 (result=hit|miss)")
+metrics.counter("fishing_store_conflicts_total", "버전 충돌로 재시도한 횟수")
+metrics.counter("fishing_store_recovered_total", "시작 시 저널에서 다시 적용한 레코드 수 (result=applied|skipped)")
+_OP_VERSION, _OP_LOAD, _OP_SAVE = (("op", "version"),), (("op", "load"),), (("op", "save"),)
+_HIT, _MISS = (("result", "hit"),), (("result", "miss"),)
+
+
+class ConflictError(Exception):
+    """다른 워커가 같은 유저를 먼저 저장했을 때."""
+
+
+class ShardUnavailable(Exception):
+    """해당 샤드를 열 수 없음. 다른 샤드의 유저는 영향 없음."""
+
+
+# ---------------- 백엔드 ----------------
+
+class MemoryBackend:
+    """프로세스 내 dict 저장소. 워커 간 공유되지 않는다."""
+
+    def __init__(self):
+        self._rows = {}  # uid -> (version, nickname, text)
+        self._nicks = {}  # nickname -> uid
+        self._uid_nicks = {}  # uid -> {nickname} (해제할 때 전체를 훑지 않도록)
+        self._sorted_nicks = []  # 접두어 검색용
+        self._lock = threading.Lock()
+
+    def load(self, uid: str):
+        """(version, text). 삭제 표시면 text 가 None, 처음 보는 uid 면 None."""
+        row = self._rows.get(uid)
+        if row is None:
+            return None
+        return row[0], row[2] or None
+
+    def version(self, uid: str) -> int:
+        row = self._rows.get(uid)
+        return row[0] if row else 0
+
+    def save(self, uid: str, text: str, nickname, expected: int) -> int:
+        with self._lock:
+            if self.version(uid) != expected:
+                raise ConflictError(uid)
+            self._rows[uid] = (expected + 1, nickname, text)
+            return expected + 1
+
+    def delete(self, uid: str) -> bool:
+        with self._lock:
+            row = self._rows.get(uid)
+            if row is None or not row[2]:
+                return False
+            self._rows[uid] = (row[0] + 1, None, "")
+            return True
+
+    def claim_nickname(self, nickname: str, uid: str) -> bool:
+        with self._lock:
+            owner = self._nicks.get(nickname)
+            if owner is None:
+                self._nicks[nickname] = uid
+                self._uid_nicks.setdefault(uid, set()).add(nickname)
+                self._sorted_nicks.insert(bisect_left(self._sorted_nicks, nickname), nickname)
+                return True
+            return owner == uid
+
+    def release_nicknames(self, uid: str):
+        with self._lock:
+            for nick in self._uid_nicks.pop(uid, ()):
+                del self._nicks[nick]
+                self._sorted_nicks.pop(bisect_left(self._sorted_nicks, nick))
+
+    def find_by_nickname(self, nickname: str):
+        return self._nicks.get(nickname)
+
+    def search_nicknames(self, prefix: str, limit: int = 20):
+        with self._lock:
+            i = bisect_left(self._sorted_nicks, prefix)
+            out = []
+            for nick in self._sorted_nicks[i:i + limit]:
+                if not nick.startswith(prefix):
+                    break
+                out.append((nick, self._nicks[nick]))
+            return out
+
+    def uids(self):
+        return [uid for uid, row in list(self._rows.items()) if row[2]]
+
+    # -- 스냅샷 (snapshot.py) --
+    def rows(self):
+        """(uid, version, nickname, text). 삭제 표시도 text='' 로 포함.
+        행은 바뀌지 않는 튜플이라 잠금은 얕은 복사 동안만."""
+        with self._lock:
+            rows = self._rows.copy()
+        return ((uid, v, nick, text) for uid, (v, nick, text) in rows.items())
+
+    def restore(self, rows):
+        """스냅샷 행을 싣는다. 이미 더 새 버전이 있으면 그대로 둔다."""
+        self._restore_users(rows)
+        self._restore_nicknames([(r[2], r[0]) for r in rows if r[2] is not None])
+
+    def _restore_users(self, rows):
+        with self._lock:
+            for uid, version, nickname, text in rows:
+                if version > self.version(uid):
+                    self._rows[uid] = (version, nickname, text)
+
+    def _restore_nicknames(self, pairs):
+        with self._lock:
+            for nick, uid in pairs:
+                if self._nicks.setdefault(nick, uid) == uid:
+                    self._uid_nicks.setdefault(uid, set()).add(nick)
+            self._sorted_nicks = sorted(self._nicks)
+
+
+class SQLiteBackend:
+    """SQLite(WAL) 저장소. 스레드마다 커넥션을 따로 연다."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        db = self._conn()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            " uid TEXT PRIMARY KEY,"
+            " version INTEGER NOT NULL,"
+            " nickname TEXT,"
+            " data TEXT NOT NULL)"
+        )
+        db.execute("DROP INDEX IF EXISTS idx_users_nickname")
+        fresh = db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='nicknames'"
+        ).fetchone() is None
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS nicknames ("
+            " nickname TEXT PRIMARY KEY,"
+            " uid TEXT NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS idx_nicknames_uid ON nicknames(uid)")
+        if fresh:
+            # 인덱스 도입 전 데이터: 먼저 설정한(rowid 가 작은) 유저가 닉네임을 가진다
+            db.execute(
+                "INSERT OR IGNORE INTO nicknames(nickname, uid)"
+                " SELECT nickname, uid FROM users WHERE nickname IS NOT NULL ORDER BY rowid"
+            )
+
+    def _conn(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def load(self, uid: str):
+        """(version, text). 삭제 표시면 text 가 None, 처음 보는 uid 면 None."""
+        row = self._conn().execute(
+            "SELECT version, data FROM users WHERE uid=?", (uid,)
+        ).fetchone()
+        return (row[0], row[1] or None) if row else None
+
+    def version(self, uid: str) -> int:
+        row = self._conn().execute(
+            "SELECT version FROM users WHERE uid=?", (uid,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def save(self, uid: str, text: str, nickname, expected: int) -> int:
+        db = self._conn()
+        if expected == 0:
+            try:
+                db.execute(
+                    "INSERT INTO users(uid, version, nickname, data) VALUES(?, 1, ?, ?)",
+                    (uid, nickname, text),
+                )
+            except sqlite3.IntegrityError:
+                raise ConflictError(uid)
+            return 1
+        cur = db.execute(
+            "UPDATE users SET version=version+1, nickname=?, data=? WHERE uid=? AND version=?",
+            (nickname, text, uid, expected),
+        )
+        if cur.rowcount != 1:
+            raise ConflictError(uid)
+        return expected + 1
+
+    def delete(self, uid: str) -> bool:
+        cur = self._conn().execute(
+            "UPDATE users SET version=version+1, nickname=NULL, data='' WHERE uid=? AND data!=''", (uid,)
+        )
+        return cur.rowcount > 0
+
+    def claim_nickname(self, nickname: str, uid: str) -> bool:
+        db = self._conn()
+        try:
+            db.execute("INSERT INTO nicknames(nickname, uid) VALUES(?, ?)", (nickname, uid))
+            return True
+        except sqlite3.IntegrityError:
+            return self.find_by_nickname(nickname) == uid
+
+    def release_nicknames(self, uid: str):
+        self._conn().execute("DELETE FROM nicknames WHERE uid=?", (uid,))
+
+    def find_by_nickname(self, nickname: str):
+        row = self._conn().execute(
+            "SELECT uid FROM nicknames WHERE nickname=?", (nickname,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def search_nicknames(self, prefix: str, limit: int = 20):
+        # PK(B-tree) 범위 조회: prefix <= nickname < prefix + U+10FFFF
+        return self._conn().execute(
+            "SELECT nickname, uid FROM nicknames WHERE nickname >= ? AND nickname < ?"
+            " ORDER BY nickname LIMIT ?",
+            (prefix, prefix + "\U0010ffff", limit),
+        ).fetchall()
+
+    def uids(self):
+        return [r[0] for r in self._conn().execute("SELECT uid FROM users WHERE data!=''")]
+
+    # -- 스냅샷 (snapshot.py) --
+    def rows(self):
+        """(uid, version, nickname, text). 삭제 표시도 text='' 로 포함.
+        전용 커넥션의 읽기 트랜잭션 하나로 훑는다 (WAL 이라 쓰기는 계속된다)."""
+        db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            db.execute("BEGIN")
+            yield from db.execute("SELECT uid, version, nickname, data FROM users")
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def restore(self, rows):
+        """스냅샷 행을 싣는다. 이미 더 새 버전이 있으면 그대로 둔다."""
+        self._restore_users(rows)
+        self._restore_nicknames([(r[2], r[0]) for r in rows if r[2] is not None])
+
+    def _restore_users(self, rows):
+        self._bulk(
+            "INSERT INTO users(uid, version, nickname, data) VALUES(?, ?, ?, ?)"
+            " ON CONFLICT(uid) DO UPDATE SET version=excluded.version, nickname=excluded.nickname,"
+            " data=excluded.data WHERE excluded.version > users.version", rows)
+
+    def _restore_nicknames(self, pairs):
+        self._bulk("INSERT OR IGNORE INTO nicknames(nickname, uid) VALUES(?, ?)", pairs)
+
+    def _bulk(self, sql: str, params):
+        db = self._conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(sql, params)
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+
+class ShardedBackend:
+    """uid 해시로 여러 백엔드에 나눠 담는다.
+
+    샤드마다 파일과 쓰기 잠금이 따로라 SQLite 의 단일 writer 제약이 샤드 수만큼 풀리고,
+    한 샤드가 깨져도 그 샤드 유저만 ShardUnavailable 이 난다. 샤드는 처음 쓰일 때 연다.
+    닉네임 인덱스는 유일성을 위해 0번 샤드 하나에 둔다.
+    """
+
+    def __init__(self, factories):
+        self._factories = list(factories)
+        self._backends = [None] * len(self._factories)
+        self._open_lock = threading.Lock()
+
+    def shard_of(self, uid: str) -> int:
+        return zlib.adler32(uid.encode("utf-8")) % len(self._backends)
+
+    def shard(self, i: int):
+        backend = self._backends[i]
+        if backend is not None:
+            return backend
+        with self._open_lock:
+            if self._backends[i] is None:
+                try:
+                    self._backends[i] = self._factories[i]()
+                except Exception as e:
+                    raise ShardUnavailable(f"shard {i}: {e}") from e
+            return self._backends[i]
+
+    def _pick(self, uid: str):
+        return self.shard(self.shard_of(uid))
+
+    def load(self, uid: str):
+        return self._pick(uid).load(uid)
+
+    def version(self, uid: str) -> int:
+        return self._pick(uid).version(uid)
+
+    def save(self, uid: str, text: str, nickname, expected: int) -> int:
+        return self._pick(uid).save(uid, text, nickname, expected)
+
+    def delete(self, uid: str) -> bool:
+        return self._pick(uid).delete(uid)
+
+    def claim_nickname(self, nickname: str, uid: str) -> bool:
+        return self.shard(0).claim_nickname(nickname, uid)
+
+    def release_nicknames(self, uid: str):
+        self.shard(0).release_nicknames(uid)
+
+    def find_by_nickname(self, nickname: str):
+        return self.shard(0).find_by_nickname(nickname)
+
+    def search_nicknames(self, prefix: str, limit: int = 20):
+        return self.shard(0).search_nicknames(prefix, limit)
+
+    def uids(self):
+        out = []
+        for i in range(len(self._backends)):
+            out.extend(self.shard(i).uids())
+        return out
+
+    def rows(self):
+        for i in range(len(self._backends)):
+            yield from self.shard(i).rows()
+
+    def restore(self, rows):
+        by_shard = {}
+        for row in rows:
+            by_shard.setdefault(self.shard_of(row[0]), []).append(row)
+        for i, part in by_shard.items():
+            self.shard(i)._restore_users(part)
+        self.shard(0)._restore_nicknames([(r[2], r[0]) for r in rows if r[2] is not None])
+
+
+def shard_paths(path: str, shards: int):
+    """fishing.db → fishing-00.db, fishing-01.db, ..."""
+    root, ext = os.path.splitext(path)
+    return [f"{root}-{i:02d}{ext}" for i in range(shards)]
+
+
+# ---------------- 캐시 + 트랜잭션 ----------------
+
+class _Session:
+    __slots__ = ("user", "deleted")
+
+    def __init__(self, user):
+        self.user = user
+        self.deleted = False
+
+
+class UserStore:
+    """백엔드 앞단의 LRU 캐시와 유저 단위 트랜잭션.
+
+    transact(uid, fn) 안에서 get(uid) 는 같은 dict 를 돌려주고,
+    fn 이 끝나면 바뀐 경우에만 한 번 저장한다.
+    """
+
+    LOCK_STRIPES = 64
+    MAX_RETRIES = 5
+
+    def __init__(self, backend, cache_size: int = 10000, json_default=None, object_hook=None, journal=None):
+        self.backend = backend
+        self.cache_size = cache_size
+        self.journal = journal   # journal.Journal | None
+        self.snapshots = None    # snapshot.Snapshotter | None (open_store 가 붙인다)
+        self.recovered = (0, 0)  # recover() 결과 (적용, 건너뜀)
+        # 유저 dict 안에 앱 전용 객체를 두고 싶을 때의 JSON 변환 훅
+        self.json_default = json_default
+        self.object_hook = object_hook
+        self._cache = OrderedDict()  # uid -> (version, text, user)
+        self._cache_lock = threading.Lock()
+        # 같은 유저는 직렬화, 다른 유저는 (대부분) 병렬
+        self._locks = [threading.RLock() for _ in range(self.LOCK_STRIPES)]
+        self._local = threading.local()
+
+    def _active(self) -> dict:
+        active = getattr(self._local, "active", None)
+        if active is None:
+            active = self._local.active = {}
+        return active
+
+    def _user_lock(self, uid: str):
+        return self._locks[hash(uid) % self.LOCK_STRIPES]
+
+    # -- 캐시 --
+    def _cache_get(self, uid: str):
+        with self._cache_lock:
+            entry = self._cache.get(uid)
+            if entry is not None:
+                self._cache.move_to_end(uid)
+            return entry
+
+    def _cache_put(self, uid: str, version: int, text: str, user: dict):
+        with self._cache_lock:
+            self._cache[uid] = (version, text, user)
+            self._cache.move_to_end(uid)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _evict(self, uid: str):
+        with self._cache_lock:
+            self._cache.pop(uid, None)
+
+    def _checkout(self, uid: str, factory):
+        """캐시가 최신이면 그대로, 아니면 백엔드에서 읽는다."""
+        entry = self._cache_get(uid)
+        if entry is not None:
+            t = time.perf_counter()
+            fresh = entry[0] == self.backend.version(uid)
+            metrics.observe("fishing_store_seconds", time.perf_counter() - t, _OP_VERSION)
+            if fresh:
+                metrics.inc("fishing_store_cache_total", _HIT)
+                return entry
+        metrics.inc("fishing_store_cache_total", _MISS)
+        t = time.perf_counter()
+        row = self.backend.load(uid)
+        metrics.observe("fishing_store_seconds", time.perf_counter() - t, _OP_LOAD)
+        if row is None:
+            return 0, None, factory()
+        version, text = row
+        if text is None:
+            return version, None, factory()   # 삭제된 유저 — 그 다음 버전으로 새로 만든다
+        # orjson 에는 object_hook 이 없어서, 훅이 있으면 읽기는 표준 json
+        user = json.loads(text, object_hook=self.object_hook) if self.object_hook else fastjson.loads(text)
+        entry = (version, text, user)
+        self._cache_put(uid, *entry)
+        return entry
+
+    # -- 공개 API --
+    def transact(self, uid: str, fn, factory):
+        active = self._active()
+        if uid in active:
+            return fn()
+        with self._user_lock(uid):
+            result, seq = self._transact(uid, fn, factory, active)
+        if seq:
+            # 응답 전에 디스크까지. 잠금을 놓은 뒤에 기다리므로 같은 stripe 의 다른 유저는
+            # 이 fsync 를 기다리지 않고, 같은 순간 커밋한 유저들과 fsync 한 번을 나눠 쓴다
+            self.journal.wait(seq)
+        return result
+
+    def _transact(self, uid: str, fn, factory, active):
+        """(fn 결과, 기다릴 저널 레코드 번호 | 0). 유저 잠금 안에서 부른다."""
+        for _ in range(self.MAX_RETRIES):
+            version, text, user = self._checkout(uid, factory)
+            session = active[uid] = _Session(user)
+            try:
+                result = fn()
+            except Exception:
+                self._evict(uid)
+                raise
+            finally:
+                del active[uid]
+            if session.deleted:
+                return result, 0
+            data = fastjson.dumps(user, default=self.json_default)
+            new_text = data.decode()
+            if new_text == text:
+                return result, 0
+            ns = time.time_ns()   # 저널 순서: 이 버전을 읽은 뒤, 저장하기 전
+            t = time.perf_counter()
+            try:
+                new_version = self.backend.save(uid, new_text, user.get("nickname"), version)
+            except ConflictError:
+                metrics.inc("fishing_store_conflicts_total")
+                self._evict(uid)
+                continue
+            finally:
+                metrics.observe("fishing_store_seconds", time.perf_counter() - t, _OP_SAVE)
+            metrics.inc("fishing_store_bytes_written_total", (), len(data))
+            self._cache_put(uid, new_version, new_text, user)
+            if self.journal is None:
+                return result, 0
+            # 저장이 성공한 뒤에 남기는 재실행 레코드. 같은 유저의 레코드 순서가 지켜지도록 잠금 안에서 덧붙인다.
+            # 바뀐 dict(user)를 체크아웃한 텍스트와 비교한다 (user 는 제자리에서 바뀌었으므로 전 상태는 text 뿐)
+            old = fastjson.loads(text) if text is not None else None
+            ops = journal.diff(old, user, self.json_default)
+            return result, self.journal.append(uid, version, ops, ns, default=self.json_default)
+        raise ConflictError(uid)
+
+    def get(self, uid: str, factory):
+        """트랜잭션 안이면 작업 중인 dict, 밖이면 최신 데이터(읽기 전용)."""
+        session = self._active().get(uid)
+        if session is not None:
+            return session.user
+        with self._user_lock(uid):
+            return self._checkout(uid, factory)[2]
+
+    def delete(self, uid: str) -> bool:
+        session = self._active().get(uid)
+        if session is not None:
+            session.deleted = True
+        seq = 0
+        with self._user_lock(uid):
+            self._evict(uid)
+            version = self.backend.version(uid) if self.journal is not None else 0
+            ns = time.time_ns()
+            deleted = self.backend.delete(uid)
+            self.backend.release_nicknames(uid)
+            if deleted and self.journal is not None:
+                seq = self.journal.append(uid, version, None, ns)
+        if seq:
+            self.journal.wait(seq)
+        return deleted
+
+    def recover(self):
+        """저널의 변경을 백엔드에 다시 적용한다 (시작 시 요청을 받기 전에 한 번).
+        base 버전이 맞는 레코드만 적용하므로 이미 반영된 것은 건너뛴다. (적용, 건너뜀) 을 돌려준다."""
+        if self.journal is None:
+            return self.recovered
+        state = {}      # uid -> [version, user(순수 JSON) | None]
+        changed = set()
+        applied = skipped = 0
+        for _ns, uid, base, ops in journal.read(self.journal.root):
+            st = state.get(uid)
+            if st is None:
+                st = state[uid] = self._load_plain(uid)
+            if base != st[0]:
+                skipped += 1
+                continue
+            if ops is None:
+                self.backend.delete(uid)
+                self.backend.release_nicknames(uid)
+                st[:] = [base + 1, None]
+            else:
+                try:
+                    user = journal.apply(st[1], ops)
+                    st[:] = [self.backend.save(uid, fastjson.dumps_str(user), user.get("nickname"), base), user]
+                except (ConflictError, KeyError, IndexError, TypeError):
+                    # 다른 워커가 먼저 복구했거나 이어지지 않는 레코드 → 백엔드 값을 다시 기준으로
+                    st[:] = self._load_plain(uid)
+                    skipped += 1
+                    continue
+            changed.add(uid)
+            applied += 1
+        for uid in changed:
+            user = state[uid][1]
+            if user and user.get("nickname"):
+                self.backend.claim_nickname(user["nickname"], uid)
+        metrics.inc("fishing_store_recovered_total", (("result", "applied"),), applied)
+        metrics.inc("fishing_store_recovered_total", (("result", "skipped"),), skipped)
+        self.recovered = (applied, skipped)
+        return self.recovered
+
+    def _load_plain(self, uid: str) -> list:
+        row = self.backend.load(uid)
+        if row is None:
+            return [0, None]
+        return [row[0], fastjson.loads(row[1]) if row[1] is not None else None]
+
+    def claim_nickname(self, nickname: str, uid: str) -> bool:
+        """닉네임 선점. 이미 다른 유저가 쓰고 있으면 False (같은 uid 재시도는 True)."""
+        return self.backend.claim_nickname(nickname, uid)
+
+    def find_by_nickname(self, nickname: str):
+        return self.backend.find_by_nickname(nickname)
+
+    def search_nicknames(self, prefix: str, limit: int = 20):
+        """접두어로 시작하는 (닉네임, uid) 목록. 관리 도구용."""
+        return self.backend.search_nicknames(prefix, limit)
+
+    def uids(self):
+        return self.backend.uids()
+
+
+def open_store(kind: str = None, path: str = None, shards: int = None, **codec) -> UserStore:
+    """환경변수 FISHING_STORE(sqlite|memory), FISHING_DB, FISHING_SHARDS 로 백엔드 선택.
+    FISHING_JOURNAL_DIR 가 있으면 저널/스냅샷을 붙이고 복구까지 마친 뒤 돌려준다.
+    codec(json_default, object_hook)은 UserStore 로 그대로 전달."""
+    kind = (kind or os.environ.get("FISHING_STORE", "sqlite")).lower()
+    cache_size = int(os.environ.get("FISHING_CACHE_SIZE", "10000"))
+    shards = shards or int(os.environ.get("FISHING_SHARDS", "1"))
+    if kind == "memory":
+        backend = MemoryBackend()
+    elif kind == "sqlite":
+        path = path or os.environ.get("FISHING_DB", "fishing.db")
+        if shards > 1:
+            backend = ShardedBackend(
+                (lambda p=p: SQLiteBackend(p)) for p in shard_paths(path, shards)
+            )
+        else:
+            backend = SQLiteBackend(path)
+    else:
+        raise ValueError(f"unknown store backend: {kind}")
+    wal = journal.open_journal()
+    store = UserStore(backend, cache_size, journal=wal, **codec)
+    store.snapshots = snapshot.open_snapshots(backend, wal)
+    if store.snapshots is not None:
+        store.snapshots.load()   # 최신 스냅샷을 먼저 싣고
+    store.recover()              # 그 뒤의 저널 꼬리만 적용
+    if store.snapshots is not None:
+        store.snapshots.start(pending=store.recovered[0])
+    return store